@@ -0,0 +1,288 @@
+'''
+This file contains an asyncio interface to the solver for use inside an event
+loop. Puzzles are solved by solveSudoku() on a pool of worker processes owned by
+an AsyncSolver, so the loop is never blocked, and cancelling the task awaiting a
+puzzle also stops its search in the worker.
+'''
+import asyncio
+import collections
+import multiprocessing
+import os
+import threading
+import time
+from puzzlesolver.solve_sudoku import *
+from puzzlesolver.batch_sudoku import WorkerPool
+
+'''-----------------------------------------------------------------------------
+-----------------------------WORKER HELPER FUNCTIONS----------------------------
+-----------------------------------------------------------------------------'''
+
+# Cancellation flags shared with the parent, one per puzzle in flight; set in
+# each worker process by initWorker().
+WORKER_FLAGS=None
+
+def initWorker(flags):
+    '''
+    Params:
+        flags - multiprocessing.Array; cancellation flags of the AsyncSolver.
+    Returns:
+        None, keeps flags for solveTask() in this worker process.
+    '''
+    global WORKER_FLAGS
+    WORKER_FLAGS=flags
+
+class SharedFlag(object):
+    def __init__(self,flags,slot):
+        '''
+        Params:
+            flags - multiprocessing.Array; shared cancellation flags.
+            slot - int; index of the flag of one puzzle.
+        Returns:
+            None. Passed to solveSudoku() as its cancel option, reading the
+            flag from shared memory at every node without a round trip to
+            the parent.
+        '''
+        self.flags=flags
+        self.slot=slot
+
+    def is_set(self):
+        return self.flags[self.slot]!=0
+
+def solveTask(slot,board,deadline,kwargs):
+    '''
+    Params:
+        slot - int; index of the cancellation flag of this puzzle.
+        board - list; 2-dimensional list containing the board to be solved.
+        deadline - float; time.time() after which the search gives up, or
+                   None.
+        kwargs - dict; keyword arguments passed on to solveSudoku().
+    Returns:
+        The result of solveSudoku(), run in a worker process.
+    '''
+    return solveSudoku(board,deadline=deadline,
+                       cancel=SharedFlag(WORKER_FLAGS,slot),**kwargs)
+
+'''-----------------------------------------------------------------------------
+-----------------------------------ASYNC SOLVER---------------------------------
+-----------------------------------------------------------------------------'''
+
+class AsyncSolver(object):
+    def __init__(self,workers=None,maxpending=None):
+        '''
+        Params:
+            [workers] - int; number of worker processes, defaults to the number
+                        of CPUs.
+            [maxpending] - int; number of puzzles sent to the workers at once,
+                           defaults to twice the number of workers. Further
+                           calls wait for one of them to finish.
+        Returns:
+            None. Use as an async context manager, or call close(), or await
+            aclose() from a coroutine, when done.
+        '''
+        if workers is None: workers=os.cpu_count() or 1
+        if maxpending is None: maxpending=2*workers
+        self.maxpending=maxpending
+        self.flags=multiprocessing.Array('b',maxpending,lock=False)
+        # A pool that loses a worker is replaced, so one crash does not fail
+        # every later puzzle.
+        self.executor=WorkerPool(workers,initializer=initWorker,
+                                 initargs=(self.flags,))
+        # Flag slots not in use, and the futures of takeSlot() calls waiting
+        # for one with their event loops. Slots are given back from the
+        # executor's thread as well, and the solver may be used from more than
+        # one event loop, so they are kept under a lock rather than behind an
+        # asyncio.Semaphore, which belongs to a single loop.
+        self.free=list(range(maxpending))
+        self.waiters=collections.deque()
+        self.lock=threading.Lock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self,*exc):
+        await self.aclose()
+
+    def close(self):
+        '''
+        Params:
+            None.
+        Returns:
+            None, stops every search still running and shuts the workers down,
+            waiting for them to exit.
+        '''
+        for slot in range(self.maxpending): self.flags[slot]=1
+        self.executor.shutdown(wait=True,cancel_futures=True)
+
+    async def aclose(self):
+        '''
+        Params:
+            None.
+        Returns:
+            None, as for close(), waiting for the workers in a thread so the
+            event loop is not blocked.
+        '''
+        await asyncio.get_running_loop().run_in_executor(None,self.close)
+
+    async def takeSlot(self):
+        '''
+        Params:
+            None.
+        Returns:
+            The index of a free flag slot, waiting until one is given back if
+            maxpending puzzles are in flight.
+        '''
+        loop=asyncio.get_running_loop()
+        with self.lock:
+            if self.free: return self.free.pop()
+            waiter=loop.create_future()
+            self.waiters.append((loop,waiter))
+        try: return await waiter
+        except asyncio.CancelledError:
+            with self.lock:
+                if (loop,waiter) in self.waiters:
+                    self.waiters.remove((loop,waiter))
+            # A slot handed over just as the wait was cancelled is passed on.
+            if waiter.done() and not waiter.cancelled():
+                self.giveSlot(waiter.result())
+            raise
+
+    def giveSlot(self,slot):
+        '''
+        Params:
+            slot - int; index returned by takeSlot().
+        Returns:
+            None, hands the slot to the longest waiting takeSlot(), or makes
+            it free if none is waiting. Safe to call from any thread.
+        '''
+        with self.lock:
+            while self.waiters:
+                loop,waiter=self.waiters.popleft()
+                try:
+                    loop.call_soon_threadsafe(self.handOver,waiter,slot)
+                    return
+                except RuntimeError:
+                    # Its event loop has been closed.
+                    continue
+            self.free.append(slot)
+
+    def handOver(self,waiter,slot):
+        '''
+        Params:
+            waiter - asyncio.Future; of a takeSlot() call.
+            slot - int; index of the slot handed to it.
+        Returns:
+            None. Run in the event loop of waiter; if its wait has been
+            cancelled meanwhile, the slot is given back instead.
+        '''
+        if waiter.done(): self.giveSlot(slot)
+        else: waiter.set_result(slot)
+
+    async def solve(self,board,timeout=None,**kwargs):
+        '''
+        Params:
+            board - list; 2-dimensional list containing the board to be solved.
+                    Not modified.
+            [timeout] - float; seconds allowed from when the puzzle is sent to
+                        the workers, or None for no limit.
+            Any other keyword arguments are passed on to solveSudoku().
+        Returns:
+            As for solveSudoku(): the completed board and steps, (None,None) if
+            there is no solution, or a BudgetExhausted if the timeout or a
+            budget in kwargs ran out. If the awaiting task is cancelled, the
+            search in the worker is stopped too.
+        '''
+        slot=await self.takeSlot()
+        self.flags[slot]=0
+        deadline=None if timeout is None else time.time()+timeout
+        # The slot is given back here unless a worker may still read its flag,
+        # in which case it is given back once the worker is done with it, so a
+        # later puzzle taking the slot can never be stopped by this one.
+        owned=True
+        try:
+            future=self.executor.submit(solveTask,slot,board,deadline,kwargs)
+            try: return await asyncio.wrap_future(future)
+            except asyncio.CancelledError:
+                if not future.done() and not future.cancel():
+                    self.flags[slot]=1
+                    owned=False
+                    future.add_done_callback(lambda _:self.giveSlot(slot))
+                raise
+        finally:
+            if owned: self.giveSlot(slot)
+
+    async def iterSolve(self,boards,timeout=None,**kwargs):
+        '''
+        Params:
+            boards - iterable; 2-dimensional lists containing the boards to be
+                     solved. Consumed lazily.
+            [timeout] - float; seconds allowed per puzzle, as for solve().
+            Any other keyword arguments are passed on to solveSudoku().
+        Returns:
+            An async generator yielding a tuple (index,result) for each board
+            as it completes, with result as for solve(). At most maxpending
+            boards are taken from boards ahead of the results. Puzzles still
+            running when the generator is closed or cancelled are stopped.
+        '''
+        indexed=enumerate(boards)
+        pending={}
+        def submit():
+            for index,board in indexed:
+                task=asyncio.ensure_future(self.solve(board,timeout,**kwargs))
+                pending[task]=index
+                return True
+            return False
+        try:
+            for _ in range(self.maxpending):
+                if not submit(): break
+            while pending:
+                done,_=await asyncio.wait(pending,
+                                          return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index=pending.pop(task)
+                    submit()
+                    yield index,task.result()
+        finally:
+            for task in pending: task.cancel()
+            if pending: await asyncio.gather(*pending,return_exceptions=True)
+
+'''-----------------------------------------------------------------------------
+-----------------------------------SOLVER API-----------------------------------
+-----------------------------------------------------------------------------'''
+
+# The AsyncSolver behind solveAsync() and iterSolveAsync(), started on first
+# use.
+DEFAULT_SOLVER=None
+
+def getDefaultSolver():
+    '''
+    Params:
+        None.
+    Returns:
+        The shared AsyncSolver, with one worker per CPU.
+    '''
+    global DEFAULT_SOLVER
+    if DEFAULT_SOLVER is None: DEFAULT_SOLVER=AsyncSolver()
+    return DEFAULT_SOLVER
+
+async def solveAsync(board,timeout=None,**kwargs):
+    '''
+    Params:
+        board - list; 2-dimensional list containing the board to be solved.
+        [timeout] - float; seconds allowed, or None for no limit.
+        Any other keyword arguments are passed on to solveSudoku().
+    Returns:
+        As for AsyncSolver.solve(), on the shared solver.
+    '''
+    return await getDefaultSolver().solve(board,timeout,**kwargs)
+
+def iterSolveAsync(boards,timeout=None,**kwargs):
+    '''
+    Params:
+        boards - iterable; 2-dimensional lists containing the boards to be
+                 solved.
+        [timeout] - float; seconds allowed per puzzle.
+        Any other keyword arguments are passed on to solveSudoku().
+    Returns:
+        As for AsyncSolver.iterSolve(), on the shared solver.
+    '''
+    return getDefaultSolver().iterSolve(boards,timeout,**kwargs)
@@ -0,0 +1,335 @@
+'''
+This file contains the helper functions for solving batches of sudoku puzzles,
+each given in a 2-dimensional list of integers, across a pool of worker
+processes, and for splitting the search of a single hard puzzle across one.
+'''
+import concurrent.futures
+import concurrent.futures.process
+import itertools
+import multiprocessing
+import os
+import time
+from puzzlesolver.solve_sudoku import *
+
+'''-----------------------------------------------------------------------------
+----------------------------------BATCH RESULTS---------------------------------
+-----------------------------------------------------------------------------'''
+
+class BatchResult(object):
+    def __init__(self,index,board,steps,error=None,elapsed=0.0):
+        '''
+        Params:
+            index - int; position of the puzzle in the input batch.
+            board - list; completed board, or None if there was no solution or
+                    the puzzle failed.
+            steps - list; steps as returned by solveSudoku(), or None.
+            [error] - str; None if the puzzle was solved or shown to have no
+                      solution, 'timeout' if it ran out of time, 'nodes' or
+                      'cancelled' if stopped by the maxnodes or cancel option
+                      of solveSudoku(), otherwise a description of the
+                      exception it raised.
+            [elapsed] - float; seconds spent on the puzzle in its worker.
+        Returns:
+            None.
+        '''
+        self.index=index
+        self.board=board
+        self.steps=steps
+        self.error=error
+        self.elapsed=elapsed
+
+    def __repr__(self):
+        return 'BatchResult(%d,solved=%s,error=%r,elapsed=%.4f)'%(
+            self.index,self.board is not None,self.error,self.elapsed)
+
+'''-----------------------------------------------------------------------------
+-----------------------------WORKER HELPER FUNCTIONS----------------------------
+-----------------------------------------------------------------------------'''
+
+def budgetError(result):
+    '''
+    Params:
+        result - tuple; as returned by solveSudoku().
+    Returns:
+        None if the search finished, otherwise 'timeout', 'nodes' or
+        'cancelled' for the limit that stopped it.
+    '''
+    if not isinstance(result,BudgetExhausted): return None
+    return 'timeout' if result.reason=='deadline' else result.reason
+
+def solveChunk(chunk,timeout,kwargs):
+    '''
+    Params:
+        chunk - list; tuples (index,board) to be solved in this worker.
+        timeout - float; seconds allowed per puzzle, or None for no limit.
+        kwargs - dict; keyword arguments passed on to solveSudoku().
+    Returns:
+        A list of BatchResult, one per puzzle in chunk. Failures are recorded
+        in the results rather than raised.
+    '''
+    results=[]
+    for index,board in chunk:
+        start=time.time()
+        deadline=None if timeout is None else start+timeout
+        try:
+            result=solveSudoku(board,deadline=deadline,**kwargs)
+            results.append(BatchResult(index,result[0],result[1],
+                                       budgetError(result),time.time()-start))
+        except Exception as e:
+            results.append(BatchResult(index,None,None,repr(e),
+                                       time.time()-start))
+    return results
+
+'''-----------------------------------------------------------------------------
+-----------------------------------WORKER POOL----------------------------------
+-----------------------------------------------------------------------------'''
+
+class WorkerPool(object):
+    def __init__(self,workers,**kwargs):
+        '''
+        Params:
+            workers - int; number of worker processes.
+            Any keyword arguments are passed on to ProcessPoolExecutor.
+        Returns:
+            None. Used like a ProcessPoolExecutor, except that losing a worker
+            does not end it.
+        '''
+        self.workers=workers
+        self.kwargs=kwargs
+        self.executor=concurrent.futures.ProcessPoolExecutor(workers,**kwargs)
+
+    def submit(self,fn,*args):
+        '''
+        Params:
+            fn - function; run in a worker with args.
+        Returns:
+            A concurrent.futures.Future of the call. A dead worker breaks the
+            pool, failing every task in it with BrokenProcessPool, so tasks
+            sent after that go to a new pool.
+        '''
+        try: return self.executor.submit(fn,*args)
+        except concurrent.futures.process.BrokenProcessPool:
+            # The threads of the broken pool are joined before new workers
+            # are forked, so no worker starts with one of their locks held.
+            self.executor.shutdown(wait=True)
+            self.executor=concurrent.futures.ProcessPoolExecutor(
+                self.workers,**self.kwargs)
+            return self.executor.submit(fn,*args)
+
+    def shutdown(self,wait=True,cancel_futures=False):
+        self.executor.shutdown(wait,cancel_futures=cancel_futures)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exc):
+        self.shutdown()
+
+'''-----------------------------------------------------------------------------
+--------------------------------------BATCH-------------------------------------
+-----------------------------------------------------------------------------'''
+
+def iterSolveMany(boards,workers=None,chunksize=1,timeout=None,**kwargs):
+    '''
+    Params:
+        boards - iterable; 2-dimensional lists containing the boards to be
+                 solved. Consumed lazily.
+        [workers] - int; number of worker processes, defaults to the number of
+                    CPUs.
+        [chunksize] - int; number of puzzles sent to a worker at a time.
+        [timeout] - float; seconds allowed per puzzle, or None for no limit.
+        Any other keyword arguments are passed on to solveSudoku().
+    Returns:
+        A generator yielding a BatchResult for each board as it completes. At
+        most a few chunks per worker are in flight at once, so memory does not
+        grow with the size of the batch.
+    '''
+    if workers is None: workers=os.cpu_count() or 1
+    indexed=enumerate(boards)
+    with WorkerPool(workers) as executor:
+        pending={}
+        def submit():
+            chunk=list(itertools.islice(indexed,chunksize))
+            if chunk==[]: return False
+            future=executor.submit(solveChunk,chunk,timeout,kwargs)
+            pending[future]=chunk
+            return True
+        for _ in range(2*workers):
+            if not submit(): break
+        while pending:
+            done,_=concurrent.futures.wait(
+                pending,return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                chunk=pending.pop(future)
+                try: results=future.result()
+                except Exception as e:
+                    # The worker itself died, so fail the whole chunk. The
+                    # pool is replaced for the chunks sent after it.
+                    results=[BatchResult(index,None,None,repr(e))
+                             for index,_ in chunk]
+                for result in results: yield result
+                submit()
+
+def solveMany(boards,workers=None,chunksize=1,timeout=None,ordered=True,
+              **kwargs):
+    '''
+    Params:
+        boards - iterable; 2-dimensional lists containing the boards to be
+                 solved.
+        [workers] - int; number of worker processes, defaults to the number of
+                    CPUs.
+        [chunksize] - int; number of puzzles sent to a worker at a time.
+        [timeout] - float; seconds allowed per puzzle, or None for no limit.
+        [ordered] - bool; if True, returns a list of BatchResult in input order
+                    once every puzzle is done. If False, returns a generator
+                    streaming them as they complete (see iterSolveMany()).
+        Any other keyword arguments are passed on to solveSudoku().
+    Returns:
+        The BatchResult of every board, as described for ordered.
+    '''
+    results=iterSolveMany(boards,workers,chunksize,timeout,**kwargs)
+    if not ordered: return results
+    return sorted(results,key=lambda result:result.index)
+
+'''-----------------------------------------------------------------------------
+---------------------------------PARALLEL SEARCH--------------------------------
+-----------------------------------------------------------------------------'''
+
+def splitSearch(board,n,target,heuristic='mrv',valueorder='natural'):
+    '''
+    Params:
+        board - list; 2-dimensional list containing the board to be split. Not
+                modified.
+        n - int; order of the Sudoku puzzle.
+        target - int; number of subproblems wanted.
+        [heuristic] - str; key of HEURISTICS choosing the cell to guess next.
+        [valueorder] - str; key of VALUEORDERS ordering the guesses for it.
+    Returns:
+        A tuple (solution,subproblems). The top levels of the backtrack search
+        are expanded breadth first, propagating after every guess, until there
+        are at least target live subproblems. subproblems is a list of tuples
+        (board,steps) in the order the backtrack engine would visit them, with
+        steps the placements leading there from board. If a solution turns up
+        while splitting, it is returned as (board,steps) with no subproblems;
+        otherwise solution is None.
+    '''
+    s=Sudoku([list(row) for row in board],n)
+    if not s.isValid(): return None,[]
+    steps=fillBoard(s)
+    if not s.isValidSince(0): return None,[]
+    if s.isFull(): return (s.board,steps),[]
+    subproblems=[(s.board,steps)]
+    while 0<len(subproblems)<target:
+        expanded=[]
+        for sub,substeps in subproblems:
+            s=Sudoku([list(row) for row in sub],n)
+            row,col=nextChoice(s,heuristic)
+            if row==-1: continue
+            for num in VALUEORDERS[valueorder](s,row,col):
+                mark=s.getTrailMark()
+                s.setCell(row,col,num)
+                if s.isValidSince(mark):
+                    guessed=substeps+[(row,col,num,0)]
+                    guessed+=fillBoard(s,s.getCellUnits(row,col))
+                    if s.isValidSince(mark):
+                        if s.isFull(): return (s.board,guessed),[]
+                        expanded.append(([list(r) for r in s.board],guessed))
+                s.undoTrail(mark)
+        subproblems=expanded
+    return None,subproblems
+
+# Flag shared with the parent, set once solveParallel() needs no more searching;
+# set in each worker process by initSearchWorker().
+SEARCH_STOP=None
+
+def initSearchWorker(stop):
+    '''
+    Params:
+        stop - multiprocessing.Value; the stop flag of one solveParallel().
+    Returns:
+        None, keeps stop for solveSubproblem() in this worker process.
+    '''
+    global SEARCH_STOP
+    SEARCH_STOP=stop
+
+class StopFlag(object):
+    def __init__(self,stop):
+        '''
+        Params:
+            stop - multiprocessing.Value; shared stop flag.
+        Returns:
+            None. Passed to solveSudoku() as its cancel option, reading the
+            flag from shared memory at every node.
+        '''
+        self.stop=stop
+
+    def is_set(self):
+        return self.stop.value!=0
+
+def solveSubproblem(task):
+    '''
+    Params:
+        task - tuple; (index,board,heuristic,valueorder) as sent to a worker
+               process.
+    Returns:
+        A tuple (index,solved,steps) from solving board with solveSudoku(),
+        with solved None if there is no solution or the search was stopped.
+    '''
+    index,board,heuristic,valueorder=task
+    cancel=None if SEARCH_STOP is None else StopFlag(SEARCH_STOP)
+    result=solveSudoku(board,'backtrack',heuristic,valueorder,cancel=cancel)
+    if isinstance(result,BudgetExhausted): return index,None,None
+    solved,steps=result
+    return index,solved,steps
+
+def solveParallel(board,workers=None,split=None,heuristic='mrv',
+                  valueorder='natural'):
+    '''
+    Params:
+        board - list; 2-dimensional list containing the board to be solved.
+                Not modified.
+        [workers] - int; number of worker processes, defaults to the number of
+                    CPUs.
+        [split] - int; number of subproblems the search is split into,
+                  defaults to 8 per worker.
+        [heuristic] - str; key of HEURISTICS choosing the cell to guess next.
+        [valueorder] - str; key of VALUEORDERS ordering the guesses for it.
+    Returns:
+        As for solveSudoku() with the backtrack engine: the completed board and
+        list of steps if there exists a solution, otherwise (None,None). The
+        search of one board is split by splitSearch() and the subproblems are
+        solved on a process pool.
+    '''
+    n=round(len(board)**0.5)
+    if n**2!=len(board): raise Exception("Board dims are not square numbers.")
+    if heuristic not in HEURISTICS:
+        raise Exception("Unknown heuristic %s."%heuristic)
+    if valueorder not in VALUEORDERS:
+        raise Exception("Unknown value order %s."%valueorder)
+    if workers is None: workers=os.cpu_count() or 1
+    if split is None: split=8*workers
+    solution,subproblems=splitSearch(board,n,split,heuristic,valueorder)
+    if solution is not None: return solution
+    if subproblems==[]: return (None,None)
+    # Subtrees differ wildly in size, so there are many more subproblems than
+    # workers and each idle worker takes the next one from the shared queue.
+    # As soon as any subproblem is solved, the ones still queued are dropped
+    # and the stop flag ends the searches still running elsewhere at their
+    # next node, rather than terminating the workers, which can deadlock a
+    # multiprocessing.Pool.
+    tasks=[(index,sub,heuristic,valueorder)
+           for index,(sub,_) in enumerate(subproblems)]
+    stop=multiprocessing.Value('b',0,lock=False)
+    with concurrent.futures.ProcessPoolExecutor(
+            min(workers,len(tasks)),initializer=initSearchWorker,
+            initargs=(stop,)) as executor:
+        futures=[executor.submit(solveSubproblem,task) for task in tasks]
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                index,solved,steps=future.result()
+                if solved is not None:
+                    return (solved,subproblems[index][1]+steps)
+            return (None,None)
+        finally:
+            stop.value=1
+            for future in futures: future.cancel()
@@ -0,0 +1,346 @@
+'''
+This file contains a benchmark harness for the solver engines. Each engine is
+run on graded corpora of puzzles with warm-up and repeated timings, and the
+latency percentiles, throughput and peak memory are reported, saved as JSON and
+compared against a baseline from an earlier run. Run it as:
+
+$ python -m puzzlesolver.benchmark_sudoku -o results.json --baseline base.json
+'''
+import argparse
+import copy
+import itertools
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from puzzlesolver.solve_sudoku import *
+from puzzlesolver.generate_sudoku import generatePuzzle,randomGrid
+from puzzlesolver.solve import parseLine
+
+# Well known hard 9x9 puzzles that need search: Arto Inkala's, AI Escargot,
+# Easter Monster and the hard puzzle of testSudoku().
+HARD=['8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1'
+      '..9....4..',
+      '1....7.9..3..2...8..96..5....53..9...1..8...26....4...3......1..4.....'
+      '.7..7...3..',
+      '1.......2.9.4...5...6...7...5.9.3.......7.......85..4.7.....6...3...9.'
+      '8...2.....1',
+      '.......4.1...7.....5.....9.2.......1...9.5....8...4....4.......'
+      '....2.6...96.....7']
+
+# 9x9 puzzles with 17 clues, the fewest a puzzle with a unique solution can
+# have.
+MINIMAL=['4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.'
+         '....1.4......',
+         '.......1.4.........2...........5.4.7..8...3....1.9....3..4..2...5.1.'
+         '.......8.6...',
+         '.......1.4.........2...........5.6.4..8...3....1.9....3..4..2...5.1.'
+         '.......8.7...',
+         '.......12....35......6...7.7.....3.....4..8..1...........12.....8...'
+         '..4..5....6..',
+         '.......12..36..........7...41..2.......5..3..7.....6..28.....4....3.'
+         '.5...........',
+         '.......12..8.3...........4.12.5..........47...6.......5.7...3.....62'
+         '.......1.....',
+         '.......12.4..5.........9....7.6..4.....1............5.....875..6.1..'
+         '.3..2........',
+         '.......12.5.4............3.7..6..4....1..........8....92....8.....51'
+         '.7.......3...',
+         '.......123......6.....4....9.....5.......1.7..2..........35.4....14.'
+         '.8...6.......',
+         '.......124...9...........5..7.2.....6.....4.....1.8....18..........3'
+         '.7..5.2......']
+
+'''-----------------------------------------------------------------------------
+-------------------------------------CORPORA------------------------------------
+-----------------------------------------------------------------------------'''
+
+def sparseBoards(n,count,keep,seed):
+    '''
+    Params:
+        n - int; order of the boards.
+        count - int; number of boards.
+        keep - float; chance of each cell of a random full grid being kept.
+        seed - int; seed making the boards reproducible.
+    Returns:
+        A list of count boards, each with a unique solution: while a board has
+        a second one, a cell where the two differ is given back from the grid.
+    '''
+    rng=random.Random(seed)
+    N=n**2
+    boards=[]
+    for i in range(count):
+        grid=randomGrid(n,rng)
+        board=[[num if rng.random()<keep else 0 for num in row]
+               for row in grid]
+        while True:
+            solutions=list(itertools.islice(iterSolutions(board),2))
+            if len(solutions)<2: break
+            other=solutions[0] if solutions[0]!=grid else solutions[1]
+            row,col=rng.choice([(row,col) for row in range(N)
+                                for col in range(N)
+                                if other[row][col]!=grid[row][col]])
+            board[row][col]=grid[row][col]
+        boards.append(board)
+    return boards
+
+# Each corpus maps to a function of (count,seed) returning its boards; the
+# literal corpora ignore both.
+CORPORA={
+    'easy':lambda count,seed:[generatePuzzle(3,seed=seed+i,search=False)[0]
+                              for i in range(count)],
+    'hard':lambda count,seed:[parseLine(line) for line in HARD],
+    'minimal':lambda count,seed:[parseLine(line) for line in MINIMAL],
+    '16x16':lambda count,seed:sparseBoards(4,count,0.5,seed),
+    '25x25':lambda count,seed:sparseBoards(5,count,0.6,seed)}
+
+def buildCorpus(name,count=10,seed=0):
+    '''
+    Params:
+        name - str; key of CORPORA.
+        [count] - int; number of boards in the generated corpora.
+        [seed] - int; seed of the generated corpora.
+    Returns:
+        The list of boards of the corpus, the same on every call.
+    '''
+    if name not in CORPORA: raise Exception("Unknown corpus %s."%name)
+    return CORPORA[name](count,seed)
+
+'''-----------------------------------------------------------------------------
+------------------------------------BENCHMARK-----------------------------------
+-----------------------------------------------------------------------------'''
+
+def percentile(values,fraction):
+    '''
+    Params:
+        values - list; numbers, sorted in increasing order.
+        fraction - float; between 0 and 1.
+    Returns:
+        The value below which fraction of values lie, interpolating linearly
+        between neighbours.
+    '''
+    if values==[]: return 0.0
+    where=fraction*(len(values)-1)
+    low=int(where)
+    high=min(low+1,len(values)-1)
+    return values[low]+(values[high]-values[low])*(where-low)
+
+def benchmarkEngine(boards,engine,repeat=3,warmup=1,timeout=10.0,trace=True,
+                    **kwargs):
+    '''
+    Params:
+        boards - list; 2-dimensional lists containing the boards to be solved.
+                 Not modified.
+        engine - str; one of ENGINES.
+        [repeat] - int; number of timed runs of each board.
+        [warmup] - int; number of untimed runs of each board before them.
+        [timeout] - float; seconds allowed per run of a board.
+        [trace] - bool; passed on to solveSudoku() in every run, warm-up
+                  included, so the warm-up runs the code that is timed.
+        Any other keyword arguments are passed on to solveSudoku().
+    Returns:
+        A dict of the measurements: the number of boards, how many were solved
+        and how many ran out of time; the median, 90th and 99th percentile and
+        largest of the per-board latencies in seconds, each the median of its
+        runs; puzzles per second from their sum; and the peak memory in bytes
+        allocated while solving any one board, from a separate untimed run.
+    '''
+    latencies=[]
+    solved=timeouts=0
+    for board in boards:
+        for _ in range(warmup):
+            solveSudoku(copy.deepcopy(board),engine,deadline=time.time()+
+                        timeout,trace=trace,**kwargs)
+        runs=[]
+        for _ in range(repeat):
+            copied=copy.deepcopy(board)
+            start=time.perf_counter()
+            result=solveSudoku(copied,engine,deadline=time.time()+timeout,
+                               trace=trace,**kwargs)
+            runs.append(time.perf_counter()-start)
+        runs.sort()
+        latencies.append(runs[len(runs)//2])
+        if isinstance(result,BudgetExhausted): timeouts+=1
+        elif result[0] is not None: solved+=1
+    peak=0
+    for board in boards:
+        copied=copy.deepcopy(board)
+        tracemalloc.start()
+        solveSudoku(copied,engine,deadline=time.time()+timeout,trace=trace,
+                    **kwargs)
+        peak=max(peak,tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    latencies.sort()
+    total=sum(latencies)
+    return {'count':len(boards),'solved':solved,'timeouts':timeouts,
+            'median':percentile(latencies,0.5),
+            'p90':percentile(latencies,0.9),
+            'p99':percentile(latencies,0.99),
+            'max':latencies[-1] if latencies else 0.0,
+            'puzzlespersecond':len(boards)/total if total>0 else 0.0,
+            'peakmemory':peak}
+
+def runBenchmark(corpora=None,engines=None,count=10,seed=0,repeat=3,
+                 warmup=1,timeout=10.0,progress=None,trace=True,**kwargs):
+    '''
+    Params:
+        [corpora] - list; keys of CORPORA to run, defaults to all.
+        [engines] - list; engines from ENGINES to run, defaults to all.
+        [count],[seed] - as for buildCorpus().
+        [repeat],[warmup],[timeout],[trace] - as for benchmarkEngine().
+        [progress] - function; if given, called with (corpus,engine,measures)
+                     as each finishes.
+        Any other keyword arguments are passed on to solveSudoku().
+    Returns:
+        A dict with 'meta', describing the run and the machine, and 'results',
+        mapping each corpus to a dict of the measurements of each engine.
+    '''
+    if corpora is None: corpora=list(CORPORA)
+    if engines is None: engines=list(ENGINES)
+    results={}
+    for corpus in corpora:
+        boards=buildCorpus(corpus,count,seed)
+        results[corpus]={}
+        for engine in engines:
+            measures=benchmarkEngine(boards,engine,repeat,warmup,timeout,
+                                     trace,**kwargs)
+            results[corpus][engine]=measures
+            if progress is not None: progress(corpus,engine,measures)
+    return {'meta':{'python':platform.python_version(),
+                    'machine':platform.machine(),'platform':platform.platform(),
+                    'date':time.strftime('%Y-%m-%d %H:%M:%S'),'count':count,
+                    'seed':seed,'repeat':repeat,'warmup':warmup,
+                    'timeout':timeout,'trace':trace},
+            'results':results}
+
+'''-----------------------------------------------------------------------------
+-----------------------------------REGRESSIONS----------------------------------
+-----------------------------------------------------------------------------'''
+
+# Measurements compared against a baseline, and whether higher is better.
+TRACKED=(('median',False),('p90',False),('puzzlespersecond',True),
+         ('peakmemory',False))
+
+# Fields of the meta of a run that decide which puzzles are solved and how, so
+# runs that differ in any of them cannot be compared.
+MATCHED=('count','seed','trace')
+
+def saveResults(results,path):
+    '''
+    Params:
+        results - dict; as returned by runBenchmark().
+        path - str; JSON file to be written.
+    Returns:
+        None.
+    '''
+    with open(path,'w') as f: json.dump(results,f,indent=2,sort_keys=True)
+
+def loadResults(path):
+    '''
+    Params:
+        path - str; JSON file written by saveResults().
+    Returns:
+        The results dict stored in it.
+    '''
+    with open(path) as f: return json.load(f)
+
+def compareResults(current,baseline,tolerance=0.1):
+    '''
+    Params:
+        current - dict; as returned by runBenchmark().
+        baseline - dict; as returned by runBenchmark(), from an earlier run.
+        [tolerance] - float; relative change allowed before a measurement
+                      counts as changed.
+    Returns:
+        A list of tuples (corpus,engine,measure,old,new,change) for every
+        TRACKED measurement of a corpus and engine found in both, where change
+        is the relative change from old to new, positive when it got worse,
+        and a list of those whose change exceeds tolerance. Raises an Exception
+        if the runs differ in a field of MATCHED that both record.
+    '''
+    new,old=current.get('meta',{}),baseline.get('meta',{})
+    differ=[field for field in MATCHED
+            if field in new and field in old and new[field]!=old[field]]
+    if differ:
+        raise Exception("Baseline differs in %s, so it ran other puzzles or "
+                        "other code."%', '.join('%s (%r, now %r)'%(
+                            field,old[field],new[field]) for field in differ))
+    changes,regressions=[],[]
+    for corpus,engines in sorted(current['results'].items()):
+        for engine,measures in sorted(engines.items()):
+            old=baseline['results'].get(corpus,{}).get(engine)
+            if old is None: continue
+            for measure,higher in TRACKED:
+                before,after=old[measure],measures[measure]
+                if before==0: continue
+                change=(after-before)/before
+                if higher: change=-change
+                item=(corpus,engine,measure,before,after,change)
+                changes.append(item)
+                if change>tolerance: regressions.append(item)
+    return changes,regressions
+
+'''-----------------------------------------------------------------------------
+-------------------------------------MAIN---------------------------------------
+-----------------------------------------------------------------------------'''
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(prog='python -m puzzlesolver.'
+                                   'benchmark_sudoku',description='Benchmark '
+                                   'the solver engines on graded corpora.')
+    parser.add_argument('--corpus',action='append',choices=list(CORPORA),
+                        help='corpus to run, may be repeated (default: all)')
+    parser.add_argument('--engine',action='append',choices=ENGINES,
+                        help='engine to run, may be repeated (default: all)')
+    parser.add_argument('--count',type=int,default=10,
+                        help='boards per generated corpus (default: 10)')
+    parser.add_argument('--seed',type=int,default=0)
+    parser.add_argument('--repeat',type=int,default=3,
+                        help='timed runs of each board (default: 3)')
+    parser.add_argument('--warmup',type=int,default=1,
+                        help='untimed runs of each board first (default: 1)')
+    parser.add_argument('--timeout',type=float,default=10.0,
+                        help='seconds allowed per run (default: 10)')
+    parser.add_argument('--no-trace',dest='trace',action='store_false',
+                        help='solve without recording the steps')
+    parser.add_argument('-o','--output',default=None,
+                        help='JSON file to save the results in')
+    parser.add_argument('--baseline',default=None,
+                        help='JSON file of earlier results to compare with')
+    parser.add_argument('--tolerance',type=float,default=0.1,
+                        help='relative change counted as a regression '
+                        '(default: 0.1)')
+    args=parser.parse_args(argv)
+    def report(corpus,engine,measures):
+        sys.stdout.write('%-8s %-9s %3d/%-3d solved  median %8.4f s  p90 '
+                         '%8.4f s  p99 %8.4f s  %9.1f puzzles/s  peak %7.1f '
+                         'KiB\n'%(corpus,engine,measures['solved'],
+                                  measures['count'],measures['median'],
+                                  measures['p90'],measures['p99'],
+                                  measures['puzzlespersecond'],
+                                  measures['peakmemory']/1024))
+        sys.stdout.flush()
+    results=runBenchmark(args.corpus,args.engine,args.count,args.seed,
+                         args.repeat,args.warmup,args.timeout,report,
+                         args.trace)
+    if args.output is not None: saveResults(results,args.output)
+    if args.baseline is None: return 0
+    try:
+        changes,regressions=compareResults(results,loadResults(args.baseline),
+                                           args.tolerance)
+    except Exception as e:
+        sys.stderr.write('%s\n'%e)
+        return 2
+    for corpus,engine,measure,before,after,change in changes:
+        if abs(change)<=args.tolerance: continue
+        sys.stdout.write('%-8s %-9s %-16s %12.4f -> %12.4f  %+7.1f%%  %s\n'%(
+            corpus,engine,measure,before,after,100*(after-before)/before,
+            'worse' if change>0 else 'better'))
+    sys.stdout.write('%d regressions beyond %.0f%%\n'%(len(regressions),
+                                                       100*args.tolerance))
+    return 1 if regressions else 0
+
+if __name__=='__main__':
+    sys.exit(main())
@@ -0,0 +1,233 @@
+'''
+This file contains an exact cover solver (Knuth's Algorithm X using Dancing
+Links) for a sudoku puzzle given in a 2-dimensional list of integers. Every
+cell, row, column and box constraint is a column of the cover matrix, and every
+possible (row,col,num) entry is a row of it.
+'''
+
+'''-----------------------------------------------------------------------------
+-------------------------------DANCING LINKS CLASS------------------------------
+-----------------------------------------------------------------------------'''
+
+class DancingLinks(object):
+    def __init__(self,board,n=3):
+        '''
+        Params:
+            board - list; square and 2-dimensional with dimensions n**2 x n**2;
+                    each element must be an int, with 0 for an empty cell.
+            [n] - int; order of the Sudoku puzzle.
+        Returns:
+            None.
+        '''
+        N=n**2
+        self.n=n
+        self.valid=True
+        # Constraint columns satisfied by the given numbers are left out of
+        # the matrix entirely; a repeated given makes the board unsolvable.
+        satisfied=[False]*(4*N*N)
+        for row in range(N):
+            for col in range(N):
+                if board[row][col]!=0:
+                    for k in self.constraints(row,col,board[row][col]-1):
+                        if satisfied[k]: self.valid=False
+                        satisfied[k]=True
+        # Node 0 is the root, nodes 1..ncols are column headers and the rest
+        # are the entries of each option (4 per option, one per constraint).
+        self.L,self.R,self.U,self.D,self.C=[0],[0],[0],[0],[0]
+        self.S,self.kind,self.option=[0],[0],[None]
+        header=[0]*(4*N*N)
+        for k in range(4*N*N):
+            if satisfied[k]: continue
+            node=len(self.L)
+            header[k]=node
+            self.L.append(node-1);self.R.append(0);self.R[node-1]=node
+            self.U.append(node);self.D.append(node);self.C.append(node)
+            self.S.append(0);self.kind.append(k//(N*N)+1)
+            self.option.append(None)
+            self.L[0]=node
+        for row in range(N):
+            for col in range(N):
+                if board[row][col]!=0: continue
+                for num in range(N):
+                    cols=[header[k] for k in self.constraints(row,col,num)]
+                    if 0 in cols: continue
+                    self.addOption(cols,(row,col,num+1))
+
+    def constraints(self,row,col,num):
+        '''
+        Params:
+            row - int; row of the entry.
+            col - int; col of the entry.
+            num - int; zero-based number of the entry.
+        Returns:
+            A tuple of the 4 constraint indices (cell, row, col and box) that
+            placing num+1 at (row,col) satisfies.
+        '''
+        n,N=self.n,self.n**2
+        box=(row//n)*n+col//n
+        return (row*N+col,N*N+row*N+num,2*N*N+col*N+num,3*N*N+box*N+num)
+
+    def addOption(self,cols,entry):
+        '''
+        Params:
+            cols - list; column header nodes covered by the option.
+            entry - tuple; (row,col,num) that the option corresponds to.
+        Returns:
+            None, links a new option into the bottom of each of cols.
+        '''
+        first=len(self.L)
+        for i,c in enumerate(cols):
+            node=first+i
+            self.L.append(first+(i-1)%len(cols))
+            self.R.append(first+(i+1)%len(cols))
+            self.U.append(self.U[c]);self.D.append(c);self.C.append(c)
+            self.D[self.U[c]]=node;self.U[c]=node
+            self.S[c]+=1
+            self.option.append(entry)
+
+    def cover(self,c):
+        '''
+        Params:
+            c - int; column header node to be covered.
+        Returns:
+            None, unlinks the column and every option intersecting it.
+        '''
+        L,R,U,D,C,S=self.L,self.R,self.U,self.D,self.C,self.S
+        R[L[c]]=R[c];L[R[c]]=L[c]
+        i=D[c]
+        while i!=c:
+            j=R[i]
+            while j!=i:
+                D[U[j]]=D[j];U[D[j]]=U[j]
+                S[C[j]]-=1
+                j=R[j]
+            i=D[i]
+
+    def uncover(self,c):
+        '''
+        Params:
+            c - int; column header node to be uncovered.
+        Returns:
+            None, exactly reverses cover(c).
+        '''
+        L,R,U,D,C,S=self.L,self.R,self.U,self.D,self.C,self.S
+        i=U[c]
+        while i!=c:
+            j=L[i]
+            while j!=i:
+                S[C[j]]+=1
+                D[U[j]]=j;U[D[j]]=j
+                j=L[j]
+            i=U[i]
+        R[L[c]]=c;L[R[c]]=c
+
+    def chooseColumn(self):
+        '''
+        Params:
+            None.
+        Returns:
+            The uncovered column header node with the fewest options left.
+        '''
+        R,S=self.R,self.S
+        best,bestsize=0,None
+        c=R[0]
+        while c!=0:
+            if bestsize is None or S[c]<bestsize:
+                best,bestsize=c,S[c]
+                if bestsize<=1: break
+            c=R[c]
+        return best
+
+    def search(self,trace=True,tick=None):
+        '''
+        Params:
+            [trace] - bool; if False, no steps are recorded and None is yielded
+                      for each solution instead.
+            [tick] - function; if given, called with no arguments each time an
+                     option is chosen. An exception it raises ends the search.
+        Returns:
+            A generator yielding, for each solution, a list of tuples
+            (row,col,elem,type) in the order the entries were chosen. Type 0
+            indicates a guess; types 1,2,3,4 indicate that the entry was the
+            only option left for its cell, row, col or box respectively.
+        '''
+        if not self.valid: return
+        R,D,L,C=self.R,self.D,self.L,self.C
+        chosen,steps=[],[]
+        # The nodes of the options chosen so far, read by solveDLX() when no
+        # steps are recorded.
+        self.chosen=chosen
+        # Iterative Algorithm X, so deep searches cannot hit Python's
+        # recursion limit.
+        while True:
+            if R[0]==0:
+                yield list(steps) if trace else None
+                r=None
+            else:
+                c=self.chooseColumn()
+                self.cover(c)
+                r=D[c]
+                forced=self.S[c]==1
+                if trace: steps.append(None)
+            while True:
+                if r is not None and r!=C[r]:
+                    if trace:
+                        row,col,num=self.option[r]
+                        kind=self.kind[C[r]] if forced else 0
+                        steps[-1]=(row,col,num,kind)
+                    if tick is not None: tick()
+                    chosen.append(r)
+                    j=R[r]
+                    while j!=r:
+                        self.cover(C[j]);j=R[j]
+                    break
+                if r is not None:
+                    # Column exhausted: undo its cover and backtrack a level.
+                    self.uncover(r)
+                    if trace: steps.pop()
+                if chosen==[]: return
+                r=chosen.pop()
+                j=L[r]
+                while j!=r:
+                    self.uncover(C[j]);j=L[j]
+                r=D[r]
+                forced=False
+
+'''-----------------------------------------------------------------------------
+------------------------------------SOLVER--------------------------------------
+-----------------------------------------------------------------------------'''
+
+def solveDLX(board,n=3,tick=None,trace=True):
+    '''
+    Params:
+        board - list; 2-dimensional list containing the board to be solved.
+        [n] - int; order of the Sudoku puzzle.
+        [tick] - function; as for DancingLinks.search().
+        [trace] - bool; if False, the search records no steps, and the entries
+                  of the solution are returned as type 0 instead.
+    Returns:
+        A list of tuples (row,col,elem,type) that fill in the board if there
+        exists a solution, otherwise None. The board itself is not modified.
+    '''
+    links=DancingLinks(board,n)
+    for steps in links.search(trace,tick):
+        if trace: return steps
+        return [links.option[r]+(0,) for r in links.chosen]
+    return None
+
+def countDLX(board,n=3,limit=None):
+    '''
+    Params:
+        board - list; 2-dimensional list containing the board to be counted.
+        [n] - int; order of the Sudoku puzzle.
+        [limit] - int; stop counting once this many solutions are found. 0
+                  or less counts none.
+    Returns:
+        The number of solutions of the board, up to limit.
+    '''
+    if limit is not None and limit<=0: return 0
+    count=0
+    for _ in DancingLinks(board,n).search(False):
+        count+=1
+        if count==limit: break
+    return count
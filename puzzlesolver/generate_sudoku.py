@@ -0,0 +1,196 @@
+'''
+This file contains the helper functions for generating sudoku puzzles of order
+2 to 5 with a unique solution: a random full grid is made first, then clues are
+removed for as long as the puzzle keeps a single solution.
+'''
+import concurrent.futures
+import os
+import random
+from puzzlesolver.solve_sudoku import *
+from puzzlesolver.dlx_sudoku import solveDLX
+
+SYMMETRIES=(None,'rotational','mirror','diagonal')
+
+class GenerationFailed(Exception):
+    pass
+
+'''-----------------------------------------------------------------------------
+---------------------------GENERATOR HELPER FUNCTIONS---------------------------
+-----------------------------------------------------------------------------'''
+
+def randomGrid(n,rng):
+    '''
+    Params:
+        n - int; order of the Sudoku puzzle.
+        rng - random.Random; source of randomness.
+    Returns:
+        A random completed board of order n as a 2-dimensional list. The boxes
+        on the diagonal share no row or col, so they are filled with random
+        permutations and the rest of the board is solved from them. A few of
+        these fillings cannot be completed when n is 2, and are redrawn.
+    '''
+    N=n**2
+    while True:
+        board=[[0]*N for i in range(N)]
+        for box in range(n):
+            nums=list(range(1,N+1))
+            rng.shuffle(nums)
+            for i,num in enumerate(nums):
+                board[box*n+i//n][box*n+i%n]=num
+        steps=solveDLX(board,n)
+        if steps is not None: break
+    for row,col,num,_ in steps: board[row][col]=num
+    return board
+
+def checkOptions(n,symmetry):
+    '''
+    Params:
+        n - int; order of the Sudoku puzzle.
+        symmetry - str; one of SYMMETRIES.
+    Returns:
+        None. Raises an Exception if n is not between 2 and 5 or symmetry is
+        not one of SYMMETRIES.
+    '''
+    if not 2<=n<=5: raise Exception("Order must be between 2 and 5.")
+    if symmetry not in SYMMETRIES:
+        raise Exception("Unknown symmetry %s."%symmetry)
+
+def symmetricOrbits(n,symmetry):
+    '''
+    Params:
+        n - int; order of the Sudoku puzzle.
+        symmetry - str; one of SYMMETRIES.
+    Returns:
+        A list of lists of cells (row,col) that must be removed together to
+        keep the clue pattern symmetric: 180 degree rotation for 'rotational',
+        left-right reflection for 'mirror' and reflection in the main diagonal
+        for 'diagonal'. Every cell is in its own list for None.
+    '''
+    N=n**2
+    checkOptions(n,symmetry)
+    mirror={None:lambda row,col:(row,col),
+            'rotational':lambda row,col:(N-1-row,N-1-col),
+            'mirror':lambda row,col:(row,N-1-col),
+            'diagonal':lambda row,col:(col,row)}[symmetry]
+    orbits,seen=[],set()
+    for row in range(N):
+        for col in range(N):
+            if (row,col) in seen: continue
+            orbit=sorted({(row,col),mirror(row,col)})
+            seen.update(orbit)
+            orbits.append(orbit)
+    return orbits
+
+def isForced(puzzle,n):
+    '''
+    Params:
+        puzzle - list; 2-dimensional list containing the board to be checked.
+                 Not modified.
+        n - int; order of the Sudoku puzzle.
+    Returns:
+        True if singleton and unique cell searches alone complete the board,
+        which proves the solution is unique without any search.
+    '''
+    s=Sudoku([list(row) for row in puzzle],n)
+    if not s.isValid(): return False
+    propagate(s,None,False)
+    return s.isFull() and s.isValid()
+
+'''-----------------------------------------------------------------------------
+-----------------------------------GENERATOR------------------------------------
+-----------------------------------------------------------------------------'''
+
+def generatePuzzle(n=3,symmetry=None,minclues=None,maxclues=None,seed=None,
+                   attempts=20,search=None):
+    '''
+    Params:
+        [n] - int; order of the Sudoku puzzle, between 2 and 5 inclusive.
+        [symmetry] - str; one of SYMMETRIES that the clue pattern must keep.
+        [minclues] - int; never remove clues below this number.
+        [maxclues] - int; retry with a new grid if more clues than this are
+                     left once no more can be removed.
+        [seed] - int; seed making the puzzle reproducible.
+        [attempts] - int; number of grids tried before giving up on maxclues.
+        [search] - bool; if False, a clue is only removed when singleton and
+                   unique cell searches alone still solve the puzzle, so the
+                   puzzle needs no guessing. Otherwise a full uniqueness search
+                   decides, which leaves fewer clues but takes minutes per
+                   puzzle at order 4 and more at order 5. Defaults to True up
+                   to order 3 only.
+    Returns:
+        A tuple (puzzle,solution) of 2-dimensional lists, where puzzle has a
+        unique solution. Raises GenerationFailed if maxclues could not be met.
+    '''
+    checkOptions(n,symmetry)
+    rng=random.Random(seed)
+    orbits=symmetricOrbits(n,symmetry)
+    if minclues is None: minclues=0
+    if search is None: search=n<=3
+    for attempt in range(attempts):
+        solution=randomGrid(n,rng)
+        puzzle=[list(row) for row in solution]
+        clues=n**4
+        rng.shuffle(orbits)
+        for orbit in orbits:
+            if clues-len(orbit)<minclues: continue
+            for row,col in orbit: puzzle[row][col]=0
+            # Most removals early on leave a puzzle that propagation alone
+            # solves, so the full uniqueness search is only run when it stalls.
+            if isForced(puzzle,n) or (search and hasUniqueSolution(puzzle)):
+                clues-=len(orbit)
+            else:
+                for row,col in orbit: puzzle[row][col]=solution[row][col]
+        if maxclues is None or clues<=maxclues: return puzzle,solution
+    raise GenerationFailed("No puzzle with at most %d clues in %d attempts."%
+                           (maxclues,attempts))
+
+def generateTask(args):
+    '''
+    Params:
+        args - tuple; (n,symmetry,minclues,maxclues,seed,attempts,search) for
+               generatePuzzle(), as sent to a worker process.
+    Returns:
+        The tuple (puzzle,solution), or None if generatePuzzle() could not
+        meet maxclues. Any other error is raised.
+    '''
+    try: return generatePuzzle(*args)
+    except GenerationFailed: return None
+
+def generatePuzzles(count,n=3,symmetry=None,minclues=None,maxclues=None,
+                    seed=None,workers=None,chunksize=1,attempts=20,
+                    search=None):
+    '''
+    Params:
+        count - int; number of puzzles to generate.
+        [n],[symmetry],[minclues],[maxclues],[attempts],[search] - as for
+            generatePuzzle().
+        [seed] - int; if given, puzzle i is generated with seed seed+i, so the
+                 whole bank is reproducible regardless of the number of
+                 workers.
+        [workers] - int; number of worker processes, defaults to the number of
+                    CPUs.
+        [chunksize] - int; number of puzzles sent to a worker at a time.
+    Returns:
+        A generator yielding count tuples (puzzle,solution) in order, with None
+        in place of any puzzle whose maxclues could not be met. A bad order or
+        symmetry is raised straight away, before any worker is started.
+    '''
+    checkOptions(n,symmetry)
+    if workers is None: workers=os.cpu_count() or 1
+    if seed is None: seed=random.randrange(2**32)
+    tasks=((n,symmetry,minclues,maxclues,seed+i,attempts,search)
+           for i in range(count))
+    return generateInPool(tasks,workers,chunksize)
+
+def generateInPool(tasks,workers,chunksize):
+    '''
+    Params:
+        tasks - iterable; arguments of generateTask() for each puzzle.
+        workers - int; number of worker processes.
+        chunksize - int; number of puzzles sent to a worker at a time.
+    Returns:
+        The generator of generatePuzzles().
+    '''
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        for result in executor.map(generateTask,tasks,chunksize=chunksize):
+            yield result
@@ -0,0 +1,269 @@
+'''
+This file contains a difficulty rating for sudoku puzzles based on the solving
+techniques they need rather than the time taken to solve them. A puzzle is
+solved with fillBoard(), which tries the direct solving techniques first and
+escalates to the cheapest of TECHNIQUES that makes progress whenever they run
+out, guessing only when none of them helps. The hardest technique used and the
+number of guesses give the rating. Corpora can be rated in bulk on a pool of
+worker processes, or from the command line:
+
+$ python -m puzzlesolver.rate_sudoku puzzles.txt --workers 4
+'''
+import argparse
+import collections
+import copy
+import itertools
+import os
+import sys
+import time
+from puzzlesolver.solve_sudoku import *
+from puzzlesolver.batch_sudoku import WorkerPool
+from puzzlesolver.solve import readPuzzles
+
+# The levels a puzzle can need, easiest first, each with its weight towards the
+# rating: the direct solving techniques, then TECHNIQUES in the order
+# fillBoard() tries them, then guessing.
+LEVELS=collections.OrderedDict([
+    ('singles',1.0),
+    ('pointing',2.0),
+    ('box-line',2.2),
+    ('naked-pair',3.0),
+    ('hidden-pair',3.4),
+    ('naked-triple',3.8),
+    ('hidden-triple',4.2),
+    ('x-wing',5.0),
+    ('swordfish',6.0),
+    ('guess',8.0)])
+
+# Each step type of solveSudoku() and the level it belongs to.
+STEPLEVELS=dict([(0,'guess'),(1,'singles'),(2,'singles'),(3,'singles'),
+                 (4,'singles')]+
+                [(kind,name) for name,(_,kind) in TECHNIQUES.items()])
+
+# Labels for ratings up to each score; anything above the last is 'extreme'.
+LABELS=((1.0,'easy'),(2.2,'medium'),(4.2,'hard'),(6.0,'expert'),
+        (8.0,'fiendish'))
+
+'''-----------------------------------------------------------------------------
+---------------------------------RATING CLASSES---------------------------------
+-----------------------------------------------------------------------------'''
+
+class Rating(object):
+    def __init__(self,score,label,levels,guesses,elapsed=0.0,index=None):
+        '''
+        Params:
+            score - float; the difficulty, from 1 for a puzzle that singles
+                    alone solve upwards, or None if the puzzle has no solution
+                    or could not be rated.
+            label - str; one of the labels of LABELS or 'extreme', 'invalid'
+                    if the puzzle has no solution, 'timeout' if it ran out of
+                    time, otherwise a description of the exception it raised.
+            levels - collections.Counter; number of steps taken at each level
+                     of LEVELS that the puzzle needed.
+            guesses - int; guesses (type 0 steps) on the way to the solution.
+            [elapsed] - float; seconds spent rating the puzzle.
+            [index] - int; position of the puzzle in a batch, if rated in one.
+        Returns:
+            None.
+        '''
+        self.score=score
+        self.label=label
+        self.levels=levels
+        self.guesses=guesses
+        self.elapsed=elapsed
+        self.index=index
+
+    @property
+    def hardest(self):
+        '''
+        Params:
+            None.
+        Returns:
+            The hardest level of LEVELS the puzzle needed, or None.
+        '''
+        needed=[name for name in LEVELS if self.levels[name]>0]
+        return needed[-1] if needed else None
+
+    def __repr__(self):
+        return 'Rating(%s,%r,hardest=%r,guesses=%d)'%(
+            'None' if self.score is None else '%.2f'%self.score,self.label,
+            self.hardest,self.guesses)
+
+'''-----------------------------------------------------------------------------
+------------------------------------RATING--------------------------------------
+-----------------------------------------------------------------------------'''
+
+def scoreLevels(levels,guesses):
+    '''
+    Params:
+        levels - collections.Counter; steps taken at each level of LEVELS.
+        guesses - int; guesses on the way to the solution.
+    Returns:
+        A tuple (score,label). The score is the weight of the hardest level
+        needed, plus one for each guess after the first, so that puzzles
+        needing the same technique are ranked by how much guessing is left.
+    '''
+    score=max([LEVELS[name] for name in LEVELS if levels[name]>0]+[1.0])
+    score+=max(0,guesses-1)
+    for limit,label in LABELS:
+        if score<=limit: return score,label
+    return score,'extreme'
+
+def ratePuzzle(board,timeout=None,heuristic='mrv'):
+    '''
+    Params:
+        board - list; 2-dimensional list containing the board to be rated. Not
+                modified.
+        [timeout] - float; seconds allowed, or None for no limit.
+        [heuristic] - str; key of HEURISTICS choosing the cell to guess.
+    Returns:
+        A Rating of the board. Every technique of TECHNIQUES is available, and
+        each is only used once the cheaper ones make no more progress, so the
+        levels recorded are the ones the puzzle needs. For a board with more
+        than one solution the rating is that of the first solution found.
+    '''
+    start=time.time()
+    deadline=None if timeout is None else start+timeout
+    result=solveSudoku(copy.deepcopy(board),heuristic=heuristic,
+                       deadline=deadline,techniques=tuple(TECHNIQUES))
+    elapsed=time.time()-start
+    if isinstance(result,BudgetExhausted):
+        return Rating(None,'timeout',collections.Counter(),0,elapsed)
+    if result[0] is None:
+        return Rating(None,'invalid',collections.Counter(),0,elapsed)
+    levels=collections.Counter(STEPLEVELS[step[3]] for step in result[1])
+    guesses=levels['guess']
+    score,label=scoreLevels(levels,guesses)
+    return Rating(score,label,levels,guesses,elapsed)
+
+def rateChunk(chunk,timeout,heuristic):
+    '''
+    Params:
+        chunk - list; tuples (index,board) to be rated in this worker.
+        timeout - float; seconds allowed per puzzle, or None for no limit.
+        heuristic - str; as for ratePuzzle().
+    Returns:
+        A list of Rating, one per puzzle in chunk with its index set. Failures
+        are recorded in the ratings rather than raised.
+    '''
+    ratings=[]
+    for index,board in chunk:
+        try: rating=ratePuzzle(board,timeout,heuristic)
+        except Exception as e:
+            rating=Rating(None,repr(e),collections.Counter(),0)
+        rating.index=index
+        ratings.append(rating)
+    return ratings
+
+def iterRateMany(boards,workers=None,chunksize=8,timeout=None,
+                 heuristic='mrv'):
+    '''
+    Params:
+        boards - iterable; 2-dimensional lists containing the boards to be
+                 rated. Consumed lazily.
+        [workers] - int; number of worker processes, defaults to the number of
+                    CPUs. If 0, the boards are rated in this process.
+        [chunksize] - int; number of puzzles sent to a worker at a time.
+        [timeout] - float; seconds allowed per puzzle, or None for no limit.
+        [heuristic] - str; as for ratePuzzle().
+    Returns:
+        A generator yielding the Rating of every board, in input order. At
+        most two chunks per worker are in flight at once, so memory does not
+        grow with the size of the batch.
+    '''
+    indexed=enumerate(boards)
+    if workers==0:
+        for index,board in indexed:
+            for rating in rateChunk([(index,board)],timeout,heuristic):
+                yield rating
+        return
+    if workers is None: workers=os.cpu_count() or 1
+    with WorkerPool(workers) as executor:
+        # Chunks are waited on in the order they were sent, and a new one is
+        # sent as each is taken off, so the ratings come out in order.
+        pending=collections.deque()
+        def submit():
+            chunk=list(itertools.islice(indexed,chunksize))
+            if chunk==[]: return False
+            pending.append((executor.submit(rateChunk,chunk,timeout,
+                                            heuristic),chunk))
+            return True
+        for _ in range(2*workers):
+            if not submit(): break
+        while pending:
+            future,chunk=pending.popleft()
+            try: ratings=future.result()
+            except Exception as e:
+                # The worker itself died, so fail the whole chunk. The pool is
+                # replaced for the chunks sent after it.
+                ratings=[Rating(None,repr(e),collections.Counter(),0,
+                                index=index) for index,_ in chunk]
+            submit()
+            for rating in ratings: yield rating
+
+def rateMany(boards,workers=None,chunksize=8,timeout=None,heuristic='mrv'):
+    '''
+    Params:
+        boards - iterable; 2-dimensional lists containing the boards to be
+                 rated.
+        [workers] - int; number of worker processes, defaults to the number of
+                    CPUs. If 0, the boards are rated in this process.
+        [chunksize] - int; number of puzzles sent to a worker at a time.
+        [timeout] - float; seconds allowed per puzzle, or None for no limit.
+        [heuristic] - str; as for ratePuzzle().
+    Returns:
+        A list of the Rating of every board, in input order (see
+        iterRateMany()).
+    '''
+    return list(iterRateMany(boards,workers,chunksize,timeout,heuristic))
+
+'''-----------------------------------------------------------------------------
+-------------------------------------MAIN---------------------------------------
+-----------------------------------------------------------------------------'''
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(prog='python -m puzzlesolver.rate_sudoku',
+                                   description='Rate the difficulty of sudoku '
+                                   'puzzles, one per line, from a file or '
+                                   'stdin.')
+    parser.add_argument('input',nargs='?',default='-',
+                        help="puzzle file, or '-' for stdin (default)")
+    parser.add_argument('--workers',type=int,default=0,
+                        help='rate on this many processes (default: none)')
+    parser.add_argument('--timeout',type=float,default=None,
+                        help='seconds allowed per puzzle (default: none)')
+    args=parser.parse_args(argv)
+    infile=sys.stdin if args.input=='-' else open(args.input)
+    # Each line is queued as it is read, unreadable ones included, and
+    # reported once the ratings get to it.
+    read=collections.deque()
+    def boards():
+        for lineno,board in readPuzzles(infile):
+            read.append((lineno,board is not None))
+            if board is not None: yield board
+    def report(rating):
+        while not read[0][1]:
+            sys.stdout.write('line %d: unreadable puzzle\n'%read.popleft()[0])
+        lineno,_=read.popleft()
+        labels[rating.label]+=1
+        if rating.score is None:
+            sys.stdout.write('line %d: %s\n'%(lineno,rating.label))
+            return
+        sys.stdout.write('line %d: %.2f %s, hardest %s, %d guesses\n'%(
+            lineno,rating.score,rating.label,rating.hardest,rating.guesses))
+    labels=collections.Counter()
+    try:
+        for rating in iterRateMany(boards(),args.workers,
+                                   timeout=args.timeout):
+            report(rating)
+    finally:
+        if infile is not sys.stdin: infile.close()
+    # Only unreadable lines are left after the last rating.
+    for lineno,_ in read:
+        sys.stdout.write('line %d: unreadable puzzle\n'%lineno)
+    sys.stderr.write(', '.join('%d %s'%(labels[label],label)
+                               for label in sorted(labels))+'\n')
+    return 0
+
+if __name__=='__main__':
+    sys.exit(main())
@@ -0,0 +1,436 @@
+'''
+This file contains a conflict-driven clause learning (CDCL) SAT solver and the
+encoding of a sudoku puzzle given in a 2-dimensional list of integers as CNF.
+Each possible (row,col,num) entry of an empty cell is a variable, and every
+cell, row, column and box must hold each of its numbers at least once and at
+most once. The solver uses two watched literals for long clauses, implication
+lists for binary clauses, first UIP clause learning, VSIDS branching with phase
+saving, and restarts following the Luby sequence.
+'''
+import heapq
+
+'''-----------------------------------------------------------------------------
+-------------------------------------CDCL CLASS---------------------------------
+-----------------------------------------------------------------------------'''
+
+# Literal 2*v is variable v being true and 2*v+1 is it being false, so the
+# negation of a literal is lit^1 and its variable is lit>>1.
+
+class CDCLSolver(object):
+    def __init__(self,nvars):
+        '''
+        Params:
+            nvars - int; number of variables, numbered 1 to nvars.
+        Returns:
+            None.
+        '''
+        self.nvars=nvars
+        # value[v] is 1 or 0 once v is assigned, -1 before.
+        self.value=[-1]*(nvars+1)
+        self.level=[0]*(nvars+1)
+        self.reason=[None]*(nvars+1)
+        self.phase=[1]*(nvars+1)
+        self.seen=[False]*(nvars+1)
+        self.activity=[0.0]*(nvars+1)
+        self.varinc=1.0
+        self.heap=[(0.0,v) for v in range(1,nvars+1)]
+        # binary[lit] lists the literals implied as soon as lit is true, and
+        # watches[lit] the long clauses to visit once lit is false.
+        self.binary=[[] for i in range(2*nvars+2)]
+        self.watches=[[] for i in range(2*nvars+2)]
+        self.learnts=[]
+        self.trail=[]
+        self.trailmarks=[]
+        self.qhead=0
+        self.ok=True
+        self.conflicts=0
+        self.decisions=0
+
+    def litValue(self,lit):
+        '''
+        Params:
+            lit - int; literal.
+        Returns:
+            1 if lit is true, 0 if false and -1 if its variable is unassigned.
+        '''
+        value=self.value[lit>>1]
+        return value if value<0 else value^(lit&1)
+
+    def addClause(self,lits,learnt=False):
+        '''
+        Params:
+            lits - list; literals of which at least one must be true.
+            [learnt] - bool; True for clauses derived by analyze(), which may
+                       later be removed by reduceLearnts().
+        Returns:
+            The clause as stored. An empty clause, or a unit clause
+            contradicting the assignments at level 0, makes the problem
+            unsatisfiable.
+        '''
+        lits=list(dict.fromkeys(lits))
+        if len(lits)==0: self.ok=False
+        elif len(lits)==1:
+            value=self.litValue(lits[0])
+            if value==0: self.ok=False
+            elif value<0: self.enqueue(lits[0],None)
+        elif len(lits)==2:
+            self.binary[lits[0]^1].append(lits[1])
+            self.binary[lits[1]^1].append(lits[0])
+        else:
+            self.watches[lits[0]].append(lits)
+            self.watches[lits[1]].append(lits)
+            if learnt: self.learnts.append(lits)
+        return lits
+
+    def enqueue(self,lit,reason):
+        '''
+        Params:
+            lit - int; literal to be made true.
+            reason - list; clause that forced lit, with lit first, or None for
+                     a decision.
+        Returns:
+            None.
+        '''
+        var=lit>>1
+        self.value[var]=(lit&1)^1
+        self.level[var]=len(self.trailmarks)
+        self.reason[var]=reason
+        self.trail.append(lit)
+
+    def propagate(self):
+        '''
+        Params:
+            None.
+        Returns:
+            A clause with every literal false if the assignments on the trail
+            lead to a conflict, otherwise None once nothing more is implied.
+        '''
+        value,trail=self.value,self.trail
+        while self.qhead<len(trail):
+            lit=trail[self.qhead]
+            self.qhead+=1
+            false=lit^1
+            for implied in self.binary[lit]:
+                current=value[implied>>1]
+                if current<0: self.enqueue(implied,(implied,false))
+                elif current==implied&1: return [implied,false]
+            watchers=self.watches[false]
+            kept=[]
+            conflict=None
+            for i,clause in enumerate(watchers):
+                if not clause: continue
+                if clause[0]==false: clause[0],clause[1]=clause[1],clause[0]
+                first=clause[0]
+                current=value[first>>1]
+                if current>=0 and current^(first&1)==1:
+                    kept.append(clause)
+                    continue
+                for k in range(2,len(clause)):
+                    other=clause[k]
+                    current=value[other>>1]
+                    if current<0 or current^(other&1)==1:
+                        clause[1],clause[k]=other,false
+                        self.watches[other].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    current=value[first>>1]
+                    if current<0: self.enqueue(first,clause)
+                    else:
+                        conflict=clause
+                        kept.extend(watchers[i+1:])
+                        break
+            self.watches[false]=kept
+            if conflict is not None: return conflict
+        return None
+
+    def bump(self,var):
+        '''
+        Params:
+            var - int; variable involved in a conflict.
+        Returns:
+            None, raises its VSIDS activity.
+        '''
+        self.activity[var]+=self.varinc
+        if self.activity[var]>1e100:
+            self.activity=[activity*1e-100 for activity in self.activity]
+            self.varinc*=1e-100
+            self.rebuildHeap()
+        else: heapq.heappush(self.heap,(-self.activity[var],var))
+
+    def rebuildHeap(self):
+        '''
+        Params:
+            None.
+        Returns:
+            None, replaces the branching heap by one entry per unassigned
+            variable, dropping entries left behind by bump().
+        '''
+        self.heap=[(-self.activity[v],v) for v in range(1,self.nvars+1)
+                   if self.value[v]<0]
+        heapq.heapify(self.heap)
+
+    def analyze(self,conflict):
+        '''
+        Params:
+            conflict - list; clause with every literal false.
+        Returns:
+            A tuple (learnt,level): the first UIP clause, with its asserting
+            literal first and a literal of the highest remaining level second,
+            and the level to backtrack to.
+        '''
+        seen,level,trail=self.seen,self.level,self.trail
+        current=len(self.trailmarks)
+        learnt=[None]
+        pending=0
+        lit=None
+        index=len(trail)-1
+        clause=conflict
+        while True:
+            for other in clause:
+                var=other>>1
+                if lit is not None and var==lit>>1: continue
+                if not seen[var] and level[var]>0:
+                    seen[var]=True
+                    self.bump(var)
+                    if level[var]==current: pending+=1
+                    else: learnt.append(other)
+            while not seen[trail[index]>>1]: index-=1
+            lit=trail[index]
+            index-=1
+            seen[lit>>1]=False
+            pending-=1
+            if pending==0: break
+            clause=self.reason[lit>>1]
+        learnt[0]=lit^1
+        # A literal whose reason clause is made false by the other literals of
+        # the learnt clause alone adds nothing to it.
+        reasons=[self.reason[other>>1] for other in learnt]
+        kept=[learnt[0]]
+        for other,reason in zip(learnt[1:],reasons[1:]):
+            if reason is None or not all(seen[x>>1] or level[x>>1]==0
+                                         for x in reason if x!=other^1):
+                kept.append(other)
+        for other in learnt[1:]: seen[other>>1]=False
+        learnt=kept
+        if len(learnt)==1: return learnt,0
+        best=max(range(1,len(learnt)),key=lambda i:level[learnt[i]>>1])
+        learnt[1],learnt[best]=learnt[best],learnt[1]
+        return learnt,level[learnt[1]>>1]
+
+    def backtrack(self,level):
+        '''
+        Params:
+            level - int; decision level to return to.
+        Returns:
+            None, unassigns every variable set above level, saving its phase.
+        '''
+        if len(self.trailmarks)<=level: return
+        mark=self.trailmarks[level]
+        for lit in self.trail[mark:]:
+            var=lit>>1
+            self.phase[var]=self.value[var]
+            self.value[var]=-1
+            self.reason[var]=None
+            heapq.heappush(self.heap,(-self.activity[var],var))
+        del self.trail[mark:]
+        del self.trailmarks[level:]
+        self.qhead=len(self.trail)
+
+    def reduceLearnts(self):
+        '''
+        Params:
+            None.
+        Returns:
+            None, removes the longer half of the learnt clauses that are not
+            the reason for a current assignment. Removed clauses are emptied
+            and dropped from the watch lists as propagate() meets them.
+        '''
+        self.learnts.sort(key=len)
+        keep=len(self.learnts)//2
+        kept=self.learnts[:keep]
+        for clause in self.learnts[keep:]:
+            if self.reason[clause[0]>>1] is clause: kept.append(clause)
+            else: del clause[:]
+        self.learnts=kept
+
+    def pickBranch(self):
+        '''
+        Params:
+            None.
+        Returns:
+            The unassigned variable of highest activity, or None if every
+            variable is assigned.
+        '''
+        heap,value,activity=self.heap,self.value,self.activity
+        while heap:
+            key,var=heapq.heappop(heap)
+            if value[var]<0 and -key==activity[var]: return var
+        return None
+
+    def solve(self,tick=None):
+        '''
+        Params:
+            [tick] - function; if given, called with no arguments before each
+                     decision. An exception it raises ends the search.
+        Returns:
+            True if the clauses are satisfiable, with the model left in
+            self.value, otherwise False.
+        '''
+        if not self.ok: return False
+        restarts=0
+        budget=100*luby(restarts)
+        maxlearnts=max(1000,self.nvars//2)
+        while True:
+            conflict=self.propagate()
+            if conflict is not None:
+                self.conflicts+=1
+                budget-=1
+                if len(self.trailmarks)==0:
+                    self.ok=False
+                    return False
+                learnt,level=self.analyze(conflict)
+                self.backtrack(level)
+                if len(learnt)==1: self.enqueue(learnt[0],None)
+                else:
+                    learnt=self.addClause(learnt,True)
+                    self.enqueue(learnt[0],learnt if len(learnt)>2 else
+                                 (learnt[0],learnt[1]))
+                self.varinc/=0.95
+                continue
+            if budget<=0:
+                restarts+=1
+                budget=100*luby(restarts)
+                self.backtrack(0)
+                if len(self.learnts)>maxlearnts:
+                    self.reduceLearnts()
+                    maxlearnts=maxlearnts*11//10
+                if len(self.heap)>4*self.nvars: self.rebuildHeap()
+                continue
+            var=self.pickBranch()
+            if var is None: return True
+            if tick is not None: tick()
+            self.decisions+=1
+            self.trailmarks.append(len(self.trail))
+            self.enqueue(2*var+(self.phase[var]^1),None)
+
+def luby(i):
+    '''
+    Params:
+        i - int; index into the Luby sequence, from 0.
+    Returns:
+        The i-th term of 1,1,2,1,1,2,4,1,1,2,1,1,2,4,8,...
+    '''
+    size,power=1,0
+    while size<i+1:
+        power+=1
+        size=2*size+1
+    while size-1!=i:
+        size=(size-1)//2
+        power-=1
+        i%=size
+    return 2**power
+
+'''-----------------------------------------------------------------------------
+--------------------------------------ENCODING----------------------------------
+-----------------------------------------------------------------------------'''
+
+def encodeBoard(board,n=3):
+    '''
+    Params:
+        board - list; 2-dimensional list containing the board to be encoded.
+        [n] - int; order of the Sudoku puzzle.
+    Returns:
+        A tuple (solver,entries) where solver is a CDCLSolver holding the CNF
+        of the board and entries[v-1] is the (row,col,num) entry of variable v.
+        Only numbers not already given in the row, col or box of an empty cell
+        get a variable. Returns (None,None) if the givens repeat, or leave a
+        cell or a number of a unit with nowhere to go.
+    '''
+    N=n**2
+    units=([[(row,col) for col in range(N)] for row in range(N)]+
+           [[(row,col) for row in range(N)] for col in range(N)]+
+           [[(boxrow*n+i//n,boxcol*n+i%n) for i in range(N)]
+            for boxrow in range(n) for boxcol in range(n)])
+    unitmasks=[0]*(3*N)
+    for unit,cells in enumerate(units):
+        for row,col in cells:
+            num=board[row][col]
+            if num==0: continue
+            if unitmasks[unit]>>(num-1)&1: return None,None
+            unitmasks[unit]|=1<<(num-1)
+    entries=[]
+    var={}
+    for row in range(N):
+        for col in range(N):
+            if board[row][col]!=0: continue
+            taken=(unitmasks[row]|unitmasks[N+col]|
+                   unitmasks[2*N+(row//n)*n+col//n])
+            for num in range(1,N+1):
+                if not taken>>(num-1)&1:
+                    entries.append((row,col,num))
+                    var[(row,col,num)]=len(entries)
+    solver=CDCLSolver(len(entries))
+    def exactlyOne(lits):
+        solver.addClause(lits)
+        for i in range(len(lits)):
+            for j in range(i+1,len(lits)):
+                solver.addClause([lits[i]^1,lits[j]^1])
+    for row in range(N):
+        for col in range(N):
+            if board[row][col]!=0: continue
+            exactlyOne([2*var[(row,col,num)] for num in range(1,N+1)
+                        if (row,col,num) in var])
+    for unit,cells in enumerate(units):
+        for num in range(1,N+1):
+            if unitmasks[unit]>>(num-1)&1: continue
+            exactlyOne([2*var[(row,col,num)] for row,col in cells
+                        if (row,col,num) in var])
+    if not solver.ok: return None,None
+    return solver,entries
+
+'''-----------------------------------------------------------------------------
+------------------------------------SOLVER--------------------------------------
+-----------------------------------------------------------------------------'''
+
+def solveSAT(board,n=3,tick=None):
+    '''
+    Params:
+        board - list; 2-dimensional list containing the board to be solved.
+        [n] - int; order of the Sudoku puzzle.
+        [tick] - function; as for CDCLSolver.solve().
+    Returns:
+        A list of tuples (row,col,elem,type) that fill in the board if there
+        exists a solution, otherwise None. The board itself is not modified.
+        Entries are listed in the order the solver assigned them, all with
+        type 0 since the solver does not explain its placements.
+    '''
+    solver,entries=encodeBoard(board,n)
+    if solver is None or not solver.solve(tick): return None
+    return [entries[(lit>>1)-1]+(0,) for lit in solver.trail if lit&1==0]
+
+def countSAT(board,n=3,limit=None):
+    '''
+    Params:
+        board - list; 2-dimensional list containing the board to be counted.
+        [n] - int; order of the Sudoku puzzle.
+        [limit] - int; stop counting once this many solutions are found. 0
+                  or less counts none.
+    Returns:
+        The number of solutions of the board, up to limit. Each solution found
+        is excluded by a new clause before searching again.
+    '''
+    if limit is not None and limit<=0: return 0
+    solver,entries=encodeBoard(board,n)
+    if solver is None: return 0
+    count=0
+    while count!=limit and solver.solve():
+        count+=1
+        # Entries forced at level 0 are in every solution, so the decisions
+        # and what they implied are enough to tell this one apart.
+        block=[lit^1 for lit in solver.trail
+               if lit&1==0 and solver.level[lit>>1]>0]
+        solver.backtrack(0)
+        if block==[]: break
+        solver.addClause(block)
+    return count
@@ -0,0 +1,217 @@
+'''
+This file contains a command line solver for corpora of sudoku puzzles, one
+puzzle per line, without the user interface. Run it as:
+
+$ python -m puzzlesolver.solve puzzles.txt -o solutions.txt
+
+Each line holds n**4 characters (81 for 9x9, 256 for 16x16, 625 for 25x25),
+read row by row. '0' and '.' are empty cells and the numbers 1 to 25 are
+written as the symbols 1-9 followed by A-P. Blank lines and lines starting with
+'#' are skipped. Each puzzle gives one output line: its solution in the same
+format, or a message if it has none or could not be solved.
+'''
+import argparse
+import collections
+import concurrent.futures
+import sys
+import time
+from puzzlesolver.solve_sudoku import *
+from puzzlesolver.batch_sudoku import *
+
+SYMBOLS='123456789ABCDEFGHIJKLMNOP'
+
+'''-----------------------------------------------------------------------------
+---------------------------------FORMAT HELPERS---------------------------------
+-----------------------------------------------------------------------------'''
+
+def parseLine(line):
+    '''
+    Params:
+        line - str; one puzzle in the line format described above.
+    Returns:
+        The puzzle as a 2-dimensional list of ints. Raises ValueError if the
+        line has the wrong length or an unknown symbol.
+    '''
+    line=line.strip().upper()
+    n=round(len(line)**0.25)
+    if n<2 or n**4!=len(line) or n**2>len(SYMBOLS):
+        raise ValueError("Line of length %d is not a puzzle."%len(line))
+    nums=[]
+    for char in line:
+        if char in '0.': nums.append(0)
+        elif char in SYMBOLS[:n**2]: nums.append(SYMBOLS.index(char)+1)
+        else: raise ValueError("Unknown symbol %r."%char)
+    return [nums[row*n**2:(row+1)*n**2] for row in range(n**2)]
+
+def formatBoard(board):
+    '''
+    Params:
+        board - list; 2-dimensional list of ints.
+    Returns:
+        The board as a single line in the format described above.
+    '''
+    return ''.join('.' if num==0 else SYMBOLS[num-1]
+                   for row in board for num in row)
+
+def readPuzzles(lines):
+    '''
+    Params:
+        lines - iterable; lines of text, consumed lazily.
+    Returns:
+        A generator yielding, for each puzzle line, a tuple (lineno,board) with
+        board None if the line could not be parsed.
+    '''
+    for lineno,line in enumerate(lines,1):
+        line=line.strip()
+        if line=='' or line.startswith('#'): continue
+        try: yield lineno,parseLine(line)
+        except ValueError: yield lineno,None
+
+'''-----------------------------------------------------------------------------
+-------------------------------------SOLVER-------------------------------------
+-----------------------------------------------------------------------------'''
+
+def solveLines(lines,workers=0,timeout=None,**kwargs):
+    '''
+    Params:
+        lines - iterable; lines of text, consumed lazily.
+        [workers] - int; if positive, puzzles are solved on this many processes
+                    with solveChunk(), otherwise in this process. At most
+                    4*workers lines are read ahead of the one being yielded,
+                    so memory does not grow with the size of the input.
+        [timeout] - float; seconds allowed per puzzle, or None for no limit.
+        Any other keyword arguments are passed on to solveSudoku().
+    Returns:
+        A generator yielding a tuple (lineno,board,error,elapsed) for each
+        puzzle, in input order. board is the solution or None; error is None
+        if the puzzle was solved or has no solution.
+    '''
+    puzzles=readPuzzles(lines)
+    if workers<=0:
+        for lineno,board in puzzles:
+            if board is None:
+                yield lineno,None,'unreadable puzzle',0.0
+                continue
+            start=time.time()
+            deadline=None if timeout is None else start+timeout
+            try: result=solveSudoku(board,deadline=deadline,**kwargs)
+            except Exception as e:
+                yield lineno,None,repr(e),time.time()-start
+                continue
+            yield lineno,result[0],budgetError(result),time.time()-start
+        return
+    # Results arrive out of order and are put back in order through queue,
+    # which holds every line read but not yet yielded. Lines are only read
+    # while it holds fewer than window of them, so a slow puzzle at its head
+    # stops the reading instead of letting the puzzles behind it pile up.
+    # Unreadable lines are queued with index None and never sent to the
+    # workers.
+    window=4*workers
+    queue=collections.deque()
+    waiting={}
+    with WorkerPool(workers) as executor:
+        pending={}
+        index=0
+        more=True
+        while True:
+            while more and len(queue)<window:
+                item=next(puzzles,None)
+                if item is None:
+                    more=False
+                    break
+                lineno,board=item
+                if board is None:
+                    queue.append((lineno,None))
+                    continue
+                future=executor.submit(solveChunk,[(index,board)],timeout,
+                                       kwargs)
+                pending[future]=index
+                queue.append((lineno,index))
+                index+=1
+            if queue and (queue[0][1] is None or queue[0][1] in waiting):
+                lineno,head=queue.popleft()
+                if head is None: yield lineno,None,'unreadable puzzle',0.0
+                else:
+                    result=waiting.pop(head)
+                    yield lineno,result.board,result.error,result.elapsed
+                continue
+            if not queue: return
+            done,_=concurrent.futures.wait(
+                pending,return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                position=pending.pop(future)
+                try: results=future.result()
+                except Exception as e:
+                    # The worker itself died, so fail its puzzle. The pool is
+                    # replaced for the puzzles sent after it.
+                    results=[BatchResult(position,None,None,repr(e))]
+                for result in results: waiting[result.index]=result
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(prog='python -m puzzlesolver.solve',
+                                   description='Solve sudoku puzzles, one per '
+                                   'line, from a file or stdin.')
+    parser.add_argument('input',nargs='?',default='-',
+                        help="puzzle file, or '-' for stdin (default)")
+    parser.add_argument('-o','--output',default='-',
+                        help="solution file, or '-' for stdout (default)")
+    parser.add_argument('--engine',choices=ENGINES,default='backtrack')
+    parser.add_argument('--heuristic',choices=sorted(HEURISTICS),default='mrv')
+    parser.add_argument('--techniques',default='',
+                        help="comma-separated elimination techniques tried "
+                        "before guessing, or 'all' (choices: %s)"%
+                        ','.join(TECHNIQUES))
+    parser.add_argument('--workers',type=int,default=0,
+                        help='solve on this many processes (default: none)')
+    parser.add_argument('--timeout',type=float,default=None,
+                        help='seconds allowed per puzzle (default: none)')
+    parser.add_argument('-q','--quiet',action='store_true',
+                        help='only report aggregate timings')
+    args=parser.parse_args(argv)
+    infile=sys.stdin if args.input=='-' else open(args.input)
+    outfile=sys.stdout if args.output=='-' else open(args.output,'w')
+    # Only the solutions are written out, so no steps are recorded.
+    kwargs={'engine':args.engine,'trace':False}
+    if args.engine=='backtrack':
+        kwargs['heuristic']=args.heuristic
+        if args.techniques=='all': kwargs['techniques']=tuple(TECHNIQUES)
+        elif args.techniques!='':
+            kwargs['techniques']=tuple(args.techniques.split(','))
+            for name in kwargs['techniques']:
+                if name not in TECHNIQUES:
+                    parser.error('unknown technique %s'%name)
+    count=solved=failed=0
+    busy=0.0
+    start=time.time()
+    try:
+        for lineno,board,error,elapsed in solveLines(
+                infile,args.workers,args.timeout,**kwargs):
+            count+=1
+            busy+=elapsed
+            if board is not None:
+                solved+=1
+                outfile.write(formatBoard(board)+'\n')
+                status='solved'
+            elif error is None:
+                outfile.write('No solution\n')
+                status='no solution'
+            else:
+                failed+=1
+                outfile.write('Error: %s\n'%error)
+                status='error: %s'%error
+            outfile.flush()
+            if not args.quiet:
+                sys.stderr.write('line %d: %s in %.4f s\n'%(lineno,status,
+                                                            elapsed))
+    finally:
+        if infile is not sys.stdin: infile.close()
+        if outfile is not sys.stdout: outfile.close()
+    total=time.time()-start
+    sys.stderr.write('%d puzzles, %d solved, %d failed in %.3f s (%.4f s per '
+                     'puzzle, %.1f puzzles/s)\n'%(count,solved,failed,total,
+                     busy/count if count else 0.0,
+                     count/total if total>0 else 0.0))
+    return 1 if failed else 0
+
+if __name__=='__main__':
+    sys.exit(main())
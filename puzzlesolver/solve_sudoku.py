@@ -2,19 +2,77 @@
 This file contains the helper functions for solving a sudoku puzzle given in a
 2-dimensional list of integers.
 '''
+import array
+import collections
+import itertools
 import math
 import string
+import time
+from puzzlesolver.dlx_sudoku import solveDLX,countDLX
+from puzzlesolver.sat_sudoku import solveSAT,countSAT
 
 '''-----------------------------------------------------------------------------
 ----------------------------------SUDOKU CLASS----------------------------------
 -----------------------------------------------------------------------------'''
 
+class SudokuGeometry(object):
+    __slots__=('n','N','boxindex','cellunits','units','unitcells','peers')
+
+    def __init__(self,n):
+        '''
+        Params:
+            n - int; order of the Sudoku puzzle.
+        Returns:
+            None. Cells are indexed row*n**2+col. boxindex[i] is the box of
+            cell i and cellunits[i] the indices of its row, col and box in
+            units. units[unit] lists the cells (row,col) of each unit, with
+            unitcells[unit] the same cells as indices, and peers[i] the indices
+            of the other cells sharing a unit with cell i.
+        '''
+        N=n**2
+        self.n,self.N=n,N
+        self.boxindex=tuple((i//N//n)*n+i%N//n for i in range(N*N))
+        self.cellunits=tuple((i//N,N+i%N,2*N+self.boxindex[i])
+                             for i in range(N*N))
+        # Units 0..n**2-1 are the rows, then the cols, then the boxes.
+        self.units=tuple(
+            [tuple((row,col) for col in range(N)) for row in range(N)]+
+            [tuple((row,col) for row in range(N)) for col in range(N)]+
+            [tuple((boxrow*n+i//n,boxcol*n+i%n) for i in range(N))
+             for boxrow in range(n) for boxcol in range(n)])
+        self.unitcells=tuple(tuple(row*N+col for row,col in cells)
+                             for cells in self.units)
+        self.peers=tuple(
+            tuple(sorted({peer for unit in self.cellunits[i]
+                          for peer in self.unitcells[unit]}-{i}))
+            for i in range(N*N))
+
+# Geometries built so far, by order; see getGeometry().
+GEOMETRIES={}
+
+def getGeometry(n):
+    '''
+    Params:
+        n - int; order of the Sudoku puzzle.
+    Returns:
+        The SudokuGeometry of order n, built on first use and shared by every
+        Sudoku of that order afterwards.
+    '''
+    if n not in GEOMETRIES: GEOMETRIES[n]=SudokuGeometry(n)
+    return GEOMETRIES[n]
+
 class Sudoku(object):
+    # Each instance holds only the board, its masks and the trail; the index
+    # tables live in the SudokuGeometry shared by all boards of its order.
+    __slots__=('n','N','fullmask','geometry','units','cells','rowmasks',
+               'colmasks','boxmasks','elimmasks','trail')
+
     def __init__(self,board,n=3):
         '''
         Params:
             board - list; square and 2-dimensional with dimensions n**2 x n**2
                     for some positive integer n; each element must be an int.
+                    Copied, so not modified by the Sudoku.
             [n] - int; order of the Sudoku puzzle.
         Returns:
             None.
@@ -25,8 +83,101 @@ class Sudoku(object):
             for j in range(n**2):
                 assert(isinstance(board[i][j],int) and
                        0<=board[i][j]<=n**2)
-        self.board=board
-        self.n=n
+        N=n**2
+        self.n,self.N=n,N
+        self.geometry=getGeometry(n)
+        self.units=self.geometry.units
+        # Cell row*N+col of the flat board, one byte each up to order 15.
+        self.cells=array.array('B' if N<256 else 'H',
+                               [num for line in board for num in line])
+        # Bit (num-1) of each mask is set when num is already in that unit.
+        self.fullmask=(1<<N)-1
+        self.rowmasks=[0]*N
+        self.colmasks=[0]*N
+        self.boxmasks=[0]*N
+        boxindex=self.geometry.boxindex
+        for i,num in enumerate(self.cells):
+            if num!=0:
+                bit=1<<(num-1)
+                self.rowmasks[i//N]|=bit
+                self.colmasks[i%N]|=bit
+                self.boxmasks[boxindex[i]]|=bit
+        # Bit (num-1) is set when num has been ruled out of the cell by one of
+        # the TECHNIQUES, on top of the numbers already in its units.
+        self.elimmasks=[0]*(N*N)
+        # Undo log of cells set (by index), choices eliminated (as tuples
+        # (index,num)) and numbers overwritten (as tuples (index,0,old), just
+        # before the index setting the new one) since construction, see
+        # undoTrail().
+        self.trail=[]
+
+    @property
+    def board(self):
+        '''
+        Params:
+            None.
+        Returns:
+            A new 2-dimensional list of the board. Changing it does not change
+            the Sudoku, which is done with setCell() and resetCell().
+        '''
+        N,cells=self.N,self.cells
+        return [cells[row*N:row*N+N].tolist() for row in range(N)]
+
+    def getCell(self,row,col):
+        '''
+        Params:
+            row - int; row of the cell.
+            col - int; col of the cell.
+        Returns:
+            The number in the cell, or 0 if it is empty.
+        '''
+        return self.cells[row*self.N+col]
+
+    def getBoxIndex(self,row,col):
+        '''
+        Params:
+            row - int; row of the cell.
+            col - int; col of the cell.
+        Returns:
+            An int between 0 and self.n**2 inclusive-exclusive, indexing the
+            boxes of the Sudoku from left to right and then top to bottom.
+        '''
+        return self.geometry.boxindex[row*self.N+col]
+
+    def getCellUnits(self,row,col):
+        '''
+        Params:
+            row - int; row of the cell.
+            col - int; col of the cell.
+        Returns:
+            A tuple of the indices into self.units of the row, col and box
+            containing the cell.
+        '''
+        return self.geometry.cellunits[row*self.N+col]
+
+    def getPeers(self,row,col):
+        '''
+        Params:
+            row - int; row of the cell.
+            col - int; col of the cell.
+        Returns:
+            A list of tuples (row,col) of the other cells sharing a row, col or
+            box with the cell, each listed once.
+        '''
+        N=self.N
+        return [divmod(peer,N) for peer in self.geometry.peers[row*N+col]]
+
+    def getUnitMask(self,unit):
+        '''
+        Params:
+            unit - int; index into self.units.
+        Returns:
+            An int bitmask of the numbers already entered in the unit.
+        '''
+        N=self.N
+        if unit<N: return self.rowmasks[unit]
+        if unit<2*N: return self.colmasks[unit-N]
+        return self.boxmasks[unit-2*N]
 
     def getBox(self,boxrow,boxcol):
         '''
@@ -46,10 +197,37 @@ class Sudoku(object):
         '''
         assert(isinstance(boxrow,int) and isinstance(boxcol,int) and
                0<=boxrow<self.n and 0<=boxcol<self.n)
-        startrow,startcol=boxrow*self.n,boxcol*self.n
-        endrow,endcol=startrow+self.n,startcol+self.n
-        return [[self.board[i][j] for j in range(startcol,endcol)]
-                for i in range(startrow,endrow)]
+        n=self.n
+        box=[self.cells[i] for i in
+             self.geometry.unitcells[2*self.N+boxrow*n+boxcol]]
+        return [box[i:i+n] for i in range(0,self.N,n)]
+
+    def getChoicesMask(self,row,col):
+        '''
+        Params:
+            row - int; between 0 and self.n**2 inclusive-exclusive, refers to
+                  the row of the requested cell.
+            col - int; between 0 and self.n**2 inclusive-exclusive, refers to
+                  the col of the requested cell.
+        Returns:
+            An int bitmask with bit (num-1) set for each number num that could
+            be entered in the cell. Returns 0 if the cell is already solved.
+        '''
+        return self.getIndexChoicesMask(row*self.N+col)
+
+    def getIndexChoicesMask(self,index):
+        '''
+        Params:
+            index - int; row*self.n**2+col of the requested cell.
+        Returns:
+            As for getChoicesMask(), without the row and col.
+        '''
+        if self.cells[index]!=0: return 0
+        N=self.N
+        return self.fullmask&~(self.rowmasks[index//N]|
+                               self.colmasks[index%N]|
+                               self.boxmasks[self.geometry.boxindex[index]]|
+                               self.elimmasks[index])
 
     def getChoices(self,row,col):
         '''
@@ -62,13 +240,17 @@ class Sudoku(object):
             A list of the possible numbers that could be entered in the cell.
             Returns an empty list if the cell is already solved.
         '''
-        if self.board[row][col]!=0: return []
-        choices=list(range(1,self.n**2+1))
-        extracts=self.board[row]+[self.board[i][col] for i in range(self.n**2)]
-        for k in self.getBox(row//self.n,col//self.n): extracts+=k
-        for num in extracts:
-            if num in choices: choices.remove(num)
-        return choices
+        return maskToList(self.getChoicesMask(row,col))
+
+    def getChoicesNumber(self,row,col):
+        '''
+        Params:
+            row - int; row of the requested cell.
+            col - int; col of the requested cell.
+        Returns:
+            The number of possible numbers that could be entered in the cell.
+        '''
+        return popCount(self.getChoicesMask(row,col))
 
     def getBoardChoices(self):
         '''
@@ -79,8 +261,20 @@ class Sudoku(object):
             with each element as a 1-dimensional list of choices that could be
             entered in the cell.
         '''
-        return [[self.getChoices(row,col) for col in range(self.n**2)]
-                for row in range(self.n**2)]
+        return [[maskToList(mask) for mask in line]
+                for line in self.getBoardChoicesMask()]
+
+    def getBoardChoicesMask(self):
+        '''
+        Params:
+            None.
+        Returns:
+            A 2-dimensional square list of dimensions self.n**2 x self.n**2,
+            with each element the bitmask returned by getChoicesMask().
+        '''
+        N=self.N
+        masks=[self.getIndexChoicesMask(i) for i in range(N*N)]
+        return [masks[row*N:row*N+N] for row in range(N)]
 
     def getBoardChoicesNumber(self):
         '''
@@ -91,9 +285,8 @@ class Sudoku(object):
             with each element contains an integer corresponding to the number of
             choices for that cell.
         '''
-        choices=self.getBoardChoices()
-        return [[len(choices[row][col]) for col in range(self.n**2)]
-                for row in range(self.n**2)]
+        return [[popCount(mask) for mask in line]
+                for line in self.getBoardChoicesMask()]
 
     def setCell(self,row,col,num):
         '''
@@ -104,10 +297,18 @@ class Sudoku(object):
         Returns:
             None.
         '''
-        assert(isinstance(row,int) and 0<=row<self.n**2 and isinstance(col,int)
-               and 0<=col<self.n**2 and isinstance(num,int) and
-               0<num<=self.n**2)
-        self.board[row][col]=num
+        assert(isinstance(row,int) and 0<=row<self.N and isinstance(col,int)
+               and 0<=col<self.N and isinstance(num,int) and 0<num<=self.N)
+        index=row*self.N+col
+        if self.cells[index]!=0:
+            self.trail.append((index,0,self.cells[index]))
+            self.resetCell(row,col)
+        bit=1<<(num-1)
+        self.rowmasks[row]|=bit
+        self.colmasks[col]|=bit
+        self.boxmasks[self.geometry.boxindex[index]]|=bit
+        self.cells[index]=num
+        self.trail.append(index)
 
     def resetCell(self,row,col):
         '''
@@ -117,9 +318,63 @@ class Sudoku(object):
         Returns:
             None.
         '''
-        assert(isinstance(row,int) and 0<=row<self.n**2 and isinstance(col,int)
-               and 0<=col<self.n**2)
-        self.board[row][col]=0
+        assert(isinstance(row,int) and 0<=row<self.N and isinstance(col,int)
+               and 0<=col<self.N)
+        index=row*self.N+col
+        num=self.cells[index]
+        if num!=0:
+            bit=~(1<<(num-1))
+            self.rowmasks[row]&=bit
+            self.colmasks[col]&=bit
+            self.boxmasks[self.geometry.boxindex[index]]&=bit
+        self.cells[index]=0
+
+    def eliminate(self,row,col,num):
+        '''
+        Params:
+            row - int; row of the cell.
+            col - int; col of the cell.
+            num - int; number ruled out of the cell.
+        Returns:
+            None, removes num from the choices of the cell until undone.
+        '''
+        index=row*self.N+col
+        self.elimmasks[index]|=1<<(num-1)
+        self.trail.append((index,num))
+
+    def getTrailMark(self):
+        '''
+        Params:
+            None.
+        Returns:
+            An int marking the current end of the trail, to be passed to
+            undoTrail() later.
+        '''
+        return len(self.trail)
+
+    def undoTrail(self,mark):
+        '''
+        Params:
+            mark - int; value returned by an earlier call to getTrailMark().
+        Returns:
+            None, resets every cell set and restores every choice eliminated
+            since mark was taken, latest first, putting back any number that
+            was overwritten. Since the candidates of every cell are derived
+            from the unit and elimination masks, this also restores them.
+        '''
+        trail,N=self.trail,self.N
+        while len(trail)>mark:
+            entry=trail.pop()
+            if isinstance(entry,int): self.resetCell(entry//N,entry%N)
+            elif len(entry)==2:
+                index,num=entry
+                self.elimmasks[index]&=~(1<<(num-1))
+            else:
+                # The cell is empty again, so its old number is set back; the
+                # index this puts on the trail is taken straight off.
+                index,_,old=entry
+                self.setCell(index//N,index%N,old)
+                trail.pop()
 
     def isFull(self):
         '''
@@ -129,23 +384,21 @@ class Sudoku(object):
             True if the board in the Sudoku object is completed (with non-zeros)
             else returns False.
         '''
-        for row in range(self.n**2):
-            for col in range(self.n**2):
-                if self.board[row][col]==0: return False
-        return True
+        return 0 not in self.cells
 
     def hasNoRepeats(self,numlist):
         '''
         Params:
-            numlist - list; ints to be checked.
+            numlist - iterable; ints to be checked.
         Returns:
             True if numlist does not have any repeated numbers (excluding 0).
         '''
-        seen=[]
+        seen=0
         for elem in numlist:
             if elem!=0:
-                if elem in seen: return False
-                seen.append(elem)
+                bit=1<<elem
+                if seen&bit: return False
+                seen|=bit
         return True
 
     def rowIsValid(self,row):
@@ -155,8 +408,7 @@ class Sudoku(object):
         Returns:
             True if the requested row does not have any repeated numbers.
         '''
-        rowtocheck=self.board[row]
-        return self.hasNoRepeats(rowtocheck)
+        return self.hasNoRepeats(self.cells[row*self.N:(row+1)*self.N])
 
     def colIsValid(self,col):
         '''
@@ -165,8 +417,7 @@ class Sudoku(object):
         Returns:
             True if the requested col does not have any repeated numbers.
         '''
-        coltocheck=[self.board[row][col] for row in range(self.n**2)]
-        return self.hasNoRepeats(coltocheck)
+        return self.hasNoRepeats(self.cells[col::self.N])
 
     def boxIsValid(self,boxrow,boxcol):
         '''
@@ -176,9 +427,9 @@ class Sudoku(object):
         Returns:
             True if the requested box does not have any repeated numbers.
         '''
-        boxtocheck=[]
-        for i in self.getBox(boxrow,boxcol): boxtocheck+=i
-        return self.hasNoRepeats(boxtocheck)
+        cells=self.cells
+        return self.hasNoRepeats(cells[i] for i in self.geometry.unitcells[
+            2*self.N+boxrow*self.n+boxcol])
 
     def isValid(self):
         '''
@@ -188,235 +439,1009 @@ class Sudoku(object):
             True if the board in the Sudoku object is valid (as per usual
             Sudoku puzzle constraints) else returns False, ignoring empty cells.
         '''
-        for row in range(self.n**2):
+        for row in range(self.N):
             if not self.rowIsValid(row): return False
-        for col in range(self.n**2):
+        for col in range(self.N):
             if not self.colIsValid(col): return False
         for boxrow in range(self.n):
             for boxcol in range(self.n):
                 if not self.boxIsValid(boxrow,boxcol): return False
-        for row in range(self.n**2):
-            for col in range(self.n**2):
-                if self.board[row][col]==0 and self.getChoices(row,col)==[]:
-                    return False
+        for index in range(self.N**2):
+            if (self.cells[index]==0 and
+                self.getIndexChoicesMask(index)==0): return False
+        return True
+
+    def isValidSince(self,mark):
+        '''
+        Params:
+            mark - int; value returned by an earlier call to getTrailMark(),
+                   when the board was valid.
+        Returns:
+            As for isValid(), but only looks at the cells changed since mark
+            and their peers, which are the only ones that can have become
+            invalid: a number set must not repeat among its peers, and no
+            empty peer of a changed cell may be left without a choice.
+        '''
+        cells,peers=self.cells,self.geometry.peers
+        choices=self.getIndexChoicesMask
+        for k in range(mark,len(self.trail)):
+            entry=self.trail[k]
+            if isinstance(entry,int):
+                num=cells[entry]
+                for peer in peers[entry]:
+                    value=cells[peer]
+                    if value==num or (value==0 and choices(peer)==0):
+                        return False
+            elif (len(entry)==2 and cells[entry[0]]==0 and
+                  choices(entry[0])==0):
+                return False
         return True
 
 '''-----------------------------------------------------------------------------
 -----------------------SOLVER ALGORITHM HELPER FUNCTIONS------------------------
 -----------------------------------------------------------------------------'''
 
-def existSingletons(choicesnum):
+def maskToList(mask):
     '''
     Params:
-        choicesnum - list; each element is an int referring to number of choices
-                     of entry for that position.
+        mask - int; bitmask with bit (num-1) set for each number num.
     Returns:
-        True if singletons exist, False otherwise.
+        A sorted list of the numbers whose bits are set in mask.
     '''
-    for row in range(len(choicesnum)):
-        for col in range(len(choicesnum[row])):
-            if choicesnum[row][col]==1: return True
-    return False
+    nums,num=[],1
+    while mask:
+        if mask&1: nums.append(num)
+        mask>>=1
+        num+=1
+    return nums
 
-def uniqueElements(choices):
+def popCount(mask):
     '''
     Params:
-        choices - list; contains choices in a 1-dimensional list for each
-                  position.
+        mask - int; bitmask to be counted.
     Returns:
-        List of unique elements in the choice list (and an empty list if there
-        are none).
+        The number of set bits in mask.
     '''
-    seen=[None]+[0]*len(choices)
-    for choice in choices:
-        for num in choice: seen[num]+=1
-    unique=[]
-    for num in range(1,len(seen)):
-        if seen[num]==1: unique.append(num)
-    return unique
+    return bin(mask).count('1')
 
-def uniqueCellSearchRow(s):
+'''-----------------------------------------------------------------------------
+-------------------------------SOLVER ALGORITHMS-------------------------------
+-----------------------------------------------------------------------------'''
+
+def propagate(s,units=None,trace=True):
     '''
     Params:
         s - Sudoku; board to be solved.
+        [units] - iterable; indices into s.units that may have new deductions.
+                  Defaults to every unit.
+        [trace] - bool; if False, the placements are not recorded and an empty
+                  list is returned.
     Returns:
-        A list of tuples (row,col,elem) indicating those that were filled;
-        modifies the Sudoku object board by doing the unique cell search
-        algorithm on each row.
+        A list of tuples (row,col,elem,type) indicating those that were filled;
+        modifies the Sudoku object board by examining a queue of dirty units
+        for singletons (type 1) and unique cells (type 2,3,4 for row,col,box).
+        Every placement queues the units of the cell and of the peers that lose
+        a choice, so only units touched since the last pass are re-examined.
+        Stops early when a cell is found with no possible numbers.
     '''
+    N=s.n**2
+    cells,geometry=s.cells,s.geometry
+    cellunits,peers=geometry.cellunits,geometry.peers
+    choices=s.getIndexChoicesMask
+    if units is None: units=range(3*N)
+    queue=collections.deque(units)
+    queued=[False]*(3*N)
+    for unit in queue: queued[unit]=True
     filled=[]
-    choices=s.getBoardChoices()
-    for row in range(s.n**2):
-        rowlist=choices[row]
-        for elem in uniqueElements(rowlist):
-            for col in range(s.n**2):
-                if elem in rowlist[col]:
-                    s.setCell(row,col,elem)
-                    filled.append((row,col,elem,2))
-                    break
+    def place(index,elem,kind):
+        # Peers losing elem as a choice may leave a unique cell in any unit
+        # they belong to, so those units are queued along with the cell's own.
+        bit=1<<(elem-1)
+        dirty=set(cellunits[index])
+        for peer in peers[index]:
+            if choices(peer)&bit: dirty.update(cellunits[peer])
+        row,col=divmod(index,N)
+        s.setCell(row,col,elem)
+        if trace: filled.append((row,col,elem,kind))
+        for unit in dirty:
+            if not queued[unit]:
+                queued[unit]=True
+                queue.append(unit)
+    while queue:
+        unit=queue.popleft()
+        queued[unit]=False
+        members=geometry.unitcells[unit]
+        for index in members:
+            if cells[index]!=0: continue
+            mask=choices(index)
+            if mask==0: return filled
+            if mask&(mask-1)==0: place(index,mask.bit_length(),1)
+        once=twice=0
+        for index in members:
+            mask=choices(index)
+            twice|=once&mask
+            once|=mask
+        unique=once&~twice
+        if unique==0: continue
+        kind=2+unit//N
+        for index in members:
+            mask=choices(index)&unique
+            if mask!=0:
+                elem=(mask&-mask).bit_length()
+                place(index,elem,kind)
+                unique&=~(1<<(elem-1))
     return filled
 
-def uniqueCellSearchCol(s):
+'''-----------------------------------------------------------------------------
+------------------------------ELIMINATION TECHNIQUES----------------------------
+-----------------------------------------------------------------------------'''
+
+def unitPlaces(masks,N):
     '''
     Params:
-        s - Sudoku; board to be solved.
+        masks - list; choice bitmasks of the cells of a unit, in order.
+        N - int; number of cells in a unit.
     Returns:
-        A list of tuples (row,col,elem) indicating those that were filled;
-        modifies the Sudoku object board by doing the unique cell search
-        algorithm on each col.
+        A list of N bitmasks where bit i of element elem-1 is set when elem is
+        a choice for the i-th cell of the unit.
     '''
-    filled=[]
-    choices=s.getBoardChoices()
-    for col in range(s.n**2):
-        collist=[choices[row][col] for row in range(s.n**2)]
-        for elem in uniqueElements(collist):
-            for row in range(s.n**2):
-                if elem in collist[row]:
-                    s.setCell(row,col,elem)
-                    filled.append((row,col,elem,3))
-                    break
-    return filled
+    places=[0]*N
+    for i,mask in enumerate(masks):
+        while mask:
+            low=mask&-mask
+            places[low.bit_length()-1]|=1<<i
+            mask^=low
+    return places
 
-def uniqueCellSearchBox(s):
+def nakedSubsets(s,size):
     '''
     Params:
-        s - Sudoku; board to be solved.
+        s - Sudoku; board to be examined. Not modified.
+        size - int; 2 for naked pairs, 3 for naked triples.
     Returns:
-        A list of tuples (row,col,elem) indicating those that were filled;
-        modifies the Sudoku object board by doing the unique cell search
-        algorithm on each box.
+        A list of tuples (row,col,elem) of choices that can be ruled out: when
+        size cells of a unit only have size numbers between them, no other cell
+        of the unit can hold those numbers.
     '''
-    filled=[]
-    choices=s.getBoardChoices()
-    for boxrow in range(s.n):
-        for boxcol in range(s.n):
-            boxlist=[]
-            startrow,startcol=boxrow*s.n,boxcol*s.n
-            endrow,endcol=startrow+s.n,startcol+s.n
-            for row in range(startrow,endrow):
-                for col in range(startcol,endcol):
-                    boxlist.append(choices[row][col])
-            for elem in uniqueElements(boxlist):
-                for idx in range(s.n**2):
-                    if elem in boxlist[idx]:
-                        row=boxrow*s.n+idx//s.n
-                        col=boxcol*s.n+idx%s.n
-                        s.setCell(row,col,elem)
-                        filled.append((row,col,elem,4))
-                        break
-    return filled
+    elims=[]
+    grid=s.getBoardChoicesMask()
+    for cells in s.units:
+        masks=[grid[row][col] for row,col in cells]
+        small=[i for i,mask in enumerate(masks) if 2<=popCount(mask)<=size]
+        for subset in itertools.combinations(small,size):
+            union=0
+            for i in subset: union|=masks[i]
+            if popCount(union)!=size: continue
+            for i,(row,col) in enumerate(cells):
+                if i not in subset and masks[i]&union:
+                    for elem in maskToList(masks[i]&union):
+                        elims.append((row,col,elem))
+    return elims
+
+def hiddenSubsets(s,size):
+    '''
+    Params:
+        s - Sudoku; board to be examined. Not modified.
+        size - int; 2 for hidden pairs, 3 for hidden triples.
+    Returns:
+        A list of tuples (row,col,elem) of choices that can be ruled out: when
+        size numbers can only go in the same size cells of a unit, those cells
+        cannot hold any other number.
+    '''
+    elims=[]
+    N=s.n**2
+    grid=s.getBoardChoicesMask()
+    for cells in s.units:
+        masks=[grid[row][col] for row,col in cells]
+        places=unitPlaces(masks,N)
+        few=[elem for elem in range(N) if 2<=popCount(places[elem])<=size]
+        for subset in itertools.combinations(few,size):
+            union=keep=0
+            for elem in subset:
+                union|=places[elem]
+                keep|=1<<elem
+            if popCount(union)!=size: continue
+            for i in maskToList(union):
+                row,col=cells[i-1]
+                for elem in maskToList(masks[i-1]&~keep):
+                    elims.append((row,col,elem))
+    return elims
+
+def pointingPairs(s):
+    '''
+    Params:
+        s - Sudoku; board to be examined. Not modified.
+    Returns:
+        A list of tuples (row,col,elem) of choices that can be ruled out: when
+        a number can only go in one row (or col) within a box, it cannot go in
+        that row (or col) outside the box.
+    '''
+    elims=[]
+    N=s.n**2
+    grid=s.getBoardChoicesMask()
+    for box in range(N):
+        cells=s.units[2*N+box]
+        places=unitPlaces([grid[row][col] for row,col in cells],N)
+        for elem in range(N):
+            where=[cells[i-1] for i in maskToList(places[elem])]
+            if len(where)<2: continue
+            bit=1<<elem
+            for line,unit in ((0,where[0][0]),(1,N+where[0][1])):
+                if any(cell[line]!=where[0][line] for cell in where): continue
+                for row,col in s.units[unit]:
+                    if s.getBoxIndex(row,col)!=box and grid[row][col]&bit:
+                        elims.append((row,col,elem+1))
+    return elims
+
+def boxLineReduction(s):
+    '''
+    Params:
+        s - Sudoku; board to be examined. Not modified.
+    Returns:
+        A list of tuples (row,col,elem) of choices that can be ruled out: when
+        a number can only go in one box within a row (or col), it cannot go in
+        that box outside the row (or col).
+    '''
+    elims=[]
+    n,N=s.n,s.n**2
+    grid=s.getBoardChoicesMask()
+    for unit in range(2*N):
+        cells=s.units[unit]
+        places=unitPlaces([grid[row][col] for row,col in cells],N)
+        for elem in range(N):
+            where=maskToList(places[elem])
+            # Cells i and j of a row or col share a box when i//n==j//n.
+            if len(where)<2 or (where[0]-1)//n!=(where[-1]-1)//n: continue
+            bit=1<<elem
+            box=s.getBoxIndex(*cells[where[0]-1])
+            for row,col in s.units[2*N+box]:
+                if (row,col) not in cells and grid[row][col]&bit:
+                    elims.append((row,col,elem+1))
+    return elims
+
+def fish(s,size):
+    '''
+    Params:
+        s - Sudoku; board to be examined. Not modified.
+        size - int; 2 for X-Wings, 3 for Swordfish.
+    Returns:
+        A list of tuples (row,col,elem) of choices that can be ruled out: when
+        a number can only go in the same size cols of size rows, it cannot go
+        in those cols in any other row, and likewise with rows and cols
+        swapped.
+    '''
+    elims=[]
+    N=s.n**2
+    grid=s.getBoardChoicesMask()
+    for transpose in (False,True):
+        lines=[list(line) for line in zip(*grid)] if transpose else grid
+        # places[i][elem] has bit j set when elem+1 can go in cross line j of
+        # base line i.
+        places=[unitPlaces(line,N) for line in lines]
+        for elem in range(N):
+            bit=1<<elem
+            few=[i for i in range(N) if 2<=popCount(places[i][elem])<=size]
+            for subset in itertools.combinations(few,size):
+                union=0
+                for i in subset: union|=places[i][elem]
+                if popCount(union)!=size: continue
+                for j in maskToList(union):
+                    for i in range(N):
+                        if i not in subset and lines[i][j-1]&bit:
+                            row,col=(j-1,i) if transpose else (i,j-1)
+                            elims.append((row,col,elem+1))
+    return elims
+
+# Each technique has its own step type; they are tried cheapest first.
+TECHNIQUES=collections.OrderedDict([
+    ('pointing',(pointingPairs,9)),
+    ('box-line',(boxLineReduction,10)),
+    ('naked-pair',(lambda s:nakedSubsets(s,2),5)),
+    ('hidden-pair',(lambda s:hiddenSubsets(s,2),7)),
+    ('naked-triple',(lambda s:nakedSubsets(s,3),6)),
+    ('hidden-triple',(lambda s:hiddenSubsets(s,3),8)),
+    ('x-wing',(lambda s:fish(s,2),11)),
+    ('swordfish',(lambda s:fish(s,3),12))])
+
+def isPlacement(step):
+    '''
+    Params:
+        step - tuple; (row,col,elem,type) as returned by solveSudoku().
+    Returns:
+        True if the step enters elem in the cell (types 0 to 4), False if it
+        only rules elem out of the cell (the types of TECHNIQUES).
+    '''
+    return step[3]<=4
 
 '''-----------------------------------------------------------------------------
--------------------------------SOLVER ALGORITHMS-------------------------------
+----------------------------SOLVER HELPER FUNCTIONS-----------------------------
 -----------------------------------------------------------------------------'''
 
-def singletonSearch(s):
+def fillBoard(s,units=None,techniques=(),trace=True):
     '''
     Params:
         s - Sudoku; board to be solved.
+        [units] - iterable; indices into s.units changed since the board was
+                  last filled. Defaults to every unit.
+        [techniques] - iterable; keys of TECHNIQUES to try whenever the direct
+                       solving techniques run out of placements.
+        [trace] - bool; if False, nothing is recorded and an empty list is
+                  returned, as for propagate().
     Returns:
-        A list of tuples (row,col,elem) indicating those that were filled;
-        modifies the Sudoku object board by recursively searching for cells
-        with only one possible number and inserting those in.
+        A list of tuples (row,col,elem,type) indicating those that were filled;
+        modifies the Sudoku object board by propagating direct solving
+        techniques to attempt to derive the solution.
+        Type 1 indicates a singleton, type 2,3,4 indicates a unique cell by
+        row,col,box respectively. Types 5 to 12 are the choices ruled out by
+        TECHNIQUES, which are recorded on the trail like placements.
     '''
-    choicesnum=s.getBoardChoicesNumber()
-    choices=s.getBoardChoices()
-    filled=[]
-    if not existSingletons(choicesnum): return filled
+    filled=propagate(s,units,trace)
+    techniques=[name for name in TECHNIQUES if name in techniques]
+    while techniques:
+        for name in techniques:
+            technique,kind=TECHNIQUES[name]
+            elims=technique(s)
+            if elims!=[]: break
+        else: return filled
+        # Choices ruled out can leave singletons or unique cells in any unit
+        # of their cell, so propagation restarts from those units.
+        dirty=set()
+        for row,col,elem in elims:
+            mask=s.getChoicesMask(row,col)
+            if mask&(1<<(elem-1)):
+                s.eliminate(row,col,elem)
+                if trace: filled.append((row,col,elem,kind))
+                dirty.update(s.getCellUnits(row,col))
+                if mask==1<<(elem-1): return filled
+        filled+=propagate(s,dirty,trace)
+    return filled
+
+def mostChoices(s):
+    '''
+    Params:
+        s - Sudoku; board to be solved.
+    Returns:
+        A tuple row,col of the empty cell with the most choices, the original
+        ordering of the solver. If there are none, returns row,col=-1,-1.
+    '''
+    bestchoice,bestnum=(-1,-1),0
     for row in range(s.n**2):
         for col in range(s.n**2):
-            if choicesnum[row][col]==1:
-                s.setCell(row,col,choices[row][col][0])
-                filled.append((row,col,choices[row][col][0],1))
-    return filled+singletonSearch(s)
+            num=s.getChoicesNumber(row,col)
+            if num>bestnum:
+                bestchoice=(row,col)
+                bestnum=num
+    return bestchoice
 
-def uniqueCellSearch(s):
+def fewestChoices(s):
     '''
     Params:
         s - Sudoku; board to be solved.
     Returns:
-        A list of tuples (row,col,elem) indicating those that were filled;
-        modifies the Sudoku object board by recursively searching for numbers
-        whose cells can be derived by searching for unique cells each
-        number can be in and inserting those in.
+        A tuple row,col of the empty cell with the fewest (but at least one)
+        choices, i.e. the minimum remaining values rule. If there are none,
+        returns row,col=-1,-1.
     '''
-    filled=uniqueCellSearchBox(s)+uniqueCellSearchRow(s)+uniqueCellSearchCol(s)
-    if filled==[]: return filled
-    return filled+uniqueCellSearch(s)
+    N=s.n**2
+    choices=s.getIndexChoicesMask
+    bestindex,bestnum=-1,N+1
+    for index in range(N*N):
+        num=popCount(choices(index))
+        if 0<num<bestnum:
+            bestindex,bestnum=index,num
+            if num<=2: break
+    return divmod(bestindex,N) if bestindex!=-1 else (-1,-1)
 
-'''-----------------------------------------------------------------------------
-----------------------------SOLVER HELPER FUNCTIONS-----------------------------
------------------------------------------------------------------------------'''
+def fewestChoicesDegree(s):
+    '''
+    Params:
+        s - Sudoku; board to be solved.
+    Returns:
+        A tuple row,col chosen as in fewestChoices(), with ties broken in favour
+        of the cell with the most empty peers. If there are none, returns
+        row,col=-1,-1.
+    '''
+    bestchoice,bestkey=(-1,-1),None
+    for row in range(s.n**2):
+        for col in range(s.n**2):
+            num=s.getChoicesNumber(row,col)
+            if num==0 or (bestkey is not None and num>bestkey[0]): continue
+            degree=0
+            for peer in s.geometry.peers[row*s.n**2+col]:
+                if s.cells[peer]==0: degree+=1
+            if bestkey is None or (num,-degree)<bestkey:
+                bestchoice,bestkey=(row,col),(num,-degree)
+    return bestchoice
 
-def fillBoard(s):
+def naturalOrder(s,row,col):
     '''
     Params:
         s - Sudoku; board to be solved.
+        row - int; row of the cell to be guessed.
+        col - int; col of the cell to be guessed.
     Returns:
-        A list of tuples (row,col,elem,type) indicating those that were filled;
-        modifies the Sudoku object board by recursively using direct solving
-        techniques to attempt to derive the solution.
-        Type 1 indicates singletonSearch, type 2,3,4 indicates uniqueCellSearch
-        by row,col,box respectively.
+        The choices for the cell in increasing order.
+    '''
+    return s.getChoices(row,col)
+
+def leastConstrainingOrder(s,row,col):
     '''
-    filled=singletonSearch(s)+uniqueCellSearch(s)
-    if filled==[]: return filled
-    return filled+fillBoard(s)
+    Params:
+        s - Sudoku; board to be solved.
+        row - int; row of the cell to be guessed.
+        col - int; col of the cell to be guessed.
+    Returns:
+        The choices for the cell ordered so that the ones ruling out the fewest
+        choices of empty peers come first.
+    '''
+    peermasks=[s.getChoicesMask(peerrow,peercol)
+               for peerrow,peercol in s.getPeers(row,col)]
+    def ruledOut(num):
+        bit=1<<(num-1)
+        return sum(1 for mask in peermasks if mask&bit)
+    return sorted(s.getChoices(row,col),key=ruledOut)
+
+HEURISTICS={'max':mostChoices,'mrv':fewestChoices,
+            'mrv-degree':fewestChoicesDegree}
+VALUEORDERS={'natural':naturalOrder,'lcv':leastConstrainingOrder}
 
-def nextChoice(s):
+def nextChoice(s,heuristic='mrv'):
     '''
     Params:
         s - Sudoku; board to be solved.
+        [heuristic] - str; key of HEURISTICS choosing the cell.
     Returns:
         A tuple row,col referring to the next possible choice to backtrack from.
         If there are none, returns row,col=-1,-1.
     '''
-    numchoices=s.getBoardChoicesNumber()
-    bestchoice,bestnum=(-1,-1),-1
-    for row in range(len(numchoices)):
-        for col in range(len(numchoices[row])):
-            if numchoices[row][col]>bestnum:
-                bestchoice=(row,col)
-                bestnum=numchoices[row][col]
-    return bestchoice
+    return HEURISTICS[heuristic](s)
 
 '''-----------------------------------------------------------------------------
 ------------------------------------SOLVER--------------------------------------
 -----------------------------------------------------------------------------'''
 
-def solveSudoku(board):
+ENGINES=('backtrack','dlx','sat')
+
+class SolverStats(object):
+    def __init__(self,detailed=False):
+        '''
+        Params:
+            [detailed] - bool; if True, the backtrack engine also fills in the
+                         counts below, at some cost in speed. Otherwise only
+                         nodes and elapsed are kept.
+        Returns:
+            None. Pass an instance to solveSudoku() to have it filled in.
+            maxdepth is the most guesses on the path to any node, guesses the
+            guesses tried and backtracks those undone again. steptypes counts
+            the steps of each type made, including those later undone.
+            propagationtime is the seconds spent in fillBoard() and searchtime
+            the rest of elapsed. choicecalls and validcalls count the choice
+            bitmasks computed and the calls to Sudoku.isValid().
+        '''
+        self.nodes=0
+        self.elapsed=0.0
+        self.detailed=detailed
+        self.maxdepth=0
+        self.guesses=0
+        self.backtracks=0
+        self.steptypes=collections.Counter()
+        self.propagationtime=0.0
+        self.searchtime=0.0
+        self.choicecalls=0
+        self.validcalls=0
+
+    def __repr__(self):
+        if not self.detailed:
+            return 'SolverStats(nodes=%d,elapsed=%.4f)'%(self.nodes,
+                                                         self.elapsed)
+        return ('SolverStats(nodes=%d,elapsed=%.4f,maxdepth=%d,guesses=%d,'
+                'backtracks=%d,steptypes=%s,propagationtime=%.4f,'
+                'searchtime=%.4f,choicecalls=%d,validcalls=%d)'%(
+                    self.nodes,self.elapsed,self.maxdepth,self.guesses,
+                    self.backtracks,dict(sorted(self.steptypes.items())),
+                    self.propagationtime,self.searchtime,self.choicecalls,
+                    self.validcalls))
+
+class CountingSudoku(Sudoku):
+    # Used instead of Sudoku only for detailed stats, so the plain class pays
+    # nothing for the counting.
+    __slots__=('stats',)
+
+    def __init__(self,board,n,stats):
+        '''
+        Params:
+            board,n - as for Sudoku.
+            stats - SolverStats; whose choicecalls and validcalls are counted.
+        Returns:
+            None.
+        '''
+        Sudoku.__init__(self,board,n)
+        self.stats=stats
+
+    def getIndexChoicesMask(self,index):
+        self.stats.choicecalls+=1
+        return Sudoku.getIndexChoicesMask(self,index)
+
+    def isValid(self):
+        self.stats.validcalls+=1
+        return Sudoku.isValid(self)
+
+    def isValidSince(self,mark):
+        self.stats.validcalls+=1
+        return Sudoku.isValidSince(self,mark)
+
+class BudgetExhausted(tuple):
+    def __new__(cls,reason,stats):
+        '''
+        Params:
+            reason - str; 'deadline', 'nodes' or 'cancelled', the limit that
+                     stopped the search.
+            stats - SolverStats; counts up to the point the search stopped.
+        Returns:
+            A tuple (None,None), so that it unpacks like an unsolved result,
+            which also carries reason and stats.
+        '''
+        self=tuple.__new__(cls,(None,None))
+        self.reason=reason
+        self.stats=stats
+        return self
+
+    def __reduce__(self):
+        # Rebuilt from reason and stats, so it can be returned from a worker
+        # process.
+        return (BudgetExhausted,(self.reason,self.stats))
+
+    def __repr__(self):
+        return 'BudgetExhausted(%r,nodes=%d,elapsed=%.4f)'%(
+            self.reason,self.stats.nodes,self.stats.elapsed)
+
+class SearchStopped(Exception):
+    def __init__(self,reason):
+        Exception.__init__(self,reason)
+        self.reason=reason
+
+class StepTrace(object):
+    # Step (row,col,elem,type) is packed as ((row*N+col)*N+elem-1)*16+type,
+    # 4 bytes per step instead of a tuple of 4 ints.
+    __slots__=('N','codes')
+
+    def __init__(self,n=3,steps=()):
+        '''
+        Params:
+            [n] - int; order of the Sudoku puzzle the steps belong to.
+            [steps] - iterable; tuples (row,col,elem,type) to start with.
+        Returns:
+            None. A list-like sequence of steps, decoded back into tuples only
+            as they are read.
+        '''
+        N=n**2
+        self.N=N
+        self.codes=array.array('I' if 16*N**3<2**32 else 'Q')
+        self.extend(steps)
+
+    def encode(self,step):
+        '''
+        Params:
+            step - tuple; (row,col,elem,type).
+        Returns:
+            The int that step is stored as.
+        '''
+        row,col,elem,kind=step
+        return ((row*self.N+col)*self.N+elem-1)*16+kind
+
+    def decode(self,code):
+        '''
+        Params:
+            code - int; as returned by encode().
+        Returns:
+            The tuple (row,col,elem,type) encoded in code.
+        '''
+        N=self.N
+        code,kind=divmod(code,16)
+        cell,elem=divmod(code,N)
+        return (cell//N,cell%N,elem+1,kind)
+
+    def append(self,step):
+        '''
+        Params:
+            step - tuple; (row,col,elem,type) to be added at the end.
+        Returns:
+            None.
+        '''
+        self.codes.append(self.encode(step))
+
+    def extend(self,steps):
+        '''
+        Params:
+            steps - iterable; tuples (row,col,elem,type) to be added at the end.
+        Returns:
+            None.
+        '''
+        self.codes.extend(self.encode(step) for step in steps)
+
+    def copy(self):
+        '''
+        Params:
+            None.
+        Returns:
+            A new StepTrace holding the same steps.
+        '''
+        copied=StepTrace.__new__(StepTrace)
+        copied.N,copied.codes=self.N,self.codes[:]
+        return copied
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self,index):
+        if isinstance(index,slice):
+            return [self.decode(code) for code in self.codes[index]]
+        return self.decode(self.codes[index])
+
+    def __delitem__(self,index):
+        del self.codes[index]
+
+    def __iter__(self):
+        for code in self.codes: yield self.decode(code)
+
+    def __add__(self,other):
+        added=self.copy()
+        added.extend(other)
+        return added
+
+    def __radd__(self,other):
+        added=self.copy()
+        del added.codes[:]
+        added.extend(other)
+        added.codes.extend(self.codes)
+        return added
+
+    def __eq__(self,other):
+        try: return len(self)==len(other) and list(self)==list(other)
+        except TypeError: return NotImplemented
+
+    __hash__=None
+
+    def __repr__(self):
+        return 'StepTrace(%r)'%list(self)
+
+def checkTechniques(techniques):
+    '''
+    Params:
+        techniques - iterable; names passed as the techniques of a solver.
+    Returns:
+        None. Raises an Exception for the first name not in TECHNIQUES.
+    '''
+    for name in techniques:
+        if name not in TECHNIQUES:
+            raise Exception("Unknown technique %s."%name)
+
+def solveSudoku(board,engine='backtrack',heuristic='mrv',valueorder='natural',
+                stats=None,deadline=None,maxnodes=None,cancel=None,
+                progress=None,progressevery=1000,techniques=(),trace=True):
     '''
     Params:
         board - list; 2-dimensional list containing the board to be solved.
+        [engine] - str; one of ENGINES. 'backtrack' uses the direct solving
+                   techniques with backtracking, 'dlx' solves the board as an
+                   exact cover problem with Dancing Links, 'sat' as a CNF
+                   formula with a clause learning SAT solver, which records
+                   all of its placements as type 0.
+        [heuristic] - str; key of HEURISTICS choosing the cell to guess next.
+        [valueorder] - str; key of VALUEORDERS ordering the guesses for it.
+        [stats] - SolverStats; if given, counts the search nodes expanded (the
+                  decisions, for the sat engine) and the seconds taken, and
+                  for the backtrack engine the detailed counts if asked for.
+        [deadline] - float; time.time() after which the search gives up.
+        [maxnodes] - int; number of search nodes after which it gives up.
+        [cancel] - object; anything with an is_set() method, such as a
+                   threading.Event, checked at every node. The search gives up
+                   once it returns True.
+        [progress] - function; if given, called with the SolverStats every
+                     progressevery nodes.
+        [progressevery] - int; see progress. Must be at least 1.
+        [techniques] - iterable; keys of TECHNIQUES the backtrack engine tries
+                       before guessing, see fillBoard().
+        [trace] - bool; if False, no steps are recorded and None is returned
+                  in their place, which saves time and memory when only the
+                  solution is wanted.
     Returns:
-        The completed board and list of steps if there exists a solution,
-        otherwise None.
+        The completed board and a StepTrace of the steps if there exists a
+        solution, otherwise None. If a limit is reached first, a
+        BudgetExhausted is returned instead and the board is left as it was
+        given.
     '''
     n=round(len(board)**0.5)
     if n**2!=len(board): raise Exception("Board dims are not square numbers.")
-    s=Sudoku(board,n)
-    steps=[]
-    def backtrack(s,steps):
-        filled=fillBoard(s)
-        steps.extend(filled)
-        if s.isFull():
-            if s.isValid():return True
-            for k in filled:
-                steps.remove(k)
-                s.resetCell(k[0],k[1])
-            return None
-        row,col=nextChoice(s)
-        if row!=-1:
-            for num in s.getChoices(row,col):
-                s.setCell(row,col,num)
-                steps.append((row,col,num,0))
-                if s.isValid():
-                    if backtrack(s,steps):
-                        return True
-                steps.pop()
-            s.resetCell(row,col)
-        for k in filled:
-            steps.remove(k)
-            s.resetCell(k[0],k[1])
+    if engine not in ENGINES: raise Exception("Unknown engine %s."%engine)
+    if heuristic not in HEURISTICS:
+        raise Exception("Unknown heuristic %s."%heuristic)
+    if valueorder not in VALUEORDERS:
+        raise Exception("Unknown value order %s."%valueorder)
+    checkTechniques(techniques)
+    if progressevery<1:
+        raise ValueError("progressevery must be at least 1.")
+    if stats is None: stats=SolverStats()
+    start=time.time()
+    def tick():
+        stats.nodes+=1
+        if maxnodes is not None and stats.nodes>maxnodes:
+            raise SearchStopped('nodes')
+        if deadline is not None and time.time()>deadline:
+            raise SearchStopped('deadline')
+        if cancel is not None and cancel.is_set():
+            raise SearchStopped('cancelled')
+        if progress is not None and stats.nodes%progressevery==0:
+            stats.elapsed=time.time()-start
+            progress(stats)
+    detailed=stats.detailed and engine=='backtrack'
+    s=CountingSudoku(board,n,stats) if detailed else Sudoku(board,n)
+    steps=StepTrace(n)
+    def backtrack(s,steps,units,depth):
+        # Every cell set by the solver is both on the trail and in steps (when
+        # tracing), so one mark undoes a failed branch in O(changes).
+        tick()
+        mark=s.getTrailMark()
+        if detailed:
+            began=time.time()
+            filled=fillBoard(s,units,techniques,True)
+            stats.propagationtime+=time.time()-began
+            stats.maxdepth=max(stats.maxdepth,depth)
+            stats.steptypes.update(step[3] for step in filled)
+        else: filled=fillBoard(s,units,techniques,trace)
+        if trace: steps.extend(filled)
+        # The board was valid before this node, so only the cells changed
+        # since need checking; every number set is one of its cell's choices,
+        # so a full board that passes is solved.
+        if s.isValidSince(mark):
+            if s.isFull(): return True
+            row,col=nextChoice(s,heuristic)
+            if row!=-1:
+                for num in VALUEORDERS[valueorder](s,row,col):
+                    guess=s.getTrailMark()
+                    s.setCell(row,col,num)
+                    if trace: steps.append((row,col,num,0))
+                    if detailed:
+                        stats.guesses+=1
+                        stats.steptypes[0]+=1
+                    if s.isValidSince(guess):
+                        if backtrack(s,steps,s.getCellUnits(row,col),
+                                     depth+1):
+                            return True
+                    s.undoTrail(guess)
+                    if trace: del steps[guess:]
+                    if detailed: stats.backtracks+=1
+        s.undoTrail(mark)
+        if trace: del steps[mark:]
         return None
-    return (s.board,steps) if backtrack(s,steps) else (None,None)
+    try:
+        if engine!='backtrack':
+            if engine=='dlx': found=solveDLX(s.board,n,tick,trace)
+            else: found=solveSAT(s.board,n,tick)
+            if found is None: return (None,None)
+            for row,col,num,_ in found: s.setCell(row,col,num)
+            if trace: steps.extend(found)
+        elif not s.isValid() or not backtrack(s,steps,None,0):
+            return (None,None)
+        # The Sudoku works on a copy, so the solution is written back into the
+        # rows of board.
+        for line,solved in zip(board,s.board): line[:]=solved
+        return (board,steps if trace else None)
+    except SearchStopped as e:
+        return BudgetExhausted(e.reason,stats)
+    finally:
+        stats.elapsed=time.time()-start
+        if detailed: stats.searchtime=stats.elapsed-stats.propagationtime
+
+def compareHeuristics(board,heuristics=None,valueorders=None):
+    '''
+    Params:
+        board - list; 2-dimensional list containing the board to be solved.
+        [heuristics] - list; keys of HEURISTICS to compare, defaults to all.
+        [valueorders] - list; keys of VALUEORDERS to compare, defaults to all.
+    Returns:
+        A dict mapping each (heuristic,valueorder) pair to the number of
+        search nodes the backtrack engine expanded to solve a copy of board.
+    '''
+    if heuristics is None: heuristics=sorted(HEURISTICS)
+    if valueorders is None: valueorders=sorted(VALUEORDERS)
+    nodes={}
+    for heuristic in heuristics:
+        for valueorder in valueorders:
+            stats=SolverStats()
+            solveSudoku([list(row) for row in board],'backtrack',heuristic,
+                        valueorder,stats)
+            nodes[(heuristic,valueorder)]=stats.nodes
+    return nodes
+
+def iterSolutions(board,heuristic='mrv',techniques=()):
+    '''
+    Params:
+        board - list; 2-dimensional list containing the board to be searched.
+                Not modified.
+        [heuristic] - str; key of HEURISTICS choosing the cell to guess next.
+        [techniques] - iterable; keys of TECHNIQUES tried before guessing, see
+                       fillBoard().
+    Returns:
+        A generator yielding each solution of the board as a new 2-dimensional
+        list, searching only as far as the next one is needed. The search keeps
+        one Sudoku and undoes its trail on backtracking, so memory grows with
+        the depth of the search rather than with the number of solutions.
+        Bad arguments are raised straight away, not at the first next().
+    '''
+    n=round(len(board)**0.5)
+    if n**2!=len(board): raise Exception("Board dims are not square numbers.")
+    if heuristic not in HEURISTICS:
+        raise Exception("Unknown heuristic %s."%heuristic)
+    techniques=tuple(techniques)
+    checkTechniques(techniques)
+    s=Sudoku([list(row) for row in board],n)
+    if not s.isValid(): return iter(())
+    return searchSolutions(s,heuristic,techniques)
+
+def searchSolutions(s,heuristic,techniques):
+    '''
+    Params:
+        s - Sudoku; a valid board to be searched, filled in place.
+        heuristic - str; as for iterSolutions().
+        techniques - tuple; as for iterSolutions().
+    Returns:
+        The generator of iterSolutions().
+    '''
+    # One frame (mark,guess,row,col,nums) per guessed cell on the current path:
+    # the trail before the node was filled and before the guess, the cell and
+    # the choices for it not tried yet. Iterative, so deep searches cannot hit
+    # Python's recursion limit.
+    stack=[]
+    units=None
+    while True:
+        mark=s.getTrailMark()
+        fillBoard(s,units,techniques,False)
+        if s.isValidSince(mark):
+            if s.isFull(): yield s.board
+            else:
+                row,col=nextChoice(s,heuristic)
+                if row!=-1:
+                    stack.append((mark,s.getTrailMark(),row,col,
+                                  iter(s.getChoices(row,col))))
+                    mark=None
+        if mark is not None: s.undoTrail(mark)
+        # Move on to the next choice that keeps the board valid, backtracking
+        # out of every cell whose choices have all been tried.
+        while stack:
+            mark,guess,row,col,nums=stack[-1]
+            s.undoTrail(guess)
+            num=next(nums,None)
+            if num is None:
+                s.undoTrail(mark)
+                stack.pop()
+                continue
+            s.setCell(row,col,num)
+            if s.isValidSince(guess): break
+        else: return
+        units=s.getCellUnits(row,col)
+
+def countSolutions(board,limit=2,engine='dlx',heuristic='mrv'):
+    '''
+    Params:
+        board - list; 2-dimensional list containing the board to be counted.
+                Not modified.
+        [limit] - int; stop searching once this many solutions are found, or
+                  None to count them all. 0 or less counts none.
+        [engine] - str; one of ENGINES, as for solveSudoku(). Defaults to
+                   'dlx', which counts several times faster than 'backtrack'.
+        [heuristic] - str; key of HEURISTICS used by the backtrack engine.
+    Returns:
+        The number of solutions of the board, up to limit. No steps are
+        recorded.
+    '''
+    if limit is not None and limit<=0: return 0
+    n=round(len(board)**0.5)
+    if n**2!=len(board): raise Exception("Board dims are not square numbers.")
+    if engine not in ENGINES: raise Exception("Unknown engine %s."%engine)
+    s=Sudoku([list(row) for row in board],n)
+    if not s.isValid(): return 0
+    if engine=='dlx': return countDLX(s.board,n,limit)
+    if engine=='sat': return countSAT(s.board,n,limit)
+    count=0
+    for _ in iterSolutions(s.board,heuristic):
+        count+=1
+        if count==limit: break
+    return count
+
+def hasUniqueSolution(board,engine='dlx',heuristic='mrv'):
+    '''
+    Params:
+        board - list; 2-dimensional list containing the board to be checked.
+        [engine] - str; one of ENGINES, as for solveSudoku().
+        [heuristic] - str; key of HEURISTICS used by the backtrack engine.
+    Returns:
+        True if the board has exactly one solution, stopping the search as soon
+        as a second one is found.
+    '''
+    return countSolutions(board,2,engine,heuristic)==1
+
+'''-----------------------------------------------------------------------------
+-------------------------------------HINTS--------------------------------------
+-----------------------------------------------------------------------------'''
+
+def firstPlacement(s):
+    '''
+    Params:
+        s - Sudoku; board to be examined. Not modified.
+    Returns:
+        A tuple (row,col,elem,type) of the first singleton (type 1) on the
+        board, or failing that the first unique cell in a row, col or box
+        (type 2,3,4), or None if there is neither. False if an empty cell has
+        no choices left.
+    '''
+    N=s.N
+    masks=[s.getIndexChoicesMask(index) for index in range(N*N)]
+    for index,mask in enumerate(masks):
+        if mask==0 and s.cells[index]==0: return False
+    for index,mask in enumerate(masks):
+        if mask!=0 and mask&(mask-1)==0:
+            return divmod(index,N)+(mask.bit_length(),1)
+    for unit,members in enumerate(s.geometry.unitcells):
+        once=twice=0
+        for index in members:
+            twice|=once&masks[index]
+            once|=masks[index]
+        unique=once&~twice
+        if unique==0: continue
+        for index in members:
+            mask=masks[index]&unique
+            if mask!=0:
+                return divmod(index,N)+((mask&-mask).bit_length(),2+unit//N)
+    return None
+
+def nextHint(board,techniques=tuple(TECHNIQUES),heuristic='mrv',
+             checksolvable=False):
+    '''
+    Params:
+        board - list; 2-dimensional list containing the board in play. Not
+                modified.
+        [techniques] - iterable; keys of TECHNIQUES that may be used when no
+                       singleton or unique cell is left.
+        [heuristic] - str; key of HEURISTICS choosing the cell to guess.
+        [checksolvable] - bool; if True, the board is first checked to have a
+                          solution, at the cost of a search per hint.
+    Returns:
+        A list of the steps (row,col,elem,type) leading to the next number to
+        enter, in the format of solveSudoku(), without solving the rest of the
+        board. The last step is the placement: a singleton or unique cell if
+        there is one, otherwise the first placement the cheapest TECHNIQUES
+        lead to, preceded by the choices they rule out. If logic alone gets no
+        further, it is a guess (type 0) of the cell picked by heuristic, with
+        its number taken from a solution of the board. None if the board is
+        full, clashes or is found to have no solution; without checksolvable,
+        logic alone may still give a hint for a board with no solution.
+    '''
+    n=round(len(board)**0.5)
+    if n**2!=len(board): raise Exception("Board dims are not square numbers.")
+    if heuristic not in HEURISTICS:
+        raise Exception("Unknown heuristic %s."%heuristic)
+    checkTechniques(techniques)
+    s=Sudoku([list(row) for row in board],n)
+    if s.isFull() or not s.isValid(): return None
+    if checksolvable and countSolutions(board,1)==0: return None
+    techniques=[name for name in TECHNIQUES if name in techniques]
+    elims=[]
+    while True:
+        step=firstPlacement(s)
+        if step is False: return None
+        if step is not None: return elims+[step]
+        for name in techniques:
+            technique,kind=TECHNIQUES[name]
+            found=technique(s)
+            if found!=[]: break
+        else: break
+        for row,col,elem in found:
+            if s.getChoicesMask(row,col)&(1<<(elem-1)):
+                s.eliminate(row,col,elem)
+                elims.append((row,col,elem,kind))
+    # Only the guess is returned, as the choices ruled out led nowhere.
+    row,col=nextChoice(s,heuristic)
+    solution,_=solveSudoku([list(line) for line in board],trace=False)
+    if solution is None: return None
+    return [(row,col,solution[row][col],0)]
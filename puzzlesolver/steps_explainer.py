@@ -4,6 +4,7 @@ explanations to give for each step of the solution, and then drawing the
 explanations in a self-explanatory, noughts and crosses method.
 '''
 import copy
+from puzzlesolver.solve_sudoku import isPlacement
 
 def clashes1(data,board):
     '''
@@ -143,6 +144,18 @@ def clashes4(data,board):
                             break
     return x,o
 
+def clashesElimination(data):
+    '''
+    Params:
+        data - object; stores data for the user interface of the application.
+    Returns:
+        x - list; contains the tuple (row,col) of the cell the current step
+            rules its number out of, to draw an X in.
+        o - list; empty, since the cells that make up the pattern (pair,
+            X-Wing and so on) are not recorded in the step.
+    '''
+    return [(data.currentstep[0],data.currentstep[1])],[]
+
 def drawxo(canvas,data,x,o):
     '''
     Params:
@@ -179,10 +192,12 @@ def drawCurrentClashesSudoku(canvas,data):
         canvas.
     '''
     currboard=copy.deepcopy(data.board)
-    for row,col,elem,_ in data.finishedsteps:currboard[row][col]=elem
+    for step in data.finishedsteps:
+        if isPlacement(step):currboard[step[0]][step[1]]=step[2]
     if data.currentstep[3]==1:x,o=clashes1(data,currboard)
     elif data.currentstep[3]==2:x,o=clashes2(data,currboard)
     elif data.currentstep[3]==3:x,o=clashes3(data,currboard)
     elif data.currentstep[3]==4:x,o=clashes4(data,currboard)
+    elif not isPlacement(data.currentstep):x,o=clashesElimination(data)
     else:x,o=[],[]
     drawxo(canvas,data,x,o)
@@ -0,0 +1,338 @@
+'''
+This file contains a cache of solved sudoku puzzles. Each board is reduced to a
+canonical form under the symmetries of Sudoku (relabelling the numbers,
+transposing, and permuting bands, stacks and the rows and cols within them), so
+that a puzzle equivalent to one solved before is answered from the cache and
+mapped back to the caller's orientation. Solutions are kept in a bounded
+in-memory LRU, optionally backed by an SQLite file.
+'''
+import collections
+import itertools
+import json
+import math
+import sqlite3
+from puzzlesolver.solve_sudoku import *
+
+SYMBOLS='0123456789ABCDEFGHIJKLMNOP'
+
+# Boards whose invariants leave more orientations than this to compare are
+# given a key from the first orientation found instead of the least one. The
+# key still identifies the board exactly, only fewer equivalent boards share it.
+CANONICAL_LIMIT=256
+
+'''-----------------------------------------------------------------------------
+----------------------------CANONICAL FORM FUNCTIONS----------------------------
+-----------------------------------------------------------------------------'''
+
+def tieOrders(items,sig):
+    '''
+    Params:
+        items - list; indices to be ordered.
+        sig - function; maps an index to a signature that is unchanged by the
+              symmetries of the board.
+    Returns:
+        A list of every ordering of items sorted by signature, with the items
+        of equal signature taking all of their possible orders.
+    '''
+    groups=[list(group) for _,group in
+            itertools.groupby(sorted(items,key=sig),key=sig)]
+    return [sum(perm,[]) for perm in
+            itertools.product(*[[list(p) for p in itertools.permutations(g)]
+                                for g in groups])]
+
+def countTieOrders(items,sig):
+    '''
+    Params:
+        items - list; indices to be ordered.
+        sig - function; as for tieOrders().
+    Returns:
+        len(tieOrders(items,sig)) without building the orderings.
+    '''
+    total=1
+    for count in collections.Counter(sig(item) for item in items).values():
+        total*=math.factorial(count)
+    return total
+
+def lineOrders(n,linesig,limit):
+    '''
+    Params:
+        n - int; order of the board.
+        linesig - function; maps a line index to its signature.
+        limit - int; largest number of orderings to build.
+    Returns:
+        A list of orderings of the rows (or cols) of a board that keep each
+        band (or stack) together, or None if there are more than limit.
+    '''
+    bands=[list(range(band*n,band*n+n)) for band in range(n)]
+    bandsig=lambda band:tuple(sorted(linesig(line) for line in bands[band]))
+    total=countTieOrders(range(n),bandsig)
+    for band in bands: total*=countTieOrders(band,linesig)
+    if total>limit: return None
+    inner=[tieOrders(band,linesig) for band in bands]
+    orders=[]
+    for bandorder in tieOrders(list(range(n)),bandsig):
+        for choice in itertools.product(*inner):
+            orders.append(sum((choice[band] for band in bandorder),[]))
+    return orders
+
+def relabel(board,rows,cols):
+    '''
+    Params:
+        board - list; 2-dimensional list of ints.
+        rows - list; order in which the rows of board are read.
+        cols - list; order in which the cols of board are read.
+    Returns:
+        A tuple (key,labels) where key is the board read in that order with its
+        numbers renamed 1,2,... in order of first appearance, as a string, and
+        labels maps each original number to its new name.
+    '''
+    labels=[0]*(len(board)+1)
+    nextlabel=1
+    chars=[]
+    for row in rows:
+        line=board[row]
+        for col in cols:
+            num=line[col]
+            if num!=0 and labels[num]==0:
+                labels[num]=nextlabel
+                nextlabel+=1
+            chars.append(SYMBOLS[labels[num]])
+    # Numbers missing from the board still need a name for the solution.
+    for num in range(1,len(board)+1):
+        if labels[num]==0:
+            labels[num]=nextlabel
+            nextlabel+=1
+    return ''.join(chars),labels
+
+def canonicalForm(board,limit=CANONICAL_LIMIT):
+    '''
+    Params:
+        board - list; 2-dimensional list containing a board. Not modified.
+        [limit] - int; largest number of orientations compared.
+    Returns:
+        A tuple (key,transform). key is a string naming the canonical board,
+        the same for every board that is a relabelled, transposed, band or
+        stack permuted copy of another, as long as neither has more than limit
+        orientations left to compare. transform is (transpose,rows,cols,labels)
+        as taken by applyTransform().
+    '''
+    n=round(len(board)**0.5)
+    if n**2!=len(board): raise Exception("Board dims are not square numbers.")
+    N=n**2
+    # How often each number is given is unchanged by every symmetry, and so
+    # is the sorted list of those counts over the numbers in a line.
+    freq=collections.Counter(num for row in board for num in row)
+    best=None
+    for transpose in (False,True):
+        t=[list(line) for line in zip(*board)] if transpose else board
+        rowsig=[tuple(sorted(freq[num] for num in line if num!=0))
+                for line in t]
+        colsig=[tuple(sorted(freq[num] for num in line if num!=0))
+                for line in zip(*t)]
+        roworders=lineOrders(n,rowsig.__getitem__,limit)
+        colorders=lineOrders(n,colsig.__getitem__,limit)
+        if (roworders is None or colorders is None or
+            len(roworders)*len(colorders)>limit):
+            # Too many ties: fall back to the first orientation only.
+            roworders=colorders=[list(range(N))]
+        for rows in roworders:
+            for cols in colorders:
+                key,labels=relabel(t,rows,cols)
+                if best is None or key<best[0]:
+                    best=(key,(transpose,rows,cols,labels))
+    return best
+
+def applyTransform(board,transform):
+    '''
+    Params:
+        board - list; 2-dimensional list in the caller's orientation.
+        transform - tuple; (transpose,rows,cols,labels) as from
+                    canonicalForm().
+    Returns:
+        A new 2-dimensional list of the board in canonical orientation: row i,
+        col j holds labels[num], where num is at row rows[i], col cols[j] of
+        the board, transposed first if transpose is True.
+    '''
+    transpose,rows,cols,labels=transform
+    t=[list(line) for line in zip(*board)] if transpose else board
+    return [[labels[t[row][col]] for col in cols] for row in rows]
+
+def invertTransform(board,transform):
+    '''
+    Params:
+        board - list; 2-dimensional list in canonical orientation.
+        transform - tuple; as for applyTransform().
+    Returns:
+        A new 2-dimensional list of the board in the caller's orientation, so
+        that invertTransform(applyTransform(b,t),t)==b.
+    '''
+    transpose,rows,cols,labels=transform
+    inverse=[0]*len(labels)
+    for num,label in enumerate(labels): inverse[label]=num
+    N=len(board)
+    t=[[0]*N for i in range(N)]
+    for i,row in enumerate(rows):
+        for j,col in enumerate(cols):
+            t[row][col]=inverse[board[i][j]]
+    return [list(line) for line in zip(*t)] if transpose else t
+
+def invertSteps(steps,transform):
+    '''
+    Params:
+        steps - list; tuples (row,col,elem,type) in canonical orientation.
+        transform - tuple; as for applyTransform().
+    Returns:
+        The same steps in the caller's orientation. A unique cell by row in a
+        transposed board is one by col in the caller's, and vice versa.
+    '''
+    transpose,rows,cols,labels=transform
+    inverse=[0]*len(labels)
+    for num,label in enumerate(labels): inverse[label]=num
+    swap={2:3,3:2} if transpose else {}
+    mapped=[]
+    for row,col,elem,kind in steps:
+        row,col=rows[row],cols[col]
+        if transpose: row,col=col,row
+        mapped.append((row,col,inverse[elem],swap.get(kind,kind)))
+    return mapped
+
+'''-----------------------------------------------------------------------------
+----------------------------------CACHE CLASSES---------------------------------
+-----------------------------------------------------------------------------'''
+
+class CacheStats(object):
+    def __init__(self):
+        '''
+        Params:
+            None.
+        Returns:
+            None. hits and diskhits count lookups answered from memory and from
+            the SQLite file, misses those that had to be solved, evictions the
+            entries dropped from memory to stay within maxsize.
+        '''
+        self.hits=0
+        self.diskhits=0
+        self.misses=0
+        self.evictions=0
+
+    def __repr__(self):
+        return 'CacheStats(hits=%d,diskhits=%d,misses=%d,evictions=%d)'%(
+            self.hits,self.diskhits,self.misses,self.evictions)
+
+class SolutionCache(object):
+    def __init__(self,maxsize=1024,path=None,limit=CANONICAL_LIMIT):
+        '''
+        Params:
+            [maxsize] - int; number of solutions kept in memory.
+            [path] - str; SQLite file in which every solution is also stored,
+                     so it outlives the process. None keeps them in memory only.
+            [limit] - int; passed on to canonicalForm().
+        Returns:
+            None.
+        '''
+        self.maxsize=maxsize
+        self.limit=limit
+        self.memory=collections.OrderedDict()
+        self.stats=CacheStats()
+        self.db=None
+        if path is not None:
+            self.db=sqlite3.connect(path)
+            self.db.execute('CREATE TABLE IF NOT EXISTS solutions '
+                            '(key TEXT PRIMARY KEY,solution TEXT,steps TEXT)')
+            self.db.commit()
+
+    def __len__(self):
+        return len(self.memory)
+
+    def close(self):
+        '''
+        Params:
+            None.
+        Returns:
+            None, closes the SQLite file if there is one.
+        '''
+        if self.db is not None:
+            self.db.close()
+            self.db=None
+
+    def lookup(self,key):
+        '''
+        Params:
+            key - str; canonical key, including the solver options.
+        Returns:
+            The cached tuple (solution,steps) in canonical orientation, with
+            solution None if the board has none, or None if key is not cached.
+        '''
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.stats.hits+=1
+            return self.memory[key]
+        if self.db is not None:
+            found=self.db.execute('SELECT solution,steps FROM solutions WHERE '
+                                  'key=?',(key,)).fetchone()
+            if found is not None:
+                self.stats.diskhits+=1
+                value=(json.loads(found[0]),
+                       [tuple(step) for step in json.loads(found[1])]
+                       if found[1] is not None else None)
+                self.remember(key,value)
+                return value
+        self.stats.misses+=1
+        return None
+
+    def remember(self,key,value):
+        '''
+        Params:
+            key - str; canonical key.
+            value - tuple; (solution,steps) in canonical orientation.
+        Returns:
+            None, puts value in memory, evicting the least recently used entry
+            if the cache is full.
+        '''
+        self.memory[key]=value
+        self.memory.move_to_end(key)
+        while len(self.memory)>self.maxsize:
+            self.memory.popitem(last=False)
+            self.stats.evictions+=1
+
+    def store(self,key,value):
+        '''
+        Params:
+            key - str; canonical key.
+            value - tuple; (solution,steps) in canonical orientation.
+        Returns:
+            None, puts value in memory and in the SQLite file if there is one.
+        '''
+        self.remember(key,value)
+        if self.db is not None:
+            solution,steps=value
+            self.db.execute('INSERT OR REPLACE INTO solutions VALUES (?,?,?)',
+                            (key,json.dumps(solution),
+                             None if steps is None else
+                             json.dumps(list(steps))))
+            self.db.commit()
+
+    def solve(self,board,engine='backtrack',heuristic='mrv',
+              valueorder='natural'):
+        '''
+        Params:
+            board - list; 2-dimensional list containing the board to be solved.
+                    Not modified.
+            [engine],[heuristic],[valueorder] - as for solveSudoku(), and part
+                of the key, since they decide the steps taken.
+        Returns:
+            As for solveSudoku(): the completed board and list of steps if
+            there exists a solution, otherwise (None,None), in the orientation
+            of board.
+        '''
+        key,transform=canonicalForm(board,self.limit)
+        key='%s|%s|%s|%s'%(key,engine,heuristic,valueorder)
+        value=self.lookup(key)
+        if value is None:
+            value=solveSudoku(applyTransform(board,transform),engine,
+                              heuristic,valueorder)
+            self.store(key,value)
+        solution,steps=value
+        if solution is None: return (None,None)
+        return (invertTransform(solution,transform),
+                invertSteps(steps,transform))
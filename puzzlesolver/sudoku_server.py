@@ -0,0 +1,508 @@
+'''
+This file contains a small HTTP/JSON solving service that needs nothing beyond
+the standard library. Boards are solved on a warm pool of worker processes, so
+clients pay for a round trip rather than a new interpreter per puzzle. Run it
+as:
+
+$ python -m puzzlesolver.sudoku_server --port 8000 --workers 4
+
+POST /solve takes a JSON object holding either "board", one puzzle, or
+"boards", a list of them. A puzzle is a 2-dimensional list of ints or a line in
+the format of puzzlesolver.solve, and its solution comes back in the same form.
+The optional keys "engine", "heuristic", "techniques", "timeout" (seconds per
+puzzle, the server's default if left out) and "steps" (true to return the steps
+taken) set the solver options.
+
+A single board is answered with one JSON object {"solution","error",
+"elapsed"}, and "steps" if asked for. A list is answered with {"results": [...]}
+in input order, or, once it holds more than the stream threshold of boards or
+"stream" is true, as NDJSON: one such object per line with its "index", written
+as each puzzle completes. GET /health reports the pool and queue.
+
+Puzzles from every request go through one queue, from which a batcher thread
+sends them to the workers in batches, so that many small requests share a
+round trip to the pool. The queue is bounded: a request that would overfill it
+is refused with 503 and a Retry-After header.
+'''
+import argparse
+import collections
+import concurrent.futures
+import concurrent.futures.process
+import http.server
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from puzzlesolver.solve_sudoku import *
+from puzzlesolver.batch_sudoku import *
+from puzzlesolver.solve import parseLine,formatBoard
+
+'''-----------------------------------------------------------------------------
+-----------------------------WORKER HELPER FUNCTIONS----------------------------
+-----------------------------------------------------------------------------'''
+
+def warmWorker():
+    '''
+    Params:
+        None.
+    Returns:
+        None. Run once in each worker process as it starts, so the index tables
+        of every order and the solver code paths are ready before the first
+        request arrives.
+    '''
+    for n in range(2,6): getGeometry(n)
+    for engine in ENGINES:
+        solveSudoku([[0]*9 for i in range(9)],engine,trace=False)
+
+def warmTask():
+    '''
+    Params:
+        None.
+    Returns:
+        The pid of the worker it ran in.
+    '''
+    time.sleep(0.05)
+    return os.getpid()
+
+'''-----------------------------------------------------------------------------
+----------------------------------SOLVER SERVICE--------------------------------
+-----------------------------------------------------------------------------'''
+
+class ServiceBusy(Exception):
+    pass
+
+class SolverService(object):
+    def __init__(self,workers=None,batchsize=32,batchwindow=0.002,
+                 maxpending=4096,timeout=30.0):
+        '''
+        Params:
+            [workers] - int; number of worker processes, defaults to the number
+                        of CPUs.
+            [batchsize] - int; most puzzles sent to a worker at a time.
+            [batchwindow] - float; seconds the batcher waits for more puzzles
+                            to fill a batch once it holds one.
+            [maxpending] - int; most puzzles queued or being solved at once.
+            [timeout] - float; seconds allowed per puzzle when submit() is
+                        given none, or None for no limit.
+        Returns:
+            None. The workers are started and warmed up straight away. Call
+            close() when done.
+        '''
+        if workers is None: workers=os.cpu_count() or 1
+        self.workers=workers
+        self.batchsize=batchsize
+        self.batchwindow=batchwindow
+        self.maxpending=maxpending
+        self.timeout=timeout
+        self.executor=concurrent.futures.ProcessPoolExecutor(
+            workers,initializer=warmWorker)
+        # Started together, the warm-up tasks spawn every worker at once.
+        warm=[self.executor.submit(warmTask) for _ in range(workers)]
+        concurrent.futures.wait(warm)
+        self.pending=0
+        self.lock=threading.Lock()
+        self.poollock=threading.Lock()
+        self.restarts=0
+        self.queue=queue.Queue()
+        # Only a couple of batches per worker are handed to the pool, so the
+        # rest wait in the queue, where they count against maxpending.
+        self.inflight=threading.Semaphore(2*workers)
+        self.batches=0
+        self.closed=False
+        self.batcher=threading.Thread(target=self.runBatcher,daemon=True)
+        self.batcher.start()
+
+    def close(self):
+        '''
+        Params:
+            None.
+        Returns:
+            None, stops the batcher and shuts the workers down. Puzzles still
+            queued fail with 'cancelled'.
+        '''
+        self.closed=True
+        self.queue.put(None)
+        self.batcher.join()
+        with self.poollock: executor=self.executor
+        executor.shutdown(wait=True,cancel_futures=True)
+
+    def restartPool(self,broken):
+        '''
+        Params:
+            broken - concurrent.futures.ProcessPoolExecutor; a pool that lost a
+                     worker and can take no more work.
+        Returns:
+            None, replaces broken with a new pool unless that has been done
+            already or the service is closed.
+        '''
+        with self.poollock:
+            if self.executor is broken and not self.closed:
+                self.executor=concurrent.futures.ProcessPoolExecutor(
+                    self.workers,initializer=warmWorker)
+                self.restarts+=1
+        broken.shutdown(wait=False)
+
+    def submit(self,boards,timeout=None,**kwargs):
+        '''
+        Params:
+            boards - list; 2-dimensional lists containing the boards to be
+                     solved.
+            [timeout] - float; seconds allowed per puzzle, or None for the
+                        default of the service.
+            Any other keyword arguments are passed on to solveSudoku().
+        Returns:
+            A list of concurrent.futures.Future, one per board, each resolving
+            to its BatchResult, whose index is the position of the board in
+            boards. Raises ServiceBusy if the boards do not fit in the queue.
+        '''
+        with self.lock:
+            if self.closed or self.pending+len(boards)>self.maxpending:
+                raise ServiceBusy("%d puzzles pending."%self.pending)
+            self.pending+=len(boards)
+        if timeout is None: timeout=self.timeout
+        # Puzzles are only batched with others solved with the same options.
+        options=(timeout,tuple(sorted(kwargs.items())))
+        futures=[]
+        for index,board in enumerate(boards):
+            future=concurrent.futures.Future()
+            futures.append(future)
+            self.queue.put((options,index,board,future))
+        return futures
+
+    def runBatcher(self):
+        '''
+        Params:
+            None.
+        Returns:
+            None. Runs in its own thread until close(), taking puzzles off the
+            queue and sending them to the workers in batches.
+        '''
+        while True:
+            job=self.queue.get()
+            if job is None: break
+            jobs=[job]
+            stop=time.time()+self.batchwindow
+            while len(jobs)<self.batchsize:
+                try: job=self.queue.get(timeout=max(0.0,stop-time.time()))
+                except queue.Empty: break
+                if job is None:
+                    self.queue.put(None)
+                    break
+                jobs.append(job)
+            groups=collections.OrderedDict()
+            for job in jobs: groups.setdefault(job[0],[]).append(job)
+            for options,group in groups.items(): self.sendBatch(options,group)
+        # Fail whatever is left once closed.
+        while True:
+            try: job=self.queue.get_nowait()
+            except queue.Empty: break
+            if job is not None: self.finish([job],None)
+
+    def sendBatch(self,options,jobs):
+        '''
+        Params:
+            options - tuple; (timeout,kwargs items) shared by the jobs.
+            jobs - list; tuples (options,index,board,future) from the queue.
+        Returns:
+            None, sends the jobs to a worker once fewer than two batches per
+            worker are in flight.
+        '''
+        self.inflight.acquire()
+        self.runBatch(options,jobs,1)
+
+    def runBatch(self,options,jobs,retries):
+        '''
+        Params:
+            options - tuple; as for sendBatch().
+            jobs - list; as for sendBatch().
+            retries - int; times the batch is sent again if the pool breaks.
+        Returns:
+            None, sends the jobs to a worker on the slot taken by sendBatch(),
+            which is given back once they are finished.
+        '''
+        if self.closed:
+            self.inflight.release()
+            self.finish(jobs,None)
+            return
+        timeout,items=options
+        chunk=[(position,job[2]) for position,job in enumerate(jobs)]
+        executor=self.executor
+        try: batch=executor.submit(solveChunk,chunk,timeout,dict(items))
+        except RuntimeError as e:
+            batch=concurrent.futures.Future()
+            batch.set_exception(e)
+        else: self.batches+=1
+        def done(batch):
+            try: results=batch.result()
+            except concurrent.futures.process.BrokenProcessPool:
+                # A dead worker fails every batch in its pool. Start a new pool
+                # and send each batch once more, so only a batch that kills a
+                # worker again is failed.
+                self.restartPool(executor)
+                if retries>0:
+                    self.runBatch(options,jobs,retries-1)
+                    return
+                results=None
+            except BaseException: results=None
+            self.inflight.release()
+            self.finish(jobs,results)
+        batch.add_done_callback(done)
+
+    def finish(self,jobs,results):
+        '''
+        Params:
+            jobs - list; tuples (options,index,board,future) of one batch.
+            results - list; BatchResult of each job from solveChunk(), or None
+                      if the batch failed as a whole.
+        Returns:
+            None, resolves the future of each job.
+        '''
+        for position,(options,index,board,future) in enumerate(jobs):
+            if results is None:
+                result=BatchResult(index,None,None,'cancelled' if self.closed
+                                   else 'worker failed')
+            else:
+                result=results[position]
+                result.index=index
+            future.set_result(result)
+        with self.lock: self.pending-=len(jobs)
+
+'''-----------------------------------------------------------------------------
+-----------------------------------HTTP HANDLER---------------------------------
+-----------------------------------------------------------------------------'''
+
+class BadRequest(Exception):
+    pass
+
+def readOptions(request):
+    '''
+    Params:
+        request - dict; the JSON body of a /solve request.
+    Returns:
+        A tuple (timeout,kwargs) of the solver options it sets. Raises
+        BadRequest for an unknown or malformed option.
+    '''
+    kwargs={'engine':request.get('engine','backtrack'),
+            'trace':bool(request.get('steps',False))}
+    if kwargs['engine'] not in ENGINES:
+        raise BadRequest("Unknown engine %r."%kwargs['engine'])
+    if 'heuristic' in request:
+        if request['heuristic'] not in HEURISTICS:
+            raise BadRequest("Unknown heuristic %r."%request['heuristic'])
+        kwargs['heuristic']=request['heuristic']
+    if 'techniques' in request:
+        techniques=request['techniques']
+        if techniques=='all': techniques=list(TECHNIQUES)
+        if (not isinstance(techniques,list) or
+            any(name not in TECHNIQUES for name in techniques)):
+            raise BadRequest("Unknown techniques %r."%(techniques,))
+        kwargs['techniques']=tuple(techniques)
+    timeout=request.get('timeout')
+    if timeout is not None and (isinstance(timeout,bool) or
+                                not isinstance(timeout,(int,float)) or
+                                timeout<=0):
+        raise BadRequest("Timeout must be a positive number.")
+    return timeout,kwargs
+
+def readBoard(board):
+    '''
+    Params:
+        board - object; a puzzle decoded from JSON.
+    Returns:
+        The puzzle as a 2-dimensional list of ints. Raises BadRequest if it is
+        neither a line nor a square list of lists of ints in range.
+    '''
+    if isinstance(board,str):
+        try: return parseLine(board)
+        except ValueError as e: raise BadRequest(str(e))
+    N=len(board) if isinstance(board,list) else 0
+    n=round(N**0.5)
+    if (n<2 or n**2!=N or
+        any(not isinstance(row,list) or len(row)!=N for row in board) or
+        any(type(num) is not int or not 0<=num<=N
+            for row in board for num in row)):
+        raise BadRequest("Board is not a square grid of numbers.")
+    return board
+
+def encodeResult(result,line,steps):
+    '''
+    Params:
+        result - BatchResult; of one puzzle.
+        line - bool; if True, the solution is written as a line.
+        steps - bool; if True, the steps are included.
+    Returns:
+        A dict of the result ready to be written as JSON.
+    '''
+    solution=result.board
+    if solution is not None and line: solution=formatBoard(solution)
+    encoded={'solution':solution,'error':result.error,
+             'elapsed':round(result.elapsed,6)}
+    if steps:
+        encoded['steps']=(None if result.steps is None else
+                          [list(step) for step in result.steps])
+    return encoded
+
+class SudokuRequestHandler(http.server.BaseHTTPRequestHandler):
+    server_version='SudokuServer/1.0'
+
+    def log_message(self,format,*args):
+        if not self.server.quiet:
+            http.server.BaseHTTPRequestHandler.log_message(self,format,*args)
+
+    def sendJSON(self,status,body,headers=()):
+        data=json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type','application/json')
+        self.send_header('Content-Length',str(len(data)))
+        for key,value in headers: self.send_header(key,value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path!='/health':
+            self.sendJSON(404,{'error':'not found'})
+            return
+        service=self.server.service
+        self.sendJSON(200,{'workers':service.workers,
+                           'pending':service.pending,
+                           'maxpending':service.maxpending,
+                           'batches':service.batches,
+                           'restarts':service.restarts})
+
+    def do_POST(self):
+        if self.path!='/solve':
+            self.sendJSON(404,{'error':'not found'})
+            return
+        try:
+            length=int(self.headers.get('Content-Length',0))
+            try: request=json.loads(self.rfile.read(length))
+            except ValueError: raise BadRequest("Body is not valid JSON.")
+            if not isinstance(request,dict):
+                raise BadRequest("Body must be a JSON object.")
+            if ('board' in request)==('boards' in request):
+                raise BadRequest("Give exactly one of board and boards.")
+            single='board' in request
+            given=[request['board']] if single else request['boards']
+            if not isinstance(given,list) or given==[]:
+                raise BadRequest("Boards must be a non-empty list.")
+            boards=[readBoard(board) for board in given]
+            timeout,kwargs=readOptions(request)
+            stream=request.get('stream',len(boards)>
+                               self.server.streamthreshold)
+            if not isinstance(stream,bool):
+                raise BadRequest("Stream must be true or false.")
+        except BadRequest as e:
+            self.sendJSON(400,{'error':str(e)})
+            return
+        service=self.server.service
+        if len(boards)>service.maxpending:
+            self.sendJSON(413,{'error':'at most %d boards per request'%
+                               service.maxpending})
+            return
+        try: futures=service.submit(boards,timeout,**kwargs)
+        except ServiceBusy as e:
+            self.sendJSON(503,{'error':'busy, %s'%e},[('Retry-After','1')])
+            return
+        lines=[isinstance(board,str) for board in given]
+        steps=kwargs['trace']
+        if single:
+            result=futures[0].result()
+            self.sendJSON(200,encodeResult(result,lines[0],steps))
+        elif stream:
+            self.streamResults(futures,lines,steps)
+        else:
+            self.sendJSON(200,{'results':[
+                encodeResult(future.result(),lines[index],steps)
+                for index,future in enumerate(futures)]})
+
+    def streamResults(self,futures,lines,steps):
+        '''
+        Params:
+            futures - list; as returned by SolverService.submit().
+            lines - list; for each board, whether it was given as a line.
+            steps - bool; if True, the steps are included.
+        Returns:
+            None, writes one JSON line per result as each completes. With no
+            Content-Length, the end of the response is marked by closing the
+            connection.
+        '''
+        self.send_response(200)
+        self.send_header('Content-Type','application/x-ndjson')
+        self.end_headers()
+        self.close_connection=True
+        for future in concurrent.futures.as_completed(futures):
+            result=future.result()
+            encoded=encodeResult(result,lines[result.index],steps)
+            encoded['index']=result.index
+            try:
+                self.wfile.write((json.dumps(encoded)+'\n').encode())
+                self.wfile.flush()
+            except OSError:
+                # The client went away; the puzzles still finish in the pool.
+                return
+
+'''-----------------------------------------------------------------------------
+--------------------------------------SERVER------------------------------------
+-----------------------------------------------------------------------------'''
+
+def makeServer(service,host='127.0.0.1',port=8000,streamthreshold=64,
+               quiet=False):
+    '''
+    Params:
+        service - SolverService; solves the puzzles of every request.
+        [host] - str; address to listen on.
+        [port] - int; port to listen on, or 0 for any free one.
+        [streamthreshold] - int; lists of more boards than this are answered
+                            as NDJSON unless the request sets "stream".
+        [quiet] - bool; if True, requests are not logged to stderr.
+    Returns:
+        A ThreadingHTTPServer, handling each request on its own thread. Call
+        its serve_forever() to start it.
+    '''
+    server=http.server.ThreadingHTTPServer((host,port),SudokuRequestHandler)
+    server.daemon_threads=True
+    server.service=service
+    server.streamthreshold=streamthreshold
+    server.quiet=quiet
+    return server
+
+def main(argv=None):
+    parser=argparse.ArgumentParser(prog='python -m puzzlesolver.sudoku_server',
+                                   description='Serve the sudoku solver over '
+                                   'HTTP/JSON.')
+    parser.add_argument('--host',default='127.0.0.1')
+    parser.add_argument('--port',type=int,default=8000)
+    parser.add_argument('--workers',type=int,default=None,
+                        help='worker processes (default: one per CPU)')
+    parser.add_argument('--batchsize',type=int,default=32,
+                        help='most puzzles per batch (default: 32)')
+    parser.add_argument('--batchwindow',type=float,default=0.002,
+                        help='seconds spent filling a batch (default: 0.002)')
+    parser.add_argument('--maxpending',type=int,default=4096,
+                        help='most puzzles queued before requests are '
+                        'refused (default: 4096)')
+    parser.add_argument('--timeout',type=float,default=30.0,
+                        help='seconds allowed per puzzle when a request sets '
+                        'none, 0 for no limit (default: 30)')
+    parser.add_argument('--stream',type=int,default=64,
+                        help='lists of more boards are streamed as NDJSON '
+                        '(default: 64)')
+    parser.add_argument('-q','--quiet',action='store_true',
+                        help='do not log requests')
+    args=parser.parse_args(argv)
+    service=SolverService(args.workers,args.batchsize,args.batchwindow,
+                          args.maxpending,args.timeout or None)
+    server=makeServer(service,args.host,args.port,args.stream,args.quiet)
+    sys.stderr.write('Serving on http://%s:%d with %d workers\n'%(
+        args.host,server.server_address[1],service.workers))
+    try: server.serve_forever()
+    except KeyboardInterrupt: pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+if __name__=='__main__':
+    sys.exit(main())
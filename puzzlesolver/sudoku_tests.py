@@ -1,7 +1,39 @@
-import math, string, time
+import math, string, time, copy, threading, collections, asyncio, os, signal
+import multiprocessing
+import json, tempfile, urllib.request, urllib.error
 from puzzlesolver.solve_sudoku import *
+from puzzlesolver.batch_sudoku import *
+from puzzlesolver.vector_sudoku import *
+from puzzlesolver.generate_sudoku import *
+from puzzlesolver.sudoku_cache import *
+from puzzlesolver.sat_sudoku import *
+from puzzlesolver.async_sudoku import *
+from puzzlesolver.benchmark_sudoku import *
+from puzzlesolver.sudoku_server import *
+from puzzlesolver.rate_sudoku import *
+from puzzlesolver.solve import parseLine,formatBoard,solveLines
 
-def testSudoku():
+# The hard 9x9 puzzle of testSudoku(), shared by the tests that need a puzzle
+# propagation alone cannot solve; each takes its own copy.
+HARD9=[[0,0,0,0,0,0,0,4,0],
+       [1,0,0,0,7,0,0,0,0],
+       [0,5,0,0,0,0,0,9,0],
+       [2,0,0,0,0,0,0,0,1],
+       [0,0,0,9,0,5,0,0,0],
+       [0,8,0,0,0,4,0,0,0],
+       [0,4,0,0,0,0,0,0,0],
+       [0,0,0,0,2,0,6,0,0],
+       [0,9,6,0,0,0,0,0,7]]
+
+def isCompletion(board,solved):
+    # True if solved is a valid, full board agreeing with every clue in board.
+    if solved is None: return False
+    s=Sudoku(copy.deepcopy(solved),round(len(board)**0.5))
+    return (s.isFull() and s.isValid() and
+            all(board[i][j] in (0,solved[i][j]) for i in range(len(board))
+                for j in range(len(board))))
+
+def testSudoku(engine='backtrack'):
     # Following (9x9) test cases taken from https://kjell.haxx.se/sudoku/
     board=[[0,0,1,0,9,0,0],
            [2,0,0,4,0,8,0],
@@ -31,8 +63,8 @@ def testSudoku():
            [1,7,2,8,6,9,3,4,5],
            [9,4,8,3,5,2,6,1,7],
            [3,5,6,1,4,7,2,8,9]]
-    assert(solveSudoku(board)==soln)
-    print('9x9 (easy): '+str(time.time()-start)+' s.')
+    assert(solveSudoku(board,engine)[0]==soln)
+    print(engine+' 9x9 (easy): '+str(time.time()-start)+' s.')
     start=time.time()
     board=[[0,0,0,0,0,0,8,0,0],
            [1,0,0,0,0,0,6,0,4],
@@ -52,8 +84,8 @@ def testSudoku():
            [7,6,1,8,9,2,4,3,5],
            [8,3,2,7,4,5,9,6,1],
            [9,5,4,6,1,3,2,8,7]]
-    assert(solveSudoku(board)==soln)
-    print('9x9 (medm): '+str(time.time()-start)+' s.')
+    assert(solveSudoku(board,engine)[0]==soln)
+    print(engine+' 9x9 (medm): '+str(time.time()-start)+' s.')
     # Following (16x16) test case taken from http://en.top-sudoku.com/
     start=time.time()
     board=[[0,0,0,0,0,0,0,4,0],
@@ -74,8 +106,8 @@ def testSudoku():
            [3,4,2,7,5,6,8,1,9],
            [5,7,1,8,2,9,6,3,4],
            [8,9,6,1,4,3,5,2,7]]
-    assert(solveSudoku(board)==soln)
-    print('9x9 (hard): '+str(time.time()-start)+' s.')
+    assert(solveSudoku(board,engine)[0]==soln)
+    print(engine+' 9x9 (hard): '+str(time.time()-start)+' s.')
     start=time.time()
     A,B,C,D,E,F=11,12,13,14,15,16
     board=[[7,0,0,8,0,C,0,0,0,0,0,0,0,0,F,0],
@@ -110,8 +142,8 @@ def testSudoku():
            [C,6,9,10,2,5,F,7,3,4,1,B,8,E,A,D],
            [3,B,1,4,E,8,C,6,9,A,7,D,2,F,5,10],
            [2,5,8,A,3,B,D,1,E,10,C,F,6,7,9,4]]
-    assert(solveSudoku(board)==soln)
-    print('16x16: '+str(time.time()-start)+' s.')
+    assert(solveSudoku(board,engine)[0]==soln)
+    print(engine+' 16x16: '+str(time.time()-start)+' s.')
     # Following (25x25) test case taken from http://sudoku-puzzles.merschat.com/
     start=time.time()
     board=[[0,0,0,25,0,0,0,0,0,4,0,0,1,0,0,0,0,0,0,0,0,0,0,0,0],
@@ -164,10 +196,750 @@ def testSudoku():
            [24,18,23,12,9,16,21,10,6,8,13,3,25,22,19,20,17,14,4,2,5,1,15,11,7],
            [7,5,1,15,11,24,18,23,12,9,16,21,10,6,8,13,3,25,22,19,20,17,14,4,2],
            [2,20,17,14,4,7,5,1,15,11,24,18,23,12,9,16,21,10,6,8,13,3,25,22,19]]
-    assert(solveSudoku(board)==soln)
-    print('25x25: '+str(time.time()-start)+' s.')
+    solved=solveSudoku(copy.deepcopy(board),engine)[0]
+    # This puzzle has more than one solution, so the one found (rather than
+    # soln) depends on the engine and heuristics.
+    assert(isCompletion(board,solved))
+    print(engine+' 25x25: '+str(time.time()-start)+' s.')
+
+def testHeuristics():
+    board=copy.deepcopy(HARD9)
+    for heuristic in HEURISTICS:
+        for valueorder in VALUEORDERS:
+            solved=solveSudoku(copy.deepcopy(board),'backtrack',heuristic,
+                               valueorder)[0]
+            assert(isCompletion(board,solved))
+    nodes=compareHeuristics(board)
+    for heuristic,valueorder in sorted(nodes):
+        print('%s/%s: %d nodes.'%(heuristic,valueorder,
+                                  nodes[(heuristic,valueorder)]))
+
+def testCountSolutions():
+    hard=copy.deepcopy(HARD9)
+    loose=copy.deepcopy(hard)
+    loose[0][7]=loose[1][0]=0
+    clash=copy.deepcopy(hard)
+    clash[0][0]=4
+    for engine in ENGINES:
+        assert(countSolutions(hard,engine=engine)==1)
+        assert(hasUniqueSolution(hard,engine=engine))
+        assert(countSolutions(loose,limit=10,engine=engine)==10)
+        assert(countSolutions(loose,engine=engine)==2)
+        assert(not hasUniqueSolution(loose,engine=engine))
+        assert(countSolutions(clash,engine=engine)==0)
+        assert(countSolutions([[0]*4 for i in range(4)],None,engine)==288)
+        for limit in (0,-1):
+            assert(countSolutions([[0]*4 for i in range(4)],limit,engine)==0)
+    assert(loose[0][7]==0 and loose[1][0]==0)
+
+def killWorkers(delay):
+    '''
+    Params:
+        delay - float; seconds to wait first.
+    Returns:
+        A started threading.Timer that then kills every child process.
+    '''
+    def kill():
+        for child in multiprocessing.active_children():
+            os.kill(child.pid,signal.SIGKILL)
+    timer=threading.Timer(delay,kill)
+    timer.start()
+    return timer
+
+def testSolveMany():
+    easy=[[0,0,1,0,9,0,0,0,8],
+          [2,0,0,4,0,8,0,0,3],
+          [8,0,0,0,0,0,1,5,0],
+          [0,2,0,5,0,1,8,0,0],
+          [0,0,9,0,2,0,0,3,0],
+          [6,0,7,9,8,3,0,0,4],
+          [1,0,0,8,0,0,0,0,0],
+          [0,0,0,3,0,2,6,0,7],
+          [0,0,6,0,4,7,0,0,9]]
+    clash=copy.deepcopy(easy)
+    clash[0][0]=1
+    boards=[easy,[[0]*7 for i in range(7)],clash]*4
+    start=time.time()
+    results=solveMany(boards,workers=2,chunksize=2)
+    assert([result.index for result in results]==list(range(len(boards))))
+    for i,result in enumerate(results):
+        if i%3==0: assert(isCompletion(easy,result.board))
+        elif i%3==1: assert(result.board is None and result.error is not None)
+        else: assert(result.board is None and result.error is None)
+    streamed=solveMany(boards,workers=2,ordered=False)
+    assert(sorted(result.index for result in streamed)==
+           list(range(len(boards))))
+    # Killing the worker fails the chunks in flight, and the rest are solved
+    # on a new pool.
+    slow=[[0]*25 for i in range(25)]
+    slow[0][0]=1
+    killWorkers(0.3)
+    results=sorted(iterSolveMany([slow]+[easy]*4,workers=1,timeout=2.0,
+                                 heuristic='max'),
+                   key=lambda result:result.index)
+    assert([result.index for result in results]==list(range(5)))
+    assert('BrokenProcessPool' in results[0].error)
+    assert(all(isCompletion(easy,result.board) for result in results[2:]))
+    print('solveMany: '+str(time.time()-start)+' s.')
+
+def testSolveBatch():
+    easy=[[0,0,1,0,9,0,0,0,8],
+          [2,0,0,4,0,8,0,0,3],
+          [8,0,0,0,0,0,1,5,0],
+          [0,2,0,5,0,1,8,0,0],
+          [0,0,9,0,2,0,0,3,0],
+          [6,0,7,9,8,3,0,0,4],
+          [1,0,0,8,0,0,0,0,0],
+          [0,0,0,3,0,2,6,0,7],
+          [0,0,6,0,4,7,0,0,9]]
+    hard=copy.deepcopy(HARD9)
+    clash=copy.deepcopy(easy)
+    clash[0][0]=1
+    # Relabelled copies of the easy puzzle are all solved by propagation.
+    boards=[]
+    for shift in range(200):
+        label=[0]+[(num+shift)%9+1 for num in range(9)]
+        boards.append([[label[num] for num in row] for row in easy])
+    boards+=[hard,clash,[[0]*4 for i in range(4)]]
+    start=time.time()
+    solutions=solveBatch(boards)
+    for board,solved in zip(boards,solutions):
+        if board is clash: assert(solved is None)
+        else: assert(isCompletion(board,solved))
+    print('solveBatch: '+str(time.time()-start)+' s.')
+
+def testSolveLines():
+    easy=('..1.9...82..4.8..38.....15..2.5.18....9.2..3.6.7983..41..8.....'
+          '...3.26.7..6.47..9')
+    lines=['# comment',easy,'',easy.replace('.','0'),'123','1'+'.'*15]
+    assert(formatBoard(parseLine(easy))==easy)
+    results=list(solveLines(lines))
+    assert([lineno for lineno,_,_,_ in results]==[2,4,5,6])
+    assert(isCompletion(parseLine(easy),results[0][1]))
+    assert(results[1][1]==results[0][1])
+    assert(results[2][1] is None and results[2][2]=='unreadable puzzle')
+    assert(isCompletion(parseLine(lines[5]),results[3][1]))
+    pooled=list(solveLines(lines,workers=2))
+    assert([result[:3] for result in pooled]==
+           [result[:3] for result in results])
+    # A slow puzzle at the head stops the reading until it is done.
+    read=[]
+    def feed():
+        for i in range(41):
+            read.append(i)
+            yield '1'+'.'*624 if i==0 else easy
+    pooled=solveLines(feed(),workers=2,timeout=0.3,heuristic='max')
+    assert(next(pooled)[2]=='timeout' and len(read)<=9)
+    assert(len(list(pooled))==40 and len(read)==41)
+    # Killing the worker fails the lines in flight, not the whole run.
+    killWorkers(0.3)
+    pooled=list(solveLines(['1'+'.'*624]+[easy]*7,workers=1,timeout=2.0,
+                           heuristic='max'))
+    assert([result[0] for result in pooled]==list(range(1,9)))
+    assert('BrokenProcessPool' in pooled[0][2])
+    assert(pooled[-1][1]==results[0][1])
+
+def testGeneratePuzzle():
+    for n in (2,3,4):
+        for symmetry in SYMMETRIES:
+            puzzle,solution=generatePuzzle(n,symmetry,seed=n)
+            assert(isCompletion(puzzle,solution))
+            assert(hasUniqueSolution(puzzle))
+            N=n**2
+            for row in range(N):
+                for col in range(N):
+                    mirror={None:(row,col),'rotational':(N-1-row,N-1-col),
+                            'mirror':(row,N-1-col),
+                            'diagonal':(col,row)}[symmetry]
+                    assert((puzzle[row][col]==0)==
+                           (puzzle[mirror[0]][mirror[1]]==0))
+    puzzle,_=generatePuzzle(3,minclues=35,seed=1)
+    assert(sum(num!=0 for row in puzzle for num in row)>=35)
+    puzzle,_=generatePuzzle(3,maxclues=26,seed=1)
+    assert(sum(num!=0 for row in puzzle for num in row)<=26)
+    assert(generatePuzzle(3,seed=7)==generatePuzzle(3,seed=7))
+    bank=list(generatePuzzles(4,3,seed=7,workers=2))
+    assert(len(bank)==4 and bank[0]==generatePuzzle(3,seed=7))
+    assert(list(generatePuzzles(1,3,maxclues=10,workers=1,attempts=1))==[None])
+    # Bad options are raised by the call rather than turned into Nones.
+    for kwargs in ({'n':7},{'symmetry':'spiral'}):
+        try:
+            generatePuzzles(2,workers=1,**kwargs)
+            assert(False)
+        except Exception as e: assert('must be' in str(e) or
+                                      'Unknown' in str(e))
+
+def testSolutionCache():
+    puzzle,solution=generatePuzzle(3,seed=11)
+    # Swap the first two bands and the last two cols, relabel 1<->9, then
+    # transpose: the copy must share the puzzle's canonical key.
+    copied=puzzle[3:6]+puzzle[0:3]+puzzle[6:9]
+    copied=[row[:7]+[row[8],row[7]] for row in copied]
+    copied=[[{1:9,9:1}.get(num,num) for num in row] for row in copied]
+    copied=[list(row) for row in zip(*copied)]
+    key,transform=canonicalForm(copied)
+    assert(key==canonicalForm(puzzle)[0])
+    assert(invertTransform(applyTransform(copied,transform),transform)==copied)
+    cache=SolutionCache(maxsize=1)
+    assert(cache.solve(puzzle)[0]==solution)
+    solved,steps=cache.solve(copied)
+    assert(isCompletion(copied,solved))
+    check=copy.deepcopy(copied)
+    for row,col,num,_ in steps:
+        assert(check[row][col]==0)
+        check[row][col]=num
+    assert(check==solved)
+    assert(cache.stats.hits==1 and cache.stats.misses==1)
+    cache.solve(puzzle,'dlx')
+    assert(cache.stats.evictions==1 and len(cache)==1)
+    clash=copy.deepcopy(puzzle)
+    clash[0]=[1]*9
+    assert(cache.solve(clash)==(None,None))
+
+def testSolveParallel():
+    hard=copy.deepcopy(HARD9)
+    large,_=generatePuzzle(4,seed=3)
+    for board in (hard,large):
+        solution,subproblems=splitSearch(board,round(len(board)**0.5),16)
+        assert(solution is not None or len(subproblems)>=16)
+        start=time.time()
+        solved,steps=solveParallel(board,workers=2)
+        print('solveParallel %dx%d: %s s.'%(len(board),len(board),
+                                           time.time()-start))
+        assert(isCompletion(board,solved))
+        check=copy.deepcopy(board)
+        for row,col,num,_ in steps:
+            assert(check[row][col]==0)
+            check[row][col]=num
+        assert(check==solved)
+    clash=copy.deepcopy(hard)
+    clash[0][0]=4
+    assert(solveParallel(clash,workers=2)==(None,None))
+
+def testSolveBudget():
+    hard=copy.deepcopy(HARD9)
+    cancel=threading.Event()
+    cancel.set()
+    for engine in ENGINES:
+        board=copy.deepcopy(hard)
+        result=solveSudoku(board,engine,maxnodes=2)
+        assert(isinstance(result,BudgetExhausted) and result==(None,None))
+        assert(result.reason=='nodes' and result.stats.nodes==3)
+        assert(board==hard)
+        result=solveSudoku(copy.deepcopy(hard),engine,deadline=time.time()-1)
+        assert(result.reason=='deadline')
+        result=solveSudoku(copy.deepcopy(hard),engine,cancel=cancel)
+        assert(result.reason=='cancelled')
+        calls=[]
+        stats=SolverStats()
+        solved,_=solveSudoku(copy.deepcopy(hard),engine,stats=stats,
+                             progress=calls.append,progressevery=2)
+        assert(isCompletion(hard,solved))
+        assert(len(calls)==stats.nodes//2 and calls[0] is stats)
+    results=solveMany([hard,hard],workers=2,timeout=0.0)
+    assert([result.error for result in results]==['timeout','timeout'])
+    results=solveMany([hard],workers=1,timeout=60)
+    assert(results[0].error is None and isCompletion(hard,results[0].board))
+    for every in (0,-1):
+        try:
+            solveSudoku(copy.deepcopy(hard),progress=calls.append,
+                        progressevery=every)
+            assert(False)
+        except ValueError: pass
+
+def testTechniques():
+    hard=copy.deepcopy(HARD9)
+    solution,_=solveSudoku(copy.deepcopy(hard))
+    # Every choice a technique rules out must differ from the solution.
+    s=Sudoku(copy.deepcopy(hard))
+    fillBoard(s)
+    mark=s.getTrailMark()
+    found=0
+    for name,(technique,_) in TECHNIQUES.items():
+        for row,col,elem in technique(s):
+            assert(solution[row][col]!=elem)
+            found+=1
+    assert(found>0)
+    row,col=[(row,col) for row in range(9) for col in range(9)
+             if s.getChoicesNumber(row,col)>1][0]
+    choices=s.getChoicesMask(row,col)
+    s.eliminate(row,col,s.getChoices(row,col)[0])
+    assert(s.getChoicesMask(row,col)!=choices)
+    s.undoTrail(mark)
+    assert(s.getChoicesMask(row,col)==choices)
+    plain,full=SolverStats(),SolverStats()
+    solveSudoku(copy.deepcopy(hard),stats=plain)
+    solved,steps=solveSudoku(copy.deepcopy(hard),stats=full,
+                             techniques=tuple(TECHNIQUES))
+    assert(solved==solution and full.nodes<plain.nodes)
+    assert(any(not isPlacement(step) for step in steps))
+    check=copy.deepcopy(hard)
+    for row,col,num,kind in steps:
+        if isPlacement((row,col,num,kind)): check[row][col]=num
+        else: assert(solution[row][col]!=num and 5<=kind<=12)
+    assert(check==solution)
+    try:
+        solveSudoku(copy.deepcopy(hard),techniques=['guess'])
+        assert(False)
+    except Exception as e: assert('Unknown technique' in str(e))
+
+def testSATEngine():
+    assert(luby(0)==luby(1)==1 and [luby(i) for i in range(2,7)]==[2,1,1,2,4])
+    # A sparse 25x25 board: the diagonal boxes of a shifted pattern grid only.
+    n,N=5,25
+    grid=[[(n*(row%n)+row//n+col)%N+1 for col in range(N)] for row in range(N)]
+    board=[[grid[row][col] if row//n==col//n else 0 for col in range(N)]
+           for row in range(N)]
+    start=time.time()
+    stats=SolverStats()
+    solved,steps=solveSudoku(copy.deepcopy(board),'sat',stats=stats)
+    assert(isCompletion(board,solved))
+    assert(len(steps)==sum(row.count(0) for row in board))
+    assert(all(kind==0 for _,_,_,kind in steps) and stats.nodes>0)
+    print('sat sparse 25x25: '+str(time.time()-start)+' s.')
+    clash=copy.deepcopy(board)
+    clash[0][1]=clash[0][0]
+    assert(solveSAT(clash,n) is None and encodeBoard(clash,n)==(None,None))
+    solver=CDCLSolver(3)
+    for clause in ([2,4],[3,4],[2,5],[3,5]): solver.addClause(clause)
+    assert(not solver.solve())
+
+def testSudokuStorage():
+    board=[[0,0,1,0,9,0,0,0,8],
+           [2,0,0,4,0,8,0,0,3],
+           [8,0,0,0,0,0,1,5,0],
+           [0,2,0,5,0,1,8,0,0],
+           [0,0,9,0,2,0,0,3,0],
+           [6,0,7,9,8,3,0,0,4],
+           [1,0,0,8,0,0,0,0,0],
+           [0,0,0,3,0,2,6,0,7],
+           [0,0,6,0,4,7,0,0,9]]
+    s,t=Sudoku(copy.deepcopy(board)),Sudoku(copy.deepcopy(board))
+    assert(s.geometry is t.geometry and s.units is getGeometry(3).units)
+    assert(not hasattr(s,'__dict__') and s.cells.itemsize==1)
+    assert(s.board==board and s.getCell(5,2)==7)
+    assert(s.getBox(1,1)==[[5,0,1],[0,2,0],[9,8,3]])
+    peers=({(4,col) for col in range(9)}|{(row,4) for row in range(9)}|
+           {(row,col) for row in range(3,6) for col in range(3,6)})
+    assert(sorted(s.getPeers(4,4))==sorted(peers-{(4,4)}))
+    assert(s.getCellUnits(4,7)==(4,16,23) and s.getBoxIndex(4,7)==5)
+    mark=s.getTrailMark()
+    s.setCell(0,0,7)
+    s.eliminate(0,1,3)
+    view=s.board
+    view[0][0]=5
+    assert(s.getCell(0,0)==7 and not s.getChoicesMask(0,1)&4)
+    s.undoTrail(mark)
+    assert(s.board==board and s.getChoicesMask(0,0)==t.getChoicesMask(0,0))
+    assert(s.getChoicesMask(0,1)==t.getChoicesMask(0,1))
+    # Overwriting a number is undone by putting the old one back.
+    row,col=next((row,col) for row in range(9) for col in range(9)
+                 if board[row][col]!=0)
+    s.setCell(row,col,board[row][col]%9+1)
+    assert(s.getCell(row,col)!=board[row][col])
+    s.undoTrail(mark)
+    assert(s.board==board and s.isValid())
+    assert(s.getChoicesMask(0,1)==t.getChoicesMask(0,1))
+    solved,_=solveSudoku(board)
+    assert(solved is board and s.isValid() and Sudoku(solved).isFull())
+    big=Sudoku([[0]*36 for i in range(36)],6)
+    assert(big.cells.itemsize==1 and big.getChoices(0,0)==list(range(1,37)))
+
+def testStepTrace():
+    hard=copy.deepcopy(HARD9)
+    trace=StepTrace(6,[(35,35,36,12),(0,0,1,0)])
+    assert(trace==[(35,35,36,12),(0,0,1,0)] and trace[-1]==(0,0,1,0))
+    trace.append((3,4,5,2))
+    assert(trace[1:]==[(0,0,1,0),(3,4,5,2)] and len(trace)==3)
+    del trace[1:]
+    assert(list(trace)==[(35,35,36,12)] and trace.codes.itemsize==4)
+    joined=[(1,1,1,1)]+trace+[(2,2,2,3)]
+    assert(isinstance(joined,StepTrace) and len(joined)==3)
+    assert(joined==[(1,1,1,1),(35,35,36,12),(2,2,2,3)])
+    for engine in ENGINES:
+        solution,steps=solveSudoku(copy.deepcopy(hard),engine)
+        assert(isinstance(steps,StepTrace))
+        stats=SolverStats()
+        solved,nosteps=solveSudoku(copy.deepcopy(hard),engine,stats=stats,
+                                   trace=False)
+        assert(solved==solution and nosteps is None and stats.nodes>0)
+        replay=copy.deepcopy(hard)
+        for row,col,num,_ in steps: replay[row][col]=num
+        assert(replay==solution)
+    # Without a trace, Dancing Links only reports the entries it chose.
+    entries=solveDLX(hard,3,trace=False)
+    assert(len(entries)==sum(row.count(0) for row in hard))
+    replay=copy.deepcopy(hard)
+    for row,col,num,kind in entries:
+        assert(kind==0 and replay[row][col]==0)
+        replay[row][col]=num
+    assert(replay==solution)
+
+def testSolverStats():
+    hard=copy.deepcopy(HARD9)
+    plain=SolverStats()
+    solveSudoku(copy.deepcopy(hard),stats=plain)
+    assert(plain.guesses==0 and plain.choicecalls==0 and plain.maxdepth==0)
+    traced,untraced=SolverStats(True),SolverStats(True)
+    solved,steps=solveSudoku(copy.deepcopy(hard),stats=traced)
+    solveSudoku(copy.deepcopy(hard),stats=untraced,trace=False)
+    for stats in (traced,untraced):
+        assert(stats.nodes==plain.nodes and stats.guesses==stats.steptypes[0])
+        assert(0<stats.backtracks<stats.guesses and
+               0<stats.maxdepth<=stats.guesses)
+        assert(stats.choicecalls>0 and stats.validcalls==2*stats.guesses+2)
+        assert(abs(stats.propagationtime+stats.searchtime-stats.elapsed)<1e-9)
+    assert(traced.steptypes==untraced.steptypes)
+    # The steps kept are the ones on the path to the solution, a subset of
+    # the steps ever made.
+    for kind,count in collections.Counter(step[3] for step in steps).items():
+        assert(count<=traced.steptypes[kind])
+    print(traced)
+
+def testIsValidSince():
+    board=[[1,2,3,0],
+           [0,0,0,0],
+           [0,0,0,0],
+           [0,0,0,0]]
+    s=Sudoku(copy.deepcopy(board),2)
+    mark=s.getTrailMark()
+    assert(s.isValidSince(mark))
+    s.setCell(1,3,4)
+    # (0,3) can now only be 4 by its row, but 4 is in its col.
+    assert(not s.isValidSince(mark) and not s.isValid())
+    s.undoTrail(mark)
+    s.setCell(3,0,1)
+    assert(not s.isValidSince(mark) and not s.isValid())
+    s.undoTrail(mark)
+    s.setCell(1,0,3)
+    assert(s.isValidSince(mark) and s.isValid())
+    s.eliminate(0,3,4)
+    assert(not s.isValidSince(mark+1) and not s.isValid())
+
+def testSolveAsync():
+    hard=copy.deepcopy(HARD9)
+    clash=copy.deepcopy(hard)
+    clash[0][0]=4
+    # Empty but for one clue, so the 'max' heuristic searches for a while.
+    slow=[[0]*25 for i in range(25)]
+    slow[0][0]=1
+    async def run():
+        async with AsyncSolver(workers=1,maxpending=2) as solver:
+            solved,steps=await solver.solve(hard)
+            assert(isCompletion(hard,solved) and isinstance(steps,StepTrace))
+            assert(await solver.solve(clash)==(None,None))
+            result=await solver.solve(slow,timeout=0.05,heuristic='max')
+            assert(isinstance(result,BudgetExhausted) and
+                   result.reason=='deadline')
+            task=asyncio.ensure_future(solver.solve(slow,heuristic='max'))
+            await asyncio.sleep(0.2)
+            task.cancel()
+            try:
+                await task
+                assert(False)
+            except asyncio.CancelledError: pass
+            # The cancelled search frees the only worker straight away.
+            start=time.time()
+            solved,_=await solver.solve(hard,trace=False)
+            assert(isCompletion(hard,solved) and time.time()-start<5)
+            results={}
+            async for index,result in solver.iterSolve([hard,clash,hard]):
+                results[index]=result[0]
+            assert(sorted(results)==[0,1,2] and results[1] is None)
+            assert(isCompletion(hard,results[0]) and results[0]==results[2])
+            assert(sorted(solver.free)==[0,1])
+            # Waiting for a slot does not poll, and a wait cancelled before it
+            # gets one leaves the slots as they were.
+            tasks=[asyncio.ensure_future(solver.solve(slow,heuristic='max'))
+                   for _ in range(3)]
+            await asyncio.sleep(0.2)
+            assert(solver.free==[] and len(solver.waiters)==1)
+            tasks[2].cancel()
+            await asyncio.sleep(0)
+            assert(len(solver.waiters)==0)
+            # A cancelled search keeps its slot until its worker lets go, so
+            # the puzzle taking the slot next is not stopped by it.
+            tasks[0].cancel()
+            tasks[1].cancel()
+            solved,_=await solver.solve(hard)
+            assert(isCompletion(hard,solved))
+            await asyncio.gather(*tasks,return_exceptions=True)
+            while len(solver.free)<2: await asyncio.sleep(0.01)
+            assert(sorted(solver.free)==[0,1])
+            # A dead worker fails the puzzle it had, and the next one is solved
+            # on a new pool.
+            task=asyncio.ensure_future(solver.solve(slow,timeout=2.0,
+                                                    heuristic='max'))
+            await asyncio.sleep(0.2)
+            for pid in list(solver.executor.executor._processes):
+                os.kill(pid,signal.SIGKILL)
+            try:
+                await task
+                assert(False)
+            except Exception as e: assert('BrokenProcessPool' in repr(e))
+            solved,_=await solver.solve(hard)
+            assert(isCompletion(hard,solved) and sorted(solver.free)==[0,1])
+    start=time.time()
+    asyncio.run(run())
+    print('solveAsync: '+str(time.time()-start)+' s.')
+
+def testBenchmark():
+    start=time.time()
+    for name in CORPORA:
+        boards=buildCorpus(name,2,1)
+        assert(boards==buildCorpus(name,2,1) and len(boards)>=2)
+        assert(all(hasUniqueSolution(board) for board in boards))
+    assert(percentile([1.0,2.0,3.0],0.5)==2.0)
+    assert(percentile([1.0,2.0],0.75)==1.75)
+    results=runBenchmark(['easy','hard'],['backtrack','dlx'],count=2,
+                         repeat=1,warmup=0)
+    measures=results['results']['hard']['dlx']
+    assert(measures['count']==measures['solved']==len(HARD))
+    assert(measures['median']<=measures['p90']<=measures['p99']<=
+           measures['max'] and measures['peakmemory']>0)
+    with tempfile.TemporaryDirectory() as tmp:
+        path=os.path.join(tmp,'results.json')
+        saveResults(results,path)
+        baseline=loadResults(path)
+    assert(baseline==json.loads(json.dumps(results)))
+    changes,regressions=compareResults(results,baseline)
+    assert(len(changes)==4*len(TRACKED) and regressions==[])
+    baseline['results']['easy']['dlx']['median']/=2
+    baseline['results']['easy']['dlx']['puzzlespersecond']*=2
+    changes,regressions=compareResults(results,baseline)
+    assert([item[:3] for item in regressions]==
+           [('easy','dlx','median'),('easy','dlx','puzzlespersecond')])
+    # Runs of other generated puzzles are not compared.
+    baseline['meta']['seed']+=1
+    try:
+        compareResults(results,baseline)
+        assert(False)
+    except Exception as e: assert('seed' in str(e))
+    print('benchmark: '+str(time.time()-start)+' s.')
+
+def testSudokuServer():
+    start=time.time()
+    line=HARD[3]
+    hard=parseLine(line)
+    service=SolverService(workers=1,maxpending=2)
+    server=makeServer(service,port=0,streamthreshold=1,quiet=True)
+    threading.Thread(target=server.serve_forever,daemon=True).start()
+    url='http://127.0.0.1:%d'%server.server_address[1]
+    def post(body):
+        request=urllib.request.Request(url+'/solve',json.dumps(body).encode())
+        try:
+            with urllib.request.urlopen(request) as response:
+                return (response.status,response.headers['Content-Type'],
+                        response.read().decode())
+        except urllib.error.HTTPError as e:
+            return e.code,e.headers['Retry-After'],e.read().decode()
+    status,kind,body=post({'board':line})
+    solution=json.loads(body)['solution']
+    assert(status==200 and isCompletion(hard,parseLine(solution)))
+    status,kind,body=post({'board':hard,'steps':True,'engine':'dlx'})
+    result=json.loads(body)
+    assert(result['solution']==parseLine(solution) and result['error'] is None)
+    assert(len(result['steps'])==sum(row.count(0) for row in hard))
+    status,kind,body=post({'boards':[line,hard]})
+    assert(kind=='application/x-ndjson')
+    results=sorted((json.loads(item) for item in body.splitlines()),
+                   key=lambda result:result['index'])
+    assert([result['index'] for result in results]==[0,1])
+    assert(results[0]['solution']==solution)
+    assert(formatBoard(results[1]['solution'])==solution)
+    status,kind,body=post({'boards':[line,line],'stream':False})
+    assert([item['solution'] for item in json.loads(body)['results']]==
+           [solution,solution])
+    assert(post({'boards':[line]*3})[0]==413)
+    assert(post({'board':line[1:]})[0]==400)
+    assert(post({'board':line,'engine':'guess'})[0]==400)
+    # Two slow puzzles fill the queue, so a third is refused until they end.
+    slow=[[0]*25 for i in range(25)]
+    slow[0][0]=1
+    request={'boards':[slow,slow],'timeout':0.3,'heuristic':'max'}
+    busy=threading.Thread(target=post,args=(request,))
+    busy.start()
+    time.sleep(0.1)
+    assert(post({'board':line})[:2]==(503,'1'))
+    busy.join()
+    assert(post({'board':line})[0]==200)
+    assert(post({'boards':[line],'stream':1})[0]==400)
+    assert(post({'board':line,'timeout':True})[0]==400)
+    # Without a timeout of its own, a puzzle gets the default of the service.
+    service.timeout=0.3
+    status,kind,body=post({'board':slow,'heuristic':'max'})
+    assert(json.loads(body)['error']=='timeout')
+    # Killing the worker breaks the pool, which is replaced, and the batch is
+    # sent again rather than failed.
+    killed=[]
+    busy=threading.Thread(target=lambda:killed.append(
+        post({'board':slow,'heuristic':'max'})))
+    busy.start()
+    time.sleep(0.1)
+    for pid in list(service.executor._processes): os.kill(pid,signal.SIGKILL)
+    busy.join()
+    assert(json.loads(killed[0][2])['error']=='timeout')
+    assert(post({'board':line})[0]==200)
+    health=json.loads(urllib.request.urlopen(url+'/health').read())
+    assert(health['pending']==0 and health['workers']==1)
+    assert(health['restarts']==1)
+    server.shutdown()
+    server.server_close()
+    service.close()
+    print('sudokuServer: '+str(time.time()-start)+' s.')
+
+def testNextHint():
+    puzzle,solution=generatePuzzle(3,seed=2)
+    board=copy.deepcopy(puzzle)
+    kinds=set()
+    while True:
+        hint=nextHint(board)
+        if hint is None: break
+        # Every hint ends with a correct placement, after any choices ruled
+        # out on the way.
+        row,col,num,kind=hint[-1]
+        assert(isPlacement(hint[-1]) and board[row][col]==0)
+        assert(solution[row][col]==num)
+        assert(all(not isPlacement(step) for step in hint[:-1]))
+        assert(all(solution[r][c]!=elem for r,c,elem,_ in hint[:-1]))
+        board[row][col]=num
+        kinds.update(step[3] for step in hint)
+    assert(board==solution and puzzle!=solution)
+    assert({1,2,9}<=kinds and 0 not in kinds)
+    # Without TECHNIQUES the same puzzle needs a guess.
+    board=copy.deepcopy(puzzle)
+    while True:
+        hint=nextHint(board,techniques=())
+        if hint is None or hint[-1][3]==0: break
+        board[hint[0][0]][hint[0][1]]=hint[0][2]
+    assert(len(hint)==1 and solution[hint[0][0]][hint[0][1]]==hint[0][2])
+    assert(nextHint(solution) is None)
+    clash=copy.deepcopy(puzzle)
+    clash[0][0]=clash[1][0]
+    assert(nextHint(clash) is None)
+    # A wrong number that clashes with nothing leaves no solution, which is
+    # only found when asked for.
+    wrong=copy.deepcopy(puzzle)
+    s=Sudoku(copy.deepcopy(puzzle))
+    row,col,num=next((row,col,num) for row in range(9) for col in range(9)
+                     for num in range(1,10) if puzzle[row][col]==0 and
+                     num!=solution[row][col] and
+                     s.getChoicesMask(row,col)&(1<<(num-1)))
+    wrong[row][col]=num
+    assert(nextHint(wrong,checksolvable=True) is None)
+    try:
+        nextHint(puzzle,techniques=('typo',))
+        assert(False)
+    except Exception as e: assert('Unknown technique' in str(e))
+    start=time.time()
+    for _ in range(100): nextHint(puzzle)
+    print('nextHint: '+str((time.time()-start)/100)+' s per hint.')
+
+def testRatePuzzle():
+    start=time.time()
+    easy=generatePuzzle(3,seed=0,search=False)[0]
+    rating=ratePuzzle(easy)
+    assert((rating.score,rating.label,rating.hardest)==(1.0,'easy','singles'))
+    assert(rating.guesses==0 and
+           rating.levels['singles']==sum(row.count(0) for row in easy))
+    # Pointing pairs and then a naked pair are needed, but no guessing.
+    rating=ratePuzzle(generatePuzzle(3,seed=2)[0])
+    assert(rating.levels['pointing']>0 and rating.hardest=='naked-pair')
+    assert((rating.score,rating.label,rating.guesses)==(3.0,'hard',0))
+    hard=parseLine(HARD[0])
+    rating=ratePuzzle(hard)
+    assert(rating.hardest=='guess' and rating.guesses==rating.levels['guess'])
+    assert(rating.score==LEVELS['guess']+rating.guesses-1)
+    assert(rating.label=='extreme' and hard==parseLine(HARD[0]))
+    clash=copy.deepcopy(easy)
+    clash[0]=[1]*9
+    assert(ratePuzzle(clash).label=='invalid')
+    boards=[easy,hard,clash]*3
+    ratings=rateMany(boards,workers=2,chunksize=2)
+    assert([rating.index for rating in ratings]==list(range(9)))
+    assert([rating.label for rating in ratings]==
+           [ratePuzzle(board).label for board in boards])
+    assert([rating.score for rating in rateMany(boards,workers=0)]==
+           [rating.score for rating in ratings])
+    # Boards are read only a couple of chunks ahead of the ratings.
+    read=[]
+    def feed():
+        for board in boards:
+            read.append(board)
+            yield board
+    ratings=iterRateMany(feed(),workers=1,chunksize=1)
+    assert(next(ratings).index==0 and len(read)<=3)
+    assert([rating.index for rating in ratings]==list(range(1,9)))
+    # Killing the worker fails the chunks in flight, and the rest are rated on
+    # a new pool.
+    slow=[[0]*25 for i in range(25)]
+    slow[0][0]=1
+    killWorkers(0.3)
+    ratings=rateMany([slow]+[easy]*5,workers=1,chunksize=1,timeout=2.0,
+                     heuristic='max')
+    assert([rating.index for rating in ratings]==list(range(6)))
+    assert('BrokenProcessPool' in ratings[0].label)
+    assert([rating.label for rating in ratings[3:]]==['easy']*3)
+    print('ratePuzzle: '+str(time.time()-start)+' s.')
+
+def testIterSolutions():
+    hard=parseLine(HARD[3])
+    solved=solveSudoku(copy.deepcopy(hard))[0]
+    assert(list(iterSolutions(hard))==[solved])
+    assert(list(iterSolutions(hard,'max',tuple(TECHNIQUES)))==[solved])
+    clash=copy.deepcopy(hard)
+    clash[0][0]=4
+    assert(list(iterSolutions(clash))==[])
+    # Bad arguments are raised by the call, before any solution is asked for.
+    for kwargs in ({'techniques':('typo',)},{'heuristic':'typo'}):
+        try:
+            iterSolutions(hard,**kwargs)
+            assert(False)
+        except Exception as e: assert('Unknown' in str(e))
+    # A solved grid with its top band and both diagonals cleared.
+    loose=copy.deepcopy(solved)
+    for row in range(9):
+        if row<3: loose[row]=[0]*9
+        else: loose[row][row]=loose[row][8-row]=0
+    solutions=list(iterSolutions(loose))
+    assert(len(solutions)==len(set(map(str,solutions)))==
+           countSolutions(loose,None))
+    assert(solved in solutions and all(isCompletion(loose,solution)
+                                       for solution in solutions))
+    # Solutions of an empty grid are produced lazily in constant memory.
+    start=time.time()
+    solutions=iterSolutions([[0]*16 for i in range(16)])
+    first=next(solutions)
+    assert(isCompletion([[0]*16 for i in range(16)],first))
+    assert(len(set(str(next(solutions)) for _ in range(50)))==50)
+    solutions.close()
+    print('iterSolutions 16x16: '+str((time.time()-start)/51)+
+          ' s per solution.')
 
 def main():
-    testSudoku()
+    testSudoku('dlx')
+    testSudoku('backtrack')
+    testSudoku('sat')
+    testHeuristics()
+    testCountSolutions()
+    testSolveMany()
+    testSolveBatch()
+    testSolveLines()
+    testGeneratePuzzle()
+    testSolutionCache()
+    testSolveParallel()
+    testSolveBudget()
+    testTechniques()
+    testSATEngine()
+    testSudokuStorage()
+    testStepTrace()
+    testSolverStats()
+    testIsValidSince()
+    testSolveAsync()
+    testBenchmark()
+    testSudokuServer()
+    testNextHint()
+    testRatePuzzle()
+    testIterSolutions()
 
 if __name__ == '__main__':main()
@@ -22,6 +22,7 @@ from puzzlesolver.steps_explainer import *
 import cv2
 import copy
 import string
+import time
 
 '''
 MODES LIST
@@ -469,7 +470,12 @@ def mousePressed6(event,data):
 def timerFired6(data):
     if data.ye:
         board=copy.deepcopy(data.board)
-        data.solvedboard,data.steps=solveSudoku(board)
+        # A misread digit can leave a board that takes very long to rule out,
+        # so the search is cut short rather than freezing the window.
+        result=solveSudoku(board,deadline=time.time()+10,
+                           techniques=tuple(TECHNIQUES))
+        data.solvedboard,data.steps=result
+        data.timedout=isinstance(result,BudgetExhausted)
         if data.solvedboard is not None:
             retrainModel(data.boardRawData,data.board)
         data.mode=7
@@ -526,7 +532,10 @@ def init7(data):
                           data.xoffset+data.buttonwidth,data.height-
                           (3*data.yoffset//4)+(data.yoffset//2),
                           text="Return to main")
-    if data.solvedboard is None:
+    if data.solvedboard is None and data.timedout:
+        data.questiontext='''Your puzzle took too long to solve!'''
+        data.buttontext="Check my puzzle again"
+    elif data.solvedboard is None:
         data.questiontext='''There was no solution to your puzzle!'''
         data.buttontext="Check my puzzle again"
     else:
@@ -617,6 +626,9 @@ def init8(data):
                             text="Return to solution")
     data.steptext='''Click 'Next' to see the solution steps.'''
     data.currentstep=None
+    # data.steps is only read, never changed: the first stepindex steps are
+    # finished, and are decoded into finishedsteps as the cursor moves.
+    data.stepindex=0
     data.finishedsteps=[]
 
 def keyPressed8(event,data):
@@ -644,29 +656,34 @@ only go in this cell.'''%(row,col,num)
     if sol==4:
         data.steptext='''Row %d, Column %d\nWithin the box, number %d can only \
 go in this cell.'''%(row,col,num)
+    if sol>=5:
+        technique={5:'A naked pair',6:'A naked triple',7:'A hidden pair',
+                   8:'A hidden triple',9:'A pointing pair',
+                   10:'A box-line reduction',11:'An X-Wing',
+                   12:'A Swordfish'}[sol]
+        data.steptext='''Row %d, Column %d\n%s rules out number %d in this \
+cell.'''%(row,col,technique,num)
 
 def mousePressed8(event,data):
     if data.nextButton.clicked(event):
         if data.currentstep is None or isinstance(data.currentstep,tuple):
             if data.currentstep is not None:
                 data.finishedsteps.append(data.currentstep)
-            if data.steps==[]:data.currentstep=True
-            else:data.currentstep=data.steps.pop(0)
+                data.stepindex+=1
+            if data.stepindex==len(data.steps):data.currentstep=True
+            else:data.currentstep=data.steps[data.stepindex]
             updateStepText(data)
     elif data.prevButton.clicked(event):
         if data.currentstep:
-            if isinstance(data.currentstep,tuple):
-                data.steps.insert(0,data.currentstep)
-            if data.finishedsteps==[]:data.currentstep=None
-            else:data.currentstep=data.finishedsteps.pop()
+            if data.stepindex==0:data.currentstep=None
+            else:
+                data.stepindex-=1
+                data.currentstep=data.finishedsteps.pop()
             updateStepText(data)
     elif data.retButton.clicked(event):
         data.mode=1
         initDispatch(data)
     elif data.checkButton.clicked(event):
-        if isinstance(data.currentstep,tuple):
-            data.steps.insert(0,data.currentstep)
-        for i in data.finishedsteps[::-1]:data.steps.insert(0,i)
         data.mode=7
         initDispatch(data)
 
@@ -684,13 +701,18 @@ def drawDigitsSudoku8(canvas,data):
                 if data.currentstep is not None:
                     if (isinstance(data.currentstep,tuple) and
                         row==data.currentstep[0] and col==data.currentstep[1]):
-                        canvas.create_rectangle(x0,y0,x1,y1,fill='green',
-                                                width=None)
+                        # Ruled out numbers are shown in grey on yellow, so
+                        # they are not mistaken for entered ones.
+                        placed=isPlacement(data.currentstep)
+                        canvas.create_rectangle(x0,y0,x1,y1,fill='green' if
+                                                placed else 'yellow',width=None)
                         canvas.create_text((x0+x1)//2,(y0+y1)//2,
                                            text=str(data.currentstep[2]),
                                            font='Arial %d bold'%
-                                           (35*9//(data.n**2)),fill='red')
-                    elif (row,col) in [(k[0],k[1]) for k in data.finishedsteps]:
+                                           (35*9//(data.n**2)),fill='red' if
+                                           placed else 'grey')
+                    elif (row,col) in [(k[0],k[1]) for k in data.finishedsteps
+                                       if isPlacement(k)]:
                         canvas.create_rectangle(x0,y0,x1,y1,fill='green',
                                                 width=None)
                         canvas.create_text((x0+x1)//2,(y0+y1)//2,font='Arial %d'
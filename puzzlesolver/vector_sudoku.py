@@ -0,0 +1,159 @@
+'''
+This file contains the helper functions for solving many sudoku puzzles at once
+by running the singleton and unique cell searches on all of them together with
+numpy array operations. Only the boards that these cannot finish are handed to
+solveSudoku() one by one.
+'''
+import numpy as np
+from puzzlesolver.solve_sudoku import *
+from puzzlesolver.batch_sudoku import *
+
+'''-----------------------------------------------------------------------------
+------------------------------ARRAY HELPER FUNCTIONS----------------------------
+-----------------------------------------------------------------------------'''
+
+def boxView(a,n):
+    '''
+    Params:
+        a - ndarray; shape (K,n**2,n**2,...) indexed by board, row and col.
+        n - int; order of the boards.
+    Returns:
+        A view of a with shape (K,n,n,n**2,...) indexed by board, boxrow,
+        boxcol and position within the box.
+    '''
+    K,rest=a.shape[0],a.shape[3:]
+    a=a.reshape((K,n,n,n,n)+rest).swapaxes(2,3)
+    return a.reshape((K,n,n,n**2)+rest)
+
+def getCandidates(grid,n):
+    '''
+    Params:
+        grid - ndarray; int array of shape (K,n**2,n**2) holding K boards with 0
+               for empty cells.
+        n - int; order of the boards.
+    Returns:
+        placed - ndarray; bool array of shape (K,n**2,n**2,n**2), True where
+                 the cell holds the number (last index + 1).
+        cand - ndarray; bool array of the same shape, True where the number is
+               still a choice for the empty cell.
+    '''
+    K,N=grid.shape[0],n**2
+    placed=grid[...,None]==np.arange(1,N+1)
+    rowhas=placed.any(axis=2)
+    colhas=placed.any(axis=1)
+    boxhas=boxView(placed,n).any(axis=3)
+    boxhas=np.repeat(np.repeat(boxhas,n,axis=1),n,axis=2)
+    cand=~(rowhas[:,:,None,:]|colhas[:,None,:,:]|boxhas)
+    cand&=(grid==0)[...,None]
+    return placed,cand
+
+def findDeadBoards(grid,placed,cand,n):
+    '''
+    Params:
+        grid - ndarray; int array of shape (K,n**2,n**2).
+        placed - ndarray; bool array as returned by getCandidates().
+        cand - ndarray; bool array as returned by getCandidates().
+        n - int; order of the boards.
+    Returns:
+        A bool array of shape (K,), True for boards that cannot be solved: an
+        empty cell has no choices, a number repeats in a unit, or a number is
+        neither placed nor a choice anywhere in a unit.
+    '''
+    dead=((grid==0)&~cand.any(axis=3)).any(axis=(1,2))
+    units=((placed,cand,2),(placed,cand,1),
+           (boxView(placed,n),boxView(cand,n),3))
+    for p,c,axis in units:
+        count=p.sum(axis=axis)
+        dead|=(count>1).any(axis=tuple(range(1,count.ndim)))
+        covered=(count>0)|c.any(axis=axis)
+        dead|=~covered.all(axis=tuple(range(1,covered.ndim)))
+    return dead
+
+def propagateArray(grid,n):
+    '''
+    Params:
+        grid - ndarray; int array of shape (K,n**2,n**2) holding K boards with 0
+               for empty cells. Modified in place.
+        n - int; order of the boards.
+    Returns:
+        A bool array of shape (K,), True for boards found to have no solution.
+        Repeats singleton and unique cell (by row, col and box) placements on
+        every live board at once until none of them changes.
+    '''
+    while True:
+        placed,cand=getCandidates(grid,n)
+        dead=findDeadBoards(grid,placed,cand,n)
+        cand&=~dead[:,None,None,None]
+        new=np.zeros_like(grid)
+        # Singletons.
+        single=cand.sum(axis=3)==1
+        new[single]=cand[single].argmax(axis=1)+1
+        # Unique cells by row, then col, then box. A cell given two different
+        # numbers keeps the first; the next pass then finds the other number
+        # has nowhere to go and marks the board dead.
+        k,row,num=np.nonzero(cand.sum(axis=2)==1)
+        col=cand[k,row,:,num].argmax(axis=1)
+        keep=new[k,row,col]==0
+        new[k[keep],row[keep],col[keep]]=num[keep]+1
+        k,col,num=np.nonzero(cand.sum(axis=1)==1)
+        row=cand[k,:,col,num].argmax(axis=1)
+        keep=new[k,row,col]==0
+        new[k[keep],row[keep],col[keep]]=num[keep]+1
+        boxcand=boxView(cand,n)
+        k,boxrow,boxcol,num=np.nonzero(boxcand.sum(axis=3)==1)
+        idx=boxcand[k,boxrow,boxcol,:,num].argmax(axis=1)
+        row,col=boxrow*n+idx//n,boxcol*n+idx%n
+        keep=new[k,row,col]==0
+        new[k[keep],row[keep],col[keep]]=num[keep]+1
+        if not new.any(): return dead
+        grid+=new
+
+'''-----------------------------------------------------------------------------
+------------------------------------SOLVER--------------------------------------
+-----------------------------------------------------------------------------'''
+
+def solveBatch(boards,blocksize=4096,workers=None,**kwargs):
+    '''
+    Params:
+        boards - list; 2-dimensional lists containing the boards to be solved.
+                 Boards of different orders may be mixed.
+        [blocksize] - int; number of boards of one order propagated together,
+                      bounding the size of the candidate arrays.
+        [workers] - int; if given, boards left unsolved by propagation are
+                    solved on this many processes with solveMany(), otherwise
+                    in this process.
+        Any other keyword arguments are passed on to solveSudoku() for the
+        boards left unsolved by propagation.
+    Returns:
+        A list with the completed board for each input board, or None if there
+        is no solution. No steps are recorded.
+    '''
+    kwargs=dict(kwargs,trace=False)
+    solutions=[None]*len(boards)
+    leftover=[]
+    byorder={}
+    for i,board in enumerate(boards):
+        n=round(len(board)**0.5)
+        if n**2!=len(board):
+            raise Exception("Board dims are not square numbers.")
+        byorder.setdefault(n,[]).append(i)
+    for n,indices in byorder.items():
+        for start in range(0,len(indices),blocksize):
+            block=indices[start:start+blocksize]
+            grid=np.array([boards[i] for i in block],dtype=np.int32)
+            if (grid.shape[1:]!=(n**2,n**2) or (grid<0).any() or
+                (grid>n**2).any()):
+                raise Exception("Boards must be square with entries 0..n**2.")
+            dead=propagateArray(grid,n)
+            full=(grid!=0).all(axis=(1,2))
+            for j,i in enumerate(block):
+                if dead[j]: continue
+                if full[j]: solutions[i]=grid[j].tolist()
+                else: leftover.append((i,grid[j].tolist()))
+    if workers is None:
+        for i,board in leftover: solutions[i]=solveSudoku(board,**kwargs)[0]
+    else:
+        results=solveMany([board for _,board in leftover],workers,**kwargs)
+        for (i,_),result in zip(leftover,results):
+            solutions[i]=result.board
+    return solutions